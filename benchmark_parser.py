@@ -0,0 +1,125 @@
+"""
+报表解析基准测试
+
+对目录中的PDF分别用完整逐页扫描和其他提取方式解析，比较耗时以及三张报表
+与完整扫描结果的一致率。完整扫描（不定位财务报告章节，从第一页起逐页框线检测，
+即 _extract_table_from_pages 的做法）作为基准，不使用解析缓存。section 只启用
+章节定位，用于区分章节定位和预筛选各自带来的提速。
+
+不同提取方式切分单元格的结果可能略有差别，因此按表格中数值单元格的重合程度
+比较，重合比例不低于 --match 时视为一致。
+
+用法:
+    python benchmark_parser.py downloaded_reports
+    python benchmark_parser.py downloaded_reports --limit 20 --min-agreement 0.95
+    python benchmark_parser.py downloaded_reports --modes layout auto
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+# 基准方式及各对比方式的 ReportParser 参数
+BASELINE_MODE = 'full'
+MODES = {
+    'full': {'prefilter': False, 'table_strategy': 'lines', 'locate_section': False},
+    'section': {'prefilter': False, 'table_strategy': 'lines'},
+    'prefilter': {'prefilter': True, 'table_strategy': 'lines'},
+    'layout': {'prefilter': False, 'table_strategy': 'layout'},
+    'auto': {'prefilter': True, 'table_strategy': 'auto'},
+}
+
+
+def numeric_cells(table) -> Counter:
+    """表格中所有数值单元格的计数"""
+    from utils.layout_table import NUMERIC_CELL_PATTERN
+
+    values = [str(cell).replace(' ', '') for row in table.itertuples(index=False) for cell in row]
+    return Counter(value for value in values if NUMERIC_CELL_PATTERN.fullmatch(value))
+
+
+def table_similarity(baseline, table) -> float:
+    """两次提取的同一张报表中数值单元格的重合比例，都没找到时为1"""
+    if baseline is None or table is None:
+        return 1.0 if baseline is None and table is None else 0.0
+    expected, actual = numeric_cells(baseline), numeric_cells(table)
+    total = max(sum(expected.values()), sum(actual.values()))
+    if not total:
+        return 1.0
+    return sum((expected & actual).values()) / total
+
+
+def run_mode(mode, options, paths):
+    """用指定参数解析所有文件，返回 ({路径: 报表字典}, 总耗时)"""
+    from utils.report_parser import ReportParser
+
+    parser = ReportParser(use_cache=False, **options)
+    results = {}
+    start = time.perf_counter()
+    for path in paths:
+        file_start = time.perf_counter()
+        results[path] = parser.extract_financial_data(path)
+        print(f"  [{mode}] {time.perf_counter() - file_start:6.2f} 秒  {os.path.basename(path)}")
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报表解析基准测试')
+    parser.add_argument('sources', nargs='+', help='PDF文件或目录')
+    parser.add_argument('--limit', type=int, default=0, help='最多测试的文件数，0 表示全部')
+    parser.add_argument('--modes', nargs='+', choices=[m for m in MODES if m != BASELINE_MODE],
+                        default=[m for m in MODES if m != BASELINE_MODE], help='参与对比的提取方式')
+    parser.add_argument('--match', type=float, default=0.95,
+                        help='数值单元格重合比例不低于该值时视为与完整扫描一致')
+    parser.add_argument('--min-agreement', type=float, default=0.0,
+                        help='与完整扫描的最低一致率，低于该值时返回非零退出码')
+    args = parser.parse_args()
+
+    from utils.batch_parser import collect_pdf_paths
+
+    paths = collect_pdf_paths(args.sources)
+    if args.limit:
+        paths = paths[:args.limit]
+    if not paths:
+        print("没有找到PDF文件")
+        sys.exit(1)
+
+    print(f"共 {len(paths)} 个文件\n")
+    baseline, baseline_time = run_mode(BASELINE_MODE, MODES[BASELINE_MODE], paths)
+
+    summary = [(BASELINE_MODE, baseline_time, 1.0)]
+    failures = []
+    for mode in args.modes:
+        results, elapsed = run_mode(mode, MODES[mode], paths)
+        compared = agreed = 0
+        for path in paths:
+            for name, table in baseline[path].items():
+                compared += 1
+                similarity = table_similarity(table, results[path].get(name))
+                if similarity >= args.match:
+                    agreed += 1
+                else:
+                    print(f"  [{mode}] 不一致 ({similarity:.0%}): {os.path.basename(path)} {name}")
+        agreement = agreed / compared if compared else 1.0
+        summary.append((mode, elapsed, agreement))
+        if agreement < args.min_agreement:
+            failures.append(f"{mode} 一致率 {agreement:.1%} 低于 {args.min_agreement:.1%}")
+
+    print(f"\n{'方式':<12}{'总耗时(秒)':>12}{'每文件(秒)':>12}{'加速比':>10}{'一致率':>10}")
+    for mode, elapsed, agreement in summary:
+        speedup = baseline_time / elapsed if elapsed else 0.0
+        print(f"{mode:<12}{elapsed:>12.2f}{elapsed / len(paths):>12.2f}{speedup:>10.2f}{agreement:>10.1%}")
+
+    if failures:
+        print("\n准确率回归:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
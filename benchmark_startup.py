@@ -0,0 +1,130 @@
+"""
+启动耗时基准测试
+
+用 `python -X importtime` 统计 cli.py / gui.py 的导入耗时，并测量从进程启动到
+CLI 输出帮助信息、GUI 窗口首次绘制完成的实际耗时。超过预算或在启动阶段导入了
+重量级依赖时返回非零退出码，可以放进构建脚本作为回归检查。
+
+用法:
+    python benchmark_startup.py
+    python benchmark_startup.py --cli-budget 0.5 --gui-budget 1.5 --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# 启动阶段不应出现的重量级依赖，只允许在用到的代码路径中导入
+HEAVY_MODULES = [
+    'openpyxl', 'pandas', 'numpy', 'matplotlib', 'seaborn', 'pdfplumber',
+    'cryptography', 'aiohttp', 'tkcalendar',
+]
+
+GUI_SNIPPET = """
+import tkinter as tk
+from gui import StockCrawlerGUI
+root = tk.Tk()
+app = StockCrawlerGUI(root)
+root.update()
+root.destroy()
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块名: 累计耗时(微秒)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            cumulative = int(parts[1].strip())
+        except ValueError:
+            continue
+        timings[parts[2].strip()] = cumulative
+    return timings
+
+
+def measure_imports(module):
+    """在子进程中导入模块，返回导入耗时统计"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_wall_time(args, runs):
+    """多次运行命令，返回最短耗时（秒）和最后一次的返回码"""
+    best = None
+    returncode = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(args, cwd=BASE_DIR, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        returncode = result.returncode
+        best = elapsed if best is None else min(best, elapsed)
+    return best, returncode
+
+
+def report_imports(name, timings, top):
+    """打印最慢的顶层导入，返回启动阶段导入的重量级依赖"""
+    print(f"\n{name} 导入耗时 (前 {top} 项，累计):")
+    top_level = {k: v for k, v in timings.items() if '.' not in k.strip()}
+    for module, us in sorted(top_level.items(), key=lambda x: -x[1])[:top]:
+        print(f"  {us / 1000:8.1f} ms  {module}")
+    return sorted(m for m in HEAVY_MODULES if m in timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准测试')
+    parser.add_argument('--cli-budget', type=float, default=0.5, help='CLI 启动耗时预算（秒）')
+    parser.add_argument('--gui-budget', type=float, default=1.5, help='GUI 启动耗时预算（秒）')
+    parser.add_argument('--runs', type=int, default=3, help='每项测量的运行次数，取最短耗时')
+    parser.add_argument('--top', type=int, default=10, help='显示最慢的导入数量')
+    parser.add_argument('--skip-gui', action='store_true', help='跳过 GUI 测量（无显示环境时）')
+    args = parser.parse_args()
+
+    failures = []
+
+    heavy = report_imports('cli.py', measure_imports('cli'), args.top)
+    if heavy:
+        failures.append(f"cli.py 启动时导入了重量级依赖: {', '.join(heavy)}")
+
+    cli_time, returncode = measure_wall_time([sys.executable, 'cli.py'], args.runs)
+    if returncode != 0:
+        print("\ncli.py 运行失败，请先安装依赖: pip install -r requirements.txt")
+        sys.exit(returncode)
+    print(f"\ncli.py 启动到输出帮助: {cli_time:.3f} 秒 (预算 {args.cli_budget:.3f} 秒)")
+    if cli_time > args.cli_budget:
+        failures.append(f"cli.py 启动耗时 {cli_time:.3f} 秒超出预算")
+
+    if not args.skip_gui:
+        heavy = report_imports('gui.py', measure_imports('gui'), args.top)
+        if heavy:
+            failures.append(f"gui.py 启动时导入了重量级依赖: {', '.join(heavy)}")
+
+        gui_time, returncode = measure_wall_time([sys.executable, '-c', GUI_SNIPPET], args.runs)
+        if returncode != 0:
+            print("\n无法创建 GUI 窗口（可能没有显示环境），跳过 GUI 耗时测量")
+        else:
+            print(f"\ngui.py 启动到首次绘制: {gui_time:.3f} 秒 (预算 {args.gui_budget:.3f} 秒)")
+            if gui_time > args.gui_budget:
+                failures.append(f"gui.py 启动耗时 {gui_time:.3f} 秒超出预算")
+
+    if failures:
+        print("\n启动性能回归:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+    print("\n启动性能检查通过")
+
+
+if __name__ == '__main__':
+    main()
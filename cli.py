@@ -1,11 +1,15 @@
 import argparse
+import os
 from datetime import datetime
 from crawler import StockCrawler
-import json
+from utils.stock_index import StockIndex
+from utils.events import EventBus, text_subscriber, DEBUG, INFO
+from utils.metrics import MetricsRegistry
+from utils.profiling import Profiler, span
+from utils.logger import Logger
 
 def load_stock_codes(file_path='stock_codes.json'):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return StockIndex(file_path)
 
 def main():
     parser = argparse.ArgumentParser(description='股票财报爬虫工具')
@@ -14,6 +18,10 @@ def main():
     parser.add_argument('--type', '-t', nargs='+', choices=['年度报告', '半年度报告', '第一季度报告', '第三季度报告'],
                       help='报告类型，可以指定多个')
     parser.add_argument('--output', '-o', default='downloaded_reports', help='下载文件保存目录')
+    parser.add_argument('--verbose', '-v', action='store_true', help='输出调试信息（请求、分类和下载进度详情）')
+    parser.add_argument('--metrics-file', help='运行结束时写入 Prometheus 文本格式指标的文件，默认读取配置 metrics.prometheus_file')
+    parser.add_argument('--profile', nargs='?', const='spans', choices=['spans', 'cprofile'],
+                      help='记录各阶段耗时，在报告清单旁写入 Chrome trace 文件；指定 cprofile 时同时保存 cProfile 数据')
     
     args = parser.parse_args()
     
@@ -21,30 +29,64 @@ def main():
     if not args.stock:
         parser.print_help()
         return
-        
+    
+    profiler = None
+    if args.profile:
+        profiler = Profiler(cprofile=args.profile == 'cprofile')
+        profiler.start()
+    # 配置日志系统，爬虫的进度事件同时写入日志文件
+    Logger()
+    try:
+        with span('run', stock=args.stock):
+            run(args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            report_profile(profiler, args.output)
+        report_metrics(args.metrics_file)
+
+def report_profile(profiler, output_dir):
+    """打印各阶段耗时，并把 trace 写到报告清单所在的目录"""
+    print("\n阶段耗时:")
+    for name, count, seconds in profiler.summary():
+        print(f"{name:<12} {count:>6} 次  {seconds:>9.3f} 秒")
+    trace_file = os.path.join(output_dir, f"trace_{profiler.started_at}.json")
+    for path in profiler.write_trace(trace_file):
+        print(f"性能数据已写入: {path}")
+
+def report_metrics(metrics_file=None):
+    """打印本次运行的指标摘要，并按需写入 Prometheus 文本文件"""
+    from utils.config_manager import ConfigManager
+    
+    registry = MetricsRegistry()
+    summary = registry.summary_table()
+    if summary:
+        print("\n运行指标:")
+        print(summary)
+    metrics_file = metrics_file or ConfigManager().get('metrics.prometheus_file', '')
+    if metrics_file:
+        registry.write_prometheus(metrics_file)
+        print(f"指标已写入: {metrics_file}")
+
+def run(args):
     # 加载股票代码
     stock_codes = load_stock_codes()
-    stock_code = None
     
-    # 查找股票代码
-    if args.stock in stock_codes:
-        stock_code = stock_codes[args.stock]
-    else:
-        # 尝试通过代码反查股票名称
-        for name, code in stock_codes.items():
-            if code == args.stock:
-                stock_code = code
-                break
+    # 查找股票代码（支持名称或代码）
+    stock_code = stock_codes.resolve(args.stock)
                 
     if not stock_code:
         print(f"未找到股票: {args.stock}")
         return
         
     # 创建爬虫实例
-    crawler = StockCrawler(stock_code)
+    events = EventBus()
+    events.subscribe(text_subscriber(print), min_level=DEBUG if args.verbose else INFO)
+    crawler = StockCrawler(stock_code, events=events)
     
     # 设置下载目录
     task_dir = args.output
+    crawler.download_dir = task_dir
     
     # 获取可下载的文件列表
     files = crawler.get_available_files(
@@ -58,12 +100,29 @@ def main():
         
     print(f"\n找到 {len(files)} 个文件:")
     for i, file in enumerate(files):
-        print(f"{i+1}. {file['标题']} ({file['发布日期']})")
+        print(f"{i+1}. {file['title']} ({file['date']:%Y-%m-%d})")
         
     # 下载所有文件
     print("\n开始下载...")
-    crawler.download_selected_files(list(range(len(files))), task_dir)
-    print("下载完成!")
+    reports_data = []
+    results = crawler.download_files(files)
+    for file, success in zip(files, results):
+        if success:
+            reports_data.append({
+                '序号': len(reports_data) + 1,
+                '文件名': os.path.basename(crawler.file_path(file)),
+                '发布日期': file['date'].strftime('%Y-%m-%d'),
+                '报告类型': file['type'],
+                '下载链接': file['download_url'],
+            })
+    print(f"下载完成! 成功 {len(reports_data)}/{len(files)} 个文件")
+    
+    # 生成报告清单
+    if reports_data:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        excel_file = os.path.join(task_dir, f"报告清单_{stock_code}_{timestamp}.xlsx")
+        crawler.write_manifest(reports_data, excel_file)
+        print(f"报告清单: {excel_file}")
 
 if __name__ == '__main__':
     main()
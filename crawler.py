@@ -2,11 +2,29 @@ import os
 import re
 import time
 import random
+import logging
 import requests
-import openpyxl
 from enum import Enum
 from datetime import datetime
-from openpyxl import styles
+from utils.events import (
+    EventBus, Message, PageRequested, PageFetched, ItemClassified,
+    DownloadStarted, DownloadProgress, DownloadFinished, BatchDownloadProgress,
+    text_subscriber, logging_subscriber, DEBUG, INFO, WARNING, ERROR
+)
+from utils.config_manager import ConfigManager
+from utils.metrics import MetricsRegistry
+from utils.profiling import span
+from utils.progress import BatchProgressTracker, ProgressThrottle
+from utils.proxy_pool import shared_pool
+
+_metrics = MetricsRegistry()
+REQUEST_SECONDS = _metrics.histogram('crawler_request_seconds', '公告列表请求耗时（秒）')
+REQUESTS_TOTAL = _metrics.counter('crawler_requests_total', '公告列表请求次数，按结果分类')
+RETRIES_TOTAL = _metrics.counter('crawler_retries_total', '公告列表请求重试次数')
+REPORTS_LISTED_TOTAL = _metrics.counter('crawler_reports_listed_total', '列出的公告条数')
+DOWNLOAD_SECONDS = _metrics.histogram('crawler_download_seconds', '单个文件下载耗时（秒）')
+DOWNLOAD_BYTES_TOTAL = _metrics.counter('crawler_download_bytes_total', '下载的字节数')
+DOWNLOADS_TOTAL = _metrics.counter('crawler_downloads_total', '下载的文件数，按结果分类')
 
 class ReportType(Enum):
     """报告类型枚举"""
@@ -36,16 +54,24 @@ class ReportType(Enum):
 
 class StockCrawler:
     """股票爬虫类"""
-    def __init__(self, stock_code, update_progress=None):
+    def __init__(self, stock_code, update_progress=None, events=None):
         """
         初始化爬虫
         
         Args:
             stock_code: 股票代码
-            update_progress: 更新进度的回调函数
+            update_progress: 更新进度的回调函数，接收一条文本消息（兼容旧接口）
+            events: 进度事件总线，为None时新建一个
         """
         self.stock_code = stock_code
-        self.update_progress = update_progress or print
+        self.events = events or EventBus()
+        if update_progress is not None:
+            self.events.subscribe(text_subscriber(update_progress))
+        
+        # 已配置日志处理器时，把进度事件同时写入日志
+        logger = logging.getLogger(__name__)
+        if logger.hasHandlers():
+            self.events.subscribe(logging_subscriber(logger), min_level=logger.getEffectiveLevel())
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -114,55 +140,56 @@ class StockCrawler:
             
             for retry in range(max_retries):
                 try:
-                    self.update_progress(f"正在请求第 {page_index} 页数据 (尝试 {retry + 1}/{max_retries})...")
-                    self.update_progress(f"请求URL: {request_url}")
+                    self.events.emit(PageRequested, report_type=report_type.report_name, page=page_index,
+                                     attempt=retry + 1, max_attempts=max_retries, url=request_url)
                     
                     # 使用递增的超时时间
                     timeout = 10 * (retry + 1)
-                    response = requests.get(url, params=params, headers=self.headers, timeout=timeout)
-                    self.update_progress(f"服务器响应状态码: {response.status_code}")
-                    
-                    # 打印原始响应数据用于调试
-                    self.update_progress(f"服务器响应数据: {response.text[:500]}")  # 只打印前500个字符避免日志过长
-                    
+                    if retry:
+                        RETRIES_TOTAL.inc()
+                    pool = shared_pool()
+                    proxy = pool.acquire()
+                    request_start = time.perf_counter()
+                    try:
+                        response = requests.get(url, params=params, headers=self.headers, timeout=timeout,
+                                                proxies=pool.proxies(proxy))
+                    except requests.exceptions.RequestException:
+                        pool.record(proxy, time.perf_counter() - request_start, success=False)
+                        raise
+                    finally:
+                        REQUEST_SECONDS.observe(time.perf_counter() - request_start)
+                    # 429 和 5xx 说明该出口被限流或代理异常，计入代理的错误率
+                    pool.record(proxy, time.perf_counter() - request_start,
+                                success=response.status_code < 500 and response.status_code != 429)
+                    REQUESTS_TOTAL.inc(status=response.status_code)
                     response.raise_for_status()
                     data = response.json()
                     
                     if not data:
-                        self.update_progress("API返回数据为空")
+                        self.events.emit(Message, level=WARNING, text="API返回数据为空")
                         return all_reports
                         
                     if 'data' not in data:
-                        self.update_progress(f"API返回数据格式异常: {data}")
+                        self.events.emit(Message, level=WARNING, text=f"API返回数据格式异常: {data}")
                         return all_reports
                         
                     if 'list' not in data['data']:
-                        self.update_progress("API返回数据中没有list字段")
+                        self.events.emit(Message, level=WARNING, text="API返回数据中没有list字段")
                         return all_reports
                         
                     reports = data['data']['list']
                     if not reports:
-                        self.update_progress("没有找到更多报告")
+                        self.events.emit(Message, text="没有找到更多报告")
                         return all_reports
-                        
-                    # 打印第一份报告的详细信息用于调试
-                    if reports and page_index == 1 and retry == 0:
-                        first_report = reports[0]
-                        self.update_progress("第一份报告详细信息:")
-                        for key, value in first_report.items():
-                            self.update_progress(f"  {key}: {value}")
                     
-                    # 打印所有报告的 art_code
-                    for report in reports:
-                        self.update_progress(f"报告标题: {report.get('title', '未知')}")
-                        self.update_progress(f"  art_code: {report.get('art_code', '未知')}")
-                        self.update_progress(f"  attachPath: {report.get('attachPath', '未知')}")
-                        self.update_progress(f"  公告编号: {report.get('bulletin_id', '未知')}")
-                        self.update_progress(f"  下载地址: https://pdf.dfcfw.com/pdf/H2_{report.get('art_code', '')}_1.pdf")
-                        self.update_progress("---")
+                    # 原始响应只在调试级别输出，避免无人查看时也截取和格式化
+                    preview = response.text[:500] if self.events.enabled(DEBUG) else ''
+                    self.events.emit(PageFetched, report_type=report_type.report_name, page=page_index,
+                                     status_code=response.status_code, count=len(reports), preview=preview)
                     
                     all_reports.extend(reports)
-                    self.update_progress(f"找到 {len(reports)} 份{report_type.report_name}")
+                    REPORTS_LISTED_TOTAL.inc(len(reports))
+                    self.events.flush()
                     
                     # 如果返回的数据少于page_size，说明已经是最后一页
                     if len(reports) < page_size:
@@ -174,26 +201,28 @@ class StockCrawler:
                     break  # 请求成功，跳出重试循环
                     
                 except requests.exceptions.Timeout:
+                    REQUESTS_TOTAL.inc(status='timeout')
                     if retry < max_retries - 1:
                         delay = base_delay * (retry + 1)  # 使用指数退避
-                        self.update_progress(f"请求超时，{delay}秒后进行第{retry + 2}次重试...")
+                        self.events.emit(Message, level=WARNING,
+                                         text=f"请求超时，{delay}秒后进行第{retry + 2}次重试...")
                         time.sleep(delay)
                     else:
-                        self.update_progress(f"请求超时，已达到最大重试次数")
+                        self.events.emit(Message, level=ERROR, text="请求超时，已达到最大重试次数")
                         return all_reports
                         
                 except requests.exceptions.RequestException as e:
                     if retry < max_retries - 1:
                         delay = base_delay * (retry + 1)
-                        self.update_progress(f"网络请求错误: {str(e)}")
-                        self.update_progress(f"{delay}秒后进行第{retry + 2}次重试...")
+                        self.events.emit(Message, level=WARNING,
+                                         text=f"网络请求错误: {str(e)}，{delay}秒后进行第{retry + 2}次重试...")
                         time.sleep(delay)
                     else:
-                        self.update_progress(f"网络请求错误，已达到最大重试次数: {str(e)}")
+                        self.events.emit(Message, level=ERROR, text=f"网络请求错误，已达到最大重试次数: {str(e)}")
                         return all_reports
                         
                 except Exception as e:
-                    self.update_progress(f"获取报告列表时出错: {str(e)}")
+                    self.events.emit(Message, level=ERROR, text=f"获取报告列表时出错: {str(e)}")
                     return all_reports
             
         return all_reports
@@ -231,11 +260,12 @@ class StockCrawler:
         for type_name in selected_types:
             report_type = ReportType.from_name(type_name)
             if report_type is None:
-                self.update_progress(f"未知的报告类型: {type_name}")
+                self.events.emit(Message, level=WARNING, text=f"未知的报告类型: {type_name}")
                 continue
                 
-            self.update_progress(f"正在获取{type_name}列表...")
-            report_list = self.get_report_list(start_date, end_date, report_type)
+            self.events.emit(Message, text=f"正在获取{type_name}列表...")
+            with span('listing', report_type=type_name):
+                report_list = self.get_report_list(start_date, end_date, report_type)
             
             # 获取当前报告类型的关键词列表
             keywords = {
@@ -254,110 +284,194 @@ class StockCrawler:
             filtered_count = 0
             total_count = len(report_list)
             
-            for report in report_list:
-                try:
-                    title = report['title']
-                    notice_date = report['notice_date']
-                    date = datetime.strptime(notice_date, '%Y-%m-%d %H:%M:%S')
+            with span('classifying', report_type=type_name, reports=total_count):
+                for report in report_list:
+                    try:
+                        title = report['title']
+                        notice_date = report['notice_date']
+                        date = datetime.strptime(notice_date, '%Y-%m-%d %H:%M:%S')
                     
-                    # 检查年份（如果不是IPO相关报告）
-                    is_ipo_report = report_type in [ReportType.IPO_PROSPECTUS, ReportType.IPO_INQUIRY]
-                    if not is_ipo_report and years and date.year not in years:
-                        filtered_count += 1
-                        continue
+                        # 检查年份（如果不是IPO相关报告）
+                        is_ipo_report = report_type in [ReportType.IPO_PROSPECTUS, ReportType.IPO_INQUIRY]
+                        if not is_ipo_report and years and date.year not in years:
+                            filtered_count += 1
+                            self.events.emit(ItemClassified, report_type=type_name, title=title,
+                                             art_code=report.get('art_code', ''), matched=False, reason='年份不符')
+                            continue
                         
-                    # 检查报告类型（放宽匹配条件）
-                    matched = False
-                    if keywords:
-                        # 1. 检查完整关键词匹配
-                        if any(keyword in title for keyword in keywords):
-                            matched = True
-                        # 2. 对于问询函和回复，使用更宽松的匹配
-                        elif report_type == ReportType.IPO_INQUIRY:
-                            matched = "问询" in title or "回复" in title
-                        # 3. 对于年报，检查年份+报告的组合
-                        elif report_type == ReportType.ANNUAL and str(date.year) in title and "报告" in title:
-                            matched = True
-                        # 4. 对于季报，检查季度+报告的组合
-                        elif report_type in [ReportType.Q1, ReportType.Q3]:
-                            quarter_keywords = ["一季", "1季", "三季", "3季"] if report_type == ReportType.Q1 else ["三季", "3季"]
-                            matched = any(qk in title and "报告" in title for qk in quarter_keywords)
-                    else:
-                        matched = True  # 如果没有关键词，则默认匹配
+                        # 检查报告类型（放宽匹配条件）
+                        matched = False
+                        if keywords:
+                            # 1. 检查完整关键词匹配
+                            if any(keyword in title for keyword in keywords):
+                                matched = True
+                            # 2. 对于问询函和回复，使用更宽松的匹配
+                            elif report_type == ReportType.IPO_INQUIRY:
+                                matched = "问询" in title or "回复" in title
+                            # 3. 对于年报，检查年份+报告的组合
+                            elif report_type == ReportType.ANNUAL and str(date.year) in title and "报告" in title:
+                                matched = True
+                            # 4. 对于季报，检查季度+报告的组合
+                            elif report_type in [ReportType.Q1, ReportType.Q3]:
+                                quarter_keywords = ["一季", "1季", "三季", "3季"] if report_type == ReportType.Q1 else ["三季", "3季"]
+                                matched = any(qk in title and "报告" in title for qk in quarter_keywords)
+                        else:
+                            matched = True  # 如果没有关键词，则默认匹配
                         
-                    if not matched:
-                        filtered_count += 1
-                        continue
+                        self.events.emit(ItemClassified, report_type=type_name, title=title,
+                                         art_code=report.get('art_code', ''), matched=matched,
+                                         reason='' if matched else '标题不符')
+                        if not matched:
+                            filtered_count += 1
+                            continue
                         
-                    # 获取文件大小（以MB为单位）
-                    file_size = report.get('file_size', 0)
-                    if file_size:
-                        size_str = f"{file_size / 1024 / 1024:.2f}MB"
-                    else:
-                        size_str = "未知"
+                        # 获取文件大小（以MB为单位）
+                        file_size = report.get('file_size', 0)
+                        if file_size:
+                            size_str = f"{file_size / 1024 / 1024:.2f}MB"
+                        else:
+                            size_str = "未知"
                         
-                    available_files.append({
-                        'title': title,
-                        'date': date,
-                        'type': type_name,
-                        'size': size_str,
-                        'art_code': report['art_code'],
-                        'download_url': f"https://pdf.dfcfw.com/pdf/H2_{report['art_code']}_1.pdf"  # 修改下载链接格式
-                    })
+                        available_files.append({
+                            'title': title,
+                            'date': date,
+                            'type': type_name,
+                            'size': size_str,
+                            'file_size': file_size or 0,
+                            'art_code': report['art_code'],
+                            'download_url': f"https://pdf.dfcfw.com/pdf/H2_{report['art_code']}_1.pdf"  # 修改下载链接格式
+                        })
                     
-                except (ValueError, TypeError, KeyError) as e:
-                    self.update_progress(f"处理报告数据时出错: {str(e)}")
-                    continue
+                    except (ValueError, TypeError, KeyError) as e:
+                        self.events.emit(Message, level=WARNING, text=f"处理报告数据时出错: {str(e)}")
+                        continue
             
             if filtered_count > 0:
-                self.update_progress(f"在{total_count}份文件中过滤掉{filtered_count}份不符合条件的文件")
+                self.events.emit(Message, text=f"在{total_count}份文件中过滤掉{filtered_count}份不符合条件的文件")
+            self.events.flush()
                 
-        self.update_progress(f"共找到 {len(available_files)} 个可下载文件")
+        self.events.emit(Message, text=f"共找到 {len(available_files)} 个可下载文件")
+        self.events.flush()
         self.available_files = available_files  # 添加这一行
         return available_files
 
-    def download_file(self, file_info):
-        """下载单个文件"""
+    def file_path(self, file_info):
+        """文件下载后的保存路径"""
+        filename = f"{file_info['title']}_{file_info['date']}.pdf"
+        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)  # 替换非法字符
+        return os.path.join(self.download_dir, filename)
+
+    def download_files(self, files):
+        """依次下载多个文件，并以 BatchDownloadProgress 事件发布整批的汇总进度
+
+        汇总进度按 download.progress_interval 的间隔发布，有文件完成时立即发布。
+
+        Returns:
+            与 files 顺序一致的下载结果列表
+        """
+        settings = ConfigManager().snapshot().download
+        files_done = 0
+
+        def publish(progress):
+            nonlocal files_done
+            level = INFO if progress.files_done != files_done else DEBUG
+            files_done = progress.files_done
+            self.events.emit(BatchDownloadProgress, level=level, progress=progress)
+
+        tracker = BatchProgressTracker(publish, interval=settings.progress_interval,
+                                       min_bytes=settings.progress_min_bytes, publish_on_finish=True)
+        tracker.start([self._progress_name(file_info) for file_info in files])
+        results = [self.download_file(file_info, tracker) for file_info in files]
+        self.events.flush()
+        return results
+
+    def _progress_name(self, file_info):
+        return os.path.basename(self.file_path(file_info))
+
+    def download_file(self, file_info, tracker=None):
+        """下载单个文件
+
+        Args:
+            file_info: get_available_files 返回的文件信息
+            tracker: 整批下载的进度汇总，由 download_files 传入
+        """
+        success = False
+        try:
+            with span('download', title=file_info.get('title', '')):
+                success = self._download_file(file_info, tracker)
+            return success
+        finally:
+            if tracker is not None:
+                tracker.finish(self._progress_name(file_info), success)
+
+    def _download_file(self, file_info, tracker=None):
         try:
             if not file_info.get('art_code'):
-                self.update_progress(f"错误：无法获取文件的 art_code: {file_info}")
+                self.events.emit(Message, level=ERROR, text=f"错误：无法获取文件的 art_code: {file_info}")
                 return False
 
             # 构建下载链接
             download_url = f"https://pdf.dfcfw.com/pdf/H2_{file_info['art_code']}_1.pdf"
-            self.update_progress(f"尝试下载文件: {file_info['title']}")
-            self.update_progress(f"下载链接: {download_url}")
+            self.events.emit(DownloadStarted, title=file_info['title'], url=download_url)
 
             # 创建下载目录
             os.makedirs(self.download_dir, exist_ok=True)
             
-            # 构建文件名
-            filename = f"{file_info['title']}_{file_info['date']}.pdf"
-            filename = re.sub(r'[<>:"/\\|?*]', '_', filename)  # 替换非法字符
-            filepath = os.path.join(self.download_dir, filename)
+            filepath = self.file_path(file_info)
             
             # 使用 stream 方式下载文件
-            response = requests.get(download_url, headers=self.headers, stream=True)
+            pool = shared_pool()
+            proxy = pool.acquire()
+            download_start = time.perf_counter()
+            try:
+                response = requests.get(download_url, headers=self.headers, stream=True,
+                                        proxies=pool.proxies(proxy))
+            except requests.exceptions.RequestException:
+                pool.record(proxy, time.perf_counter() - download_start, success=False)
+                raise
+            pool.record(proxy, time.perf_counter() - download_start,
+                        success=response.status_code < 500 and response.status_code != 429)
             response.raise_for_status()
             
             # 获取文件大小
             total_size = int(response.headers.get('content-length', 0))
-            self.update_progress(f"文件大小: {total_size / 1024 / 1024:.2f} MB")
+            report_progress = self.events.enabled(DownloadProgress.level)
+            # 每个文件开始时取一次当前配置，热加载后的修改对之后的下载生效
+            settings = ConfigManager().snapshot().download
+            throttle = ProgressThrottle(settings.progress_interval, settings.progress_min_bytes)
+            progress_name = self._progress_name(file_info)
+            downloaded_size = 0
             
             # 写入文件
             with open(filepath, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
                         f.write(chunk)
+                        downloaded_size += len(chunk)
+                        if tracker is not None:
+                            tracker.update(progress_name, downloaded_size, total_size)
+                        if report_progress and throttle.should_report(downloaded_size, total_size):
+                            self.events.emit(DownloadProgress, title=file_info['title'],
+                                             downloaded=downloaded_size, total=total_size)
             
-            self.update_progress(f"文件已保存到: {filepath}")
+            DOWNLOAD_SECONDS.observe(time.perf_counter() - download_start)
+            DOWNLOAD_BYTES_TOTAL.inc(downloaded_size)
+            DOWNLOADS_TOTAL.inc(result='success')
+            self.events.emit(DownloadFinished, title=file_info['title'], path=filepath, success=True)
+            self.events.flush()
             return True
             
         except requests.exceptions.RequestException as e:
-            self.update_progress(f"下载文件时发生网络错误: {str(e)}")
+            DOWNLOADS_TOTAL.inc(result='network_error')
+            self.events.emit(DownloadFinished, level=ERROR, title=file_info.get('title', ''), path='',
+                             success=False, error=f"网络错误: {str(e)}")
+            self.events.flush()
             return False
         except Exception as e:
-            self.update_progress(f"下载文件时发生错误: {str(e)}")
+            DOWNLOADS_TOTAL.inc(result='error')
+            self.events.emit(DownloadFinished, level=ERROR, title=file_info.get('title', ''), path='',
+                             success=False, error=str(e))
+            self.events.flush()
             return False
 
     def crawl_reports(self, years=None, selected_types=None, stock_name=None):
@@ -406,10 +520,11 @@ class StockCrawler:
         for type_name in selected_types:
             report_type = ReportType.from_name(type_name)
             if report_type is None:
-                self.update_progress(f"未知的报告类型: {type_name}")
+                self.events.emit(Message, level=WARNING, text=f"未知的报告类型: {type_name}")
                 continue
                 
-            report_list = self.get_report_list(start_date, end_date, report_type)
+            with span('listing', report_type=type_name):
+                report_list = self.get_report_list(start_date, end_date, report_type)
             pattern = {
                 ReportType.ANNUAL: ["年度报告", "年报"],
                 ReportType.SEMI_ANNUAL: ["半年度报告", "半年报"],
@@ -444,12 +559,13 @@ class StockCrawler:
                     time.sleep(random.uniform(1, 2))
                     
                     # 下载PDF文件
-                    pdf_response = requests.get(download_url, headers=self.headers)
+                    with span('download', title=title):
+                        pdf_response = requests.get(download_url, headers=self.headers)
                     if pdf_response.status_code == 200:
                         filename = os.path.join(task_dir, f"{title}_{date.strftime('%Y%m%d')}.pdf")
                         with open(filename, 'wb') as f:
                             f.write(pdf_response.content)
-                        self.update_progress(f"已下载: {filename}")
+                        self.events.emit(DownloadFinished, title=title, path=filename, success=True)
                         
                         reports_data.append({
                             '序号': len(reports_data) + 1,
@@ -460,12 +576,31 @@ class StockCrawler:
                         })
                         
                 except (ValueError, TypeError) as e:
-                    self.update_progress(f"处理日期时出错 ({notice_date}): {str(e)}")
+                    self.events.emit(Message, level=WARNING, text=f"处理日期时出错 ({notice_date}): {str(e)}")
                     continue
+            self.events.flush()
                     
         # 生成Excel报告
         if reports_data:
             excel_file = os.path.join(task_dir, f"报告清单_{self.stock_code}_{timestamp}.xlsx")
+            self.write_manifest(reports_data, excel_file)
+            return excel_file
+            
+        return None
+
+    def write_manifest(self, reports_data, excel_file):
+        """
+        把已下载报告的信息写入Excel清单
+        
+        Args:
+            reports_data: 报告信息列表，每项包含序号、文件名、发布日期、报告类型、下载链接
+            excel_file: Excel文件路径
+        """
+        # openpyxl 只在生成清单时才需要，延迟导入以加快启动
+        with span('manifest', reports=len(reports_data)):
+            import openpyxl
+            from openpyxl import styles
+            
             wb = openpyxl.Workbook()
             ws = wb.active
             ws.title = "报告清单"
@@ -498,11 +633,8 @@ class StockCrawler:
                 ws.column_dimensions[col[0].column_letter].width = min(adjusted_width, 50)
                 
             wb.save(excel_file)
-            return excel_file
-            
-        return None
 
 if __name__ == "__main__":
     # 测试代码
-    crawler = StockCrawler("300903")
+    crawler = StockCrawler("300903", print)
     crawler.crawl_reports()
@@ -1,17 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import Calendar
-import json
 from datetime import datetime
 import threading
 import subprocess
 import platform
 import os
-import re
 from crawler import StockCrawler, ReportType
-import requests
+from utils.stock_index import StockIndex
+from utils.file_table import FileTableModel
+from utils.log_buffer import LogBuffer
+from utils.events import EventBus, text_subscriber
+from utils.config_manager import ConfigManager
+from utils.logger import Logger
 
 class StockCrawlerGUI:
+    LOG_CAPACITY = 20000  # 日志缓冲区最多保留的条数
+    LOG_VISIBLE_LINES = 1000  # 日志文本框最多显示的行数
+    LOG_FLUSH_INTERVAL = 100  # 日志刷新到界面的间隔（毫秒）
+    EVENT_BATCH_SIZE = 20  # 爬虫进度事件的批量投递大小
+    
     def __init__(self, root):
         self.root = root
         self.root.title("股票财务报告下载器")
@@ -19,16 +26,26 @@ class StockCrawlerGUI:
         
         # 加载股票代码
         try:
-            with open('stock_codes.json', 'r', encoding='utf-8') as f:
-                self.stock_codes = json.load(f)
+            self.stock_codes = StockIndex('stock_codes.json')
         except FileNotFoundError:
-            self.stock_codes = {}
+            self.stock_codes = None
             messagebox.showwarning("警告", "未找到股票代码文件，请先运行update_stock_list.py更新股票列表")
         
         # 创建爬虫实例
         self.crawler = None
         self.is_crawling = False
         
+        # 监视配置文件，修改后不需要重启即可生效
+        ConfigManager().watch()
+        
+        # 文件列表数据模型，视图只渲染可见的行
+        self.file_model = FileTableModel()
+        self._file_list_offset = 0
+        self._file_list_rows = 20
+        
+        # 日志先写入环形缓冲区，再由定时器批量刷新到界面
+        self.log_buffer = LogBuffer(self.LOG_CAPACITY)
+        
         # 创建主框架
         self.main_frame = ttk.Frame(root, padding="10")
         self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -74,6 +91,9 @@ class StockCrawlerGUI:
         # 绑定关闭窗口事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # 启动日志刷新定时器
+        self.root.after(self.LOG_FLUSH_INTERVAL, self.flush_progress_log)
+        
     def create_stock_search_frame(self, parent):
         # 股票输入框
         ttk.Label(parent, text="股票名称或代码:").grid(row=0, column=0, sticky=tk.W, pady=5)
@@ -162,7 +182,8 @@ class StockCrawlerGUI:
         
         # 创建文件列表
         columns = ('title', 'date', 'type', 'size', 'status')
-        self.file_list = ttk.Treeview(file_list_frame, columns=columns, show='headings')
+        self.file_list = ttk.Treeview(file_list_frame, columns=columns, show='headings',
+                                      height=self._file_list_rows)
         
         # 设置列标题
         self.file_list.heading('title', text='标题', command=lambda: self.sort_file_list('title'))
@@ -178,13 +199,20 @@ class StockCrawlerGUI:
         self.file_list.column('size', width=80, minwidth=80)
         self.file_list.column('status', width=80, minwidth=80)
         
-        # 创建滚动条
-        scrollbar = ttk.Scrollbar(file_list_frame, orient=tk.VERTICAL, command=self.file_list.yview)
-        self.file_list.configure(yscrollcommand=scrollbar.set)
+        # 创建滚动条，滚动位置由数据模型决定而不是由 Treeview 决定
+        self.file_list_scrollbar = ttk.Scrollbar(file_list_frame, orient=tk.VERTICAL,
+                                                 command=self.on_file_list_scroll)
         
         # 布局
         self.file_list.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.file_list_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        # 绑定尺寸变化、滚轮和选择事件
+        self.file_list.bind('<Configure>', self.on_file_list_resize)
+        self.file_list.bind('<MouseWheel>', self.on_file_list_wheel)
+        self.file_list.bind('<Button-4>', self.on_file_list_wheel)
+        self.file_list.bind('<Button-5>', self.on_file_list_wheel)
+        self.file_list.bind('<<TreeviewSelect>>', self.on_file_list_select)
         
         # 配置网格权重
         file_list_frame.grid_columnconfigure(0, weight=1)
@@ -266,14 +294,74 @@ class StockCrawlerGUI:
         self.progress_text.tag_configure("ERROR", foreground="red")
         self.progress_text.tag_configure("SUCCESS", foreground="green")
         
+    def render_file_list(self):
+        """根据数据模型渲染当前可见的行"""
+        total = self.file_model.row_count
+        max_offset = max(0, total - self._file_list_rows)
+        self._file_list_offset = min(max(0, self._file_list_offset), max_offset)
+        
+        self.file_list.delete(*self.file_list.get_children())
+        visible = self.file_model.visible_rows(self._file_list_offset, self._file_list_rows)
+        for art_code in visible:
+            self.file_list.insert('', 'end', iid=art_code, values=self.file_model.row_values(art_code))
+        
+        selected = [art_code for art_code in visible if art_code in self.file_model.selection]
+        if selected:
+            self.file_list.selection_set(selected)
+        
+        # 更新滚动条位置
+        if total:
+            first = self._file_list_offset / total
+            last = min(1.0, (self._file_list_offset + self._file_list_rows) / total)
+        else:
+            first, last = 0.0, 1.0
+        self.file_list_scrollbar.set(first, last)
+        
+    def on_file_list_scroll(self, action, amount, unit=None):
+        """处理滚动条拖动和点击"""
+        if action == 'moveto':
+            self._file_list_offset = int(float(amount) * self.file_model.row_count)
+        elif action == 'scroll':
+            step = self._file_list_rows if unit == 'pages' else 1
+            self._file_list_offset += int(amount) * step
+        self.render_file_list()
+        
+    def on_file_list_wheel(self, event):
+        """处理鼠标滚轮"""
+        if event.num == 4 or event.delta > 0:
+            self._file_list_offset -= 3
+        else:
+            self._file_list_offset += 3
+        self.render_file_list()
+        return 'break'
+        
+    def on_file_list_resize(self, event):
+        """窗口尺寸变化时重新计算可见行数"""
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        rows = max(1, (event.height - 25) // row_height)
+        if rows != self._file_list_rows:
+            self._file_list_rows = rows
+            self.file_list.configure(height=rows)
+            self.render_file_list()
+            
+    def on_file_list_select(self, event=None):
+        """把可见行的选择状态同步到数据模型"""
+        selected = set(self.file_list.selection())
+        for art_code in self.file_list.get_children():
+            if art_code in selected:
+                self.file_model.selection.add(art_code)
+            else:
+                self.file_model.selection.discard(art_code)
+                
     def select_all_files(self):
         """全选文件列表"""
-        for item in self.file_list.get_children():
-            self.file_list.selection_add(item)
+        self.file_model.select_all()
+        self.render_file_list()
             
     def deselect_all_files(self):
         """取消全选文件列表"""
-        self.file_list.selection_remove(*self.file_list.get_children())
+        self.file_model.deselect_all()
+        self.render_file_list()
         
     def toggle_pause(self):
         """切换暂停/继续状态"""
@@ -323,8 +411,8 @@ class StockCrawlerGUI:
                 return
         
         # 清空文件列表
-        for item in self.file_list.get_children():
-            self.file_list.delete(item)
+        self.file_model.clear()
+        self.render_file_list()
         
         # 禁用按钮，防止重复点击
         self.start_button.configure(state=tk.DISABLED)
@@ -337,7 +425,10 @@ class StockCrawlerGUI:
         def crawl_thread():
             try:
                 # 创建爬虫实例
-                self.crawler = StockCrawler(self.selected_stock['code'], self.update_progress)
+                events = EventBus()
+                events.subscribe(text_subscriber(self.update_progress, with_level=True),
+                                 batch_size=self.EVENT_BATCH_SIZE)
+                self.crawler = StockCrawler(self.selected_stock['code'], events=events)
                 
                 # 获取可下载的文件列表
                 self.update_progress("正在获取可下载文件列表...")
@@ -355,20 +446,11 @@ class StockCrawlerGUI:
                 
                 def update_gui():
                     try:
-                        # 清空现有的文件列表
-                        for item in self.file_list.get_children():
-                            self.file_list.delete(item)
-                            
-                        # 显示文件列表
-                        for file_info in available_files:
-                            values = (
-                                file_info['title'],
-                                file_info['date'].strftime('%Y-%m-%d'),
-                                file_info['type'],
-                                file_info['size'],
-                                '未下载'
-                            )
-                            self.file_list.insert('', 'end', values=values)
+                        # 加载到数据模型并显示文件列表
+                        self.file_model.load(available_files)
+                        self.file_model.filter(self.search_var.get())
+                        self._file_list_offset = 0
+                        self.render_file_list()
                             
                         self.update_progress(f"找到 {len(available_files)} 个可下载文件")
                         
@@ -397,25 +479,22 @@ class StockCrawlerGUI:
         
     def download_selected_files(self):
         """下载选中的文件"""
-        selected_items = self.file_list.selection()
-        if not selected_items:
+        selected_files = self.file_model.selected_files()
+        if not selected_files:
             messagebox.showwarning("提示", "请先选择要下载的文件")
             return
             
-        total_files = len(selected_items)
+        total_files = len(selected_files)
         success_count = 0
         
-        for item in selected_items:
-            file_info = self.file_list.item(item)['values']
-            # 查找对应的完整文件信息
-            full_file_info = next(
-                (f for f in self.crawler.available_files if f['title'] == file_info[0]),
-                None
-            )
-            
-            if full_file_info:
-                if self.crawler.download_file(full_file_info):
-                    success_count += 1
+        results = self.crawler.download_files(selected_files)
+        for file_info, success in zip(selected_files, results):
+            if success:
+                success_count += 1
+                self.file_model.set_status(file_info['art_code'], '已下载')
+            else:
+                self.file_model.set_status(file_info['art_code'], '下载失败')
+        self.render_file_list()
                     
         # 显示下载完成的消息框，并询问是否打开下载文件夹
         if success_count > 0:
@@ -454,17 +533,10 @@ class StockCrawlerGUI:
         search_text = self.stock_entry.get().strip()
         self.stock_listbox.delete(0, tk.END)
         
-        if search_text:
-            # 搜索匹配的股票
-            matches = []
-            for name, code in self.stock_codes.items():
-                if search_text in name or search_text in code:
-                    matches.append(f"{name} ({code})")
-                if len(matches) >= 10:  # 限制显示数量
-                    break
-            
-            for match in matches:
-                self.stock_listbox.insert(tk.END, match)
+        if search_text and self.stock_codes is not None:
+            # 搜索匹配的股票，限制显示数量
+            for name, code in self.stock_codes.search(search_text, limit=10):
+                self.stock_listbox.insert(tk.END, f"{name} ({code})")
                 
     def on_stock_select(self, event):
         """处理股票选择事件"""
@@ -479,90 +551,54 @@ class StockCrawlerGUI:
             }
             
     def update_progress(self, message, level="INFO"):
-        """更新进度显示"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_entry = f"[{timestamp}] [{level}] {message}\n"
-        
-        # 如果当前日志级别符合筛选条件
-        if self.log_level_var.get() == "ALL" or level == self.log_level_var.get():
-            self.progress_text.insert(tk.END, log_entry, level)
-            if self.auto_scroll_var.get():
-                self.progress_text.see(tk.END)
+        """更新进度显示，可以在任意线程中调用"""
+        self.log_buffer.append(message, level)
+        
+    def flush_progress_log(self):
+        """把新写入的日志批量刷新到文本框"""
+        try:
+            pending = self.log_buffer.drain_pending()
+            selected_level = self.log_level_var.get()
+            if selected_level != "ALL":
+                pending = [entry for entry in pending if entry[2] == selected_level]
+            if pending:
+                self._insert_log_entries(pending[-self.LOG_VISIBLE_LINES:])
+        finally:
+            self.root.after(self.LOG_FLUSH_INTERVAL, self.flush_progress_log)
+            
+    def _insert_log_entries(self, entries):
+        """向文本框追加日志，并只保留最后 LOG_VISIBLE_LINES 行"""
+        for entry in entries:
+            self.progress_text.insert(tk.END, LogBuffer.format_entry(entry), entry[2])
+        
+        line_count = int(self.progress_text.index('end-1c').split('.')[0]) - 1
+        if line_count > self.LOG_VISIBLE_LINES:
+            self.progress_text.delete(1.0, f"{line_count - self.LOG_VISIBLE_LINES + 1}.0")
+        if self.auto_scroll_var.get():
+            self.progress_text.see(tk.END)
                 
     def clear_progress_log(self):
         """清空进度日志"""
+        self.log_buffer.clear()
         self.progress_text.delete(1.0, tk.END)
         
     def filter_log(self, event=None):
-        """根据日志级别筛选显示"""
-        # 保存当前内容
-        content = self.progress_text.get(1.0, tk.END)
-        lines = content.split('\n')
+        """根据日志级别筛选显示，只渲染该级别最近的日志"""
         self.progress_text.delete(1.0, tk.END)
-        
-        selected_level = self.log_level_var.get()
-        for line in lines:
-            if line.strip():
-                if selected_level == "ALL" or f"[{selected_level}]" in line:
-                    level = "INFO"
-                    if "[WARNING]" in line:
-                        level = "WARNING"
-                    elif "[ERROR]" in line:
-                        level = "ERROR"
-                    self.progress_text.insert(tk.END, line + '\n', level)
+        entries = self.log_buffer.tail(self.log_level_var.get(), self.LOG_VISIBLE_LINES)
+        self._insert_log_entries(entries)
                     
     def sort_file_list(self, column):
-        """排序文件列表"""
-        items = [(self.file_list.set(child, column), child) for child in self.file_list.get_children()]
-        
-        # 如果是第一次点击，按升序排序；再次点击同一列，按降序排序
-        reverse = False
-        if hasattr(self, '_sort_column') and self._sort_column == column:
-            reverse = not getattr(self, '_sort_reverse', False)
-        self._sort_column = column
-        self._sort_reverse = reverse
-        
-        # 特殊处理日期和大小列
-        if column == 'date':
-            items.sort(key=lambda x: datetime.strptime(x[0], '%Y-%m-%d'), reverse=reverse)
-        elif column == 'size':
-            def size_to_bytes(size_str):
-                if size_str == '未知':
-                    return -1
-                try:
-                    number = float(size_str.replace('MB', ''))
-                    return number
-                except ValueError:
-                    return -1
-            items.sort(key=lambda x: size_to_bytes(x[0]), reverse=reverse)
-        else:
-            items.sort(key=lambda x: x[0].lower(), reverse=reverse)
-        
-        # 重新排列项目
-        for index, (_, child) in enumerate(items):
-            self.file_list.move(child, '', index)
+        """排序文件列表，再次点击同一列时切换升降序"""
+        self.file_model.sort(column)
+        self._file_list_offset = 0
+        self.render_file_list()
             
     def filter_file_list(self, *args):
         """过滤文件列表"""
-        search_text = self.search_var.get().lower()
-        children = self.file_list.get_children()
-        
-        # 如果搜索框为空，显示所有项目
-        if not search_text:
-            for child in children:
-                self.file_list.reattach(child, '', 'end')
-            return
-        
-        # 否则，只显示匹配的项目
-        for child in children:
-            values = [
-                self.file_list.set(child, col).lower()
-                for col in ('title', 'type', 'date')
-            ]
-            if any(search_text in value for value in values):
-                self.file_list.reattach(child, '', 'end')
-            else:
-                self.file_list.detach(child)
+        self.file_model.filter(self.search_var.get())
+        self._file_list_offset = 0
+        self.render_file_list()
                 
     def show_file_list_menu(self, event):
         """显示文件列表右键菜单"""
@@ -575,7 +611,7 @@ class StockCrawlerGUI:
         """复制选中文件的标题"""
         selection = self.file_list.selection()
         if selection:
-            title = self.file_list.item(selection[0])['values'][0]
+            title = self.file_model.get(selection[0])['title']
             self.root.clipboard_clear()
             self.root.clipboard_append(title)
             
@@ -583,7 +619,7 @@ class StockCrawlerGUI:
         """复制选中文件的发布日期"""
         selection = self.file_list.selection()
         if selection:
-            date = self.file_list.item(selection[0])['values'][1]
+            date = self.file_model.row_values(selection[0])[1]
             self.root.clipboard_clear()
             self.root.clipboard_append(date)
             
@@ -605,23 +641,18 @@ class StockCrawlerGUI:
         """选择相同类型的报告"""
         selection = self.file_list.selection()
         if selection:
-            selected_type = self.file_list.item(selection[0])['values'][2]
-            self.file_list.selection_remove(*self.file_list.selection())
-            for item in self.file_list.get_children():
-                if self.file_list.item(item)['values'][2] == selected_type:
-                    self.file_list.selection_add(item)
+            selected_type = self.file_model.get(selection[0])['type']
+            self.file_model.select_where('type', selected_type)
+            self.render_file_list()
 
     def select_same_year(self):
         """选择相同年份的报告"""
         selection = self.file_list.selection()
         if selection:
-            selected_date = self.file_list.item(selection[0])['values'][1]
+            selected_date = self.file_model.row_values(selection[0])[1]
             selected_year = selected_date.split('-')[0]
-            self.file_list.selection_remove(*self.file_list.selection())
-            for item in self.file_list.get_children():
-                item_date = self.file_list.item(item)['values'][1]
-                if item_date.startswith(selected_year):
-                    self.file_list.selection_add(item)
+            self.file_model.select_where('date', selected_year)
+            self.render_file_list()
 
     def export_log(self):
         """导出日志到文件"""
@@ -629,7 +660,7 @@ class StockCrawlerGUI:
         filename = f"crawler_log_{timestamp}.txt"
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                f.write(self.progress_text.get(1.0, tk.END))
+                f.writelines(LogBuffer.format_entry(entry) for entry in self.log_buffer.entries())
             self.update_progress(f"日志已导出到: {filename}", "SUCCESS")
             if messagebox.askyesno("完成", "日志导出成功，是否打开日志文件？"):
                 self.open_excel_file(filename)
@@ -637,6 +668,8 @@ class StockCrawlerGUI:
             self.update_progress(f"导出日志失败: {str(e)}", "ERROR")
             
 if __name__ == "__main__":
+    # 配置日志系统，爬虫的进度事件同时写入日志文件
+    Logger()
     root = tk.Tk()
     app = StockCrawlerGUI(root)
     root.mainloop()
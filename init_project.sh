@@ -21,7 +21,7 @@ source venv/bin/activate
 python3 -m pip install --upgrade pip
 
 # 安装基本依赖
-pip install requests pandas tkcalendar openpyxl
+pip install requests pandas pyarrow openpyxl
 
 # 安装高级功能依赖
 pip install PyPDF2 matplotlib pdfplumber cryptography aiohttp PyYAML schedule
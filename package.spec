@@ -14,8 +14,8 @@ a = Analysis(
     ],
     hiddenimports=[
         'tkinter',
-        'tkcalendar',
         'pandas',
+        'pyarrow',
         'requests',
         'beautifulsoup4',
         'PyPDF2',
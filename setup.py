@@ -9,7 +9,7 @@ DATA_FILES = [
 ]
 OPTIONS = {
     'argv_emulation': True,
-    'packages': ['tkinter', 'requests', 'pandas', 'tkcalendar'],
+    'packages': ['tkinter', 'requests', 'pandas'],
     'plist': {
         'CFBundleName': '股票报告下载器',
         'CFBundleDisplayName': '股票报告下载器',
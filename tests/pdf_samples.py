@@ -0,0 +1,31 @@
+"""测试用的纯文本PDF生成函数"""
+
+
+def write_text_pdf(path, pages, font_size=9, leading=14):
+    """生成每页为若干行文字的PDF，pages 为各页的文本行列表，只支持 ASCII 字符"""
+    objects = {1: b'<< /Type /Catalog /Pages 2 0 R >>',
+               3: b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'}
+    kids = []
+    for n, lines in enumerate(pages):
+        rows = [f'BT /F1 {font_size} Tf 40 {800 - leading * i} Td ({line}) Tj ET' for i, line in enumerate(lines)]
+        stream = '\n'.join(rows).encode()
+        content_id, page_id = 4 + 2 * n, 5 + 2 * n
+        objects[content_id] = b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream)
+        objects[page_id] = (b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id)
+        kids.append(page_id)
+    objects[2] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(pages))
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, objects[number])
+    xref = len(out)
+    size = max(objects) + 1
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for number in range(1, size):
+        out += b'%010d 00000 n \n' % offsets[number]
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref)
+    path.write_bytes(bytes(out))
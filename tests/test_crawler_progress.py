@@ -0,0 +1,51 @@
+import datetime
+
+import pytest
+
+pytest.importorskip('requests')
+
+import crawler
+from utils.events import BatchDownloadProgress, DEBUG, EventBus, INFO
+
+
+class _Response:
+    status_code = 200
+    headers = {'content-length': str(3 * 8192)}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for _ in range(3):
+            yield b'x' * 8192
+
+
+class _Pool:
+    def acquire(self):
+        return None
+
+    def proxies(self, state):
+        return None
+
+    def record(self, state, latency, success):
+        pass
+
+
+def test_download_files_publishes_batch_progress(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(crawler, 'shared_pool', _Pool)
+    monkeypatch.setattr(crawler.requests, 'get', lambda *args, **kwargs: _Response())
+
+    events = EventBus()
+    received = []
+    events.subscribe(received.extend, min_level=DEBUG)
+    stock_crawler = crawler.StockCrawler('000001', events=events)
+    files = [{'title': f'报告{i}', 'date': datetime.date(2024, 4, i + 1), 'art_code': f'AN{i}'}
+             for i in range(2)]
+
+    assert stock_crawler.download_files(files) == [True, True]
+    batches = [event for event in received if isinstance(event, BatchDownloadProgress)]
+    done = [event.progress for event in batches if event.level == INFO]
+    assert [progress.files_done for progress in done] == [1, 2]
+    assert done[-1].bytes_done == 2 * 3 * 8192
+    assert done[-1].files_failed == 0
@@ -0,0 +1,53 @@
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from utils.period_panel import derive_quarters, latest_records
+from utils.statement_store import StatementStore, statements_to_records
+
+
+def _statement(labels, values):
+    return pd.DataFrame({'货币资金': values}, index=pd.Index(labels, name='报告期'))
+
+
+def _value(frame, period):
+    row = frame[frame['period'] == pd.Timestamp(period)]
+    assert len(row) == 1
+    return row['value'].iloc[0]
+
+
+def test_interim_comparative_does_not_override_annual_figure(tmp_path):
+    store = StatementStore(str(tmp_path / 'store'))
+    store.append_statements('000001', '2022-12-31', 'AN202303300001', {
+        '资产负债表': _statement(['期末余额', '期初余额'], [450.0, 400.0]),
+    })
+    # 之后发布的一季度报告中的上年年末余额与年报不一致
+    store.append_statements('000001', '2023-03-31', 'AN202304280001', {
+        '资产负债表': _statement(['期末余额', '上年年末余额'], [520.0, 999.0]),
+    })
+    frame = latest_records(store.query())
+    assert _value(frame, '2022-12-31') == 450.0
+    assert _value(frame, '2023-03-31') == 520.0
+    # 没有其他来源的比较数仍然保留
+    assert _value(frame, '2021-12-31') == 400.0
+
+
+def test_restated_comparative_wins_for_same_fiscal_period():
+    records = pd.concat([
+        statements_to_records('000001', '2022-09-30', 'AN202210280001', {
+            '利润表': _statement(['年初至报告期末', '上年年初至报告期末'], [90.0, 80.0]),
+        }),
+        statements_to_records('000001', '2023-09-30', 'AN202310280001', {
+            '利润表': _statement(['年初至报告期末', '上年年初至报告期末'], [120.0, 95.0]),
+        }),
+        statements_to_records('000001', '2023-06-30', 'AN202308280001', {
+            '利润表': _statement(['本期金额', '上期金额'], [70.0, 60.0]),
+        }),
+    ], ignore_index=True)
+    frame = derive_quarters(records)
+    # 2023年三季报中的上年同期数是对2022年三季报的追溯调整
+    assert _value(frame, '2022-09-30') == 95.0
+    assert _value(frame, '2023-09-30') == 120.0
+    quarter = frame[frame['period'] == pd.Timestamp('2023-09-30')]['quarter_value'].iloc[0]
+    assert quarter == 50.0
@@ -0,0 +1,47 @@
+import random
+
+from utils.proxy_pool import DIRECT, MIN_SAMPLES, ProxyPool
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _pool(clock, **kwargs):
+    endpoints = [{'name': 'a', 'url': 'http://a:8080'}, {'name': 'b', 'url': 'http://b:8080'}]
+    return ProxyPool(endpoints, default_rate=2.0, eviction_error_rate=0.5, recovery_seconds=60.0,
+                     clock=clock, rng=random.Random(0), **kwargs)
+
+
+def _evict(pool, state):
+    for _ in range(MIN_SAMPLES + 5):
+        pool.record(state, 1.0, success=False)
+    assert state.evicted_until
+
+
+def test_all_evicted_goes_direct_until_recovery():
+    clock = _Clock()
+    pool = _pool(clock)
+    for state in pool.states:
+        _evict(pool, state)
+
+    chosen = [pool._choose() for _ in range(3)]
+    assert [state.name for state in chosen] == [DIRECT] * 3
+    assert pool.proxies(chosen[0]) is None
+    # 直连同样按 crawler.rate_limit 限速
+    assert chosen[0].bucket.rate == 2.0
+    assert [chosen[0].bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+    clock.now = 61.0
+    assert pool._choose().name in ('a', 'b')
+
+
+def test_exhausted_budgets_go_direct():
+    clock = _Clock()
+    pool = ProxyPool([{'name': 'a', 'url': 'http://a:8080', 'budget': 1}], default_rate=2.0, clock=clock)
+    assert pool._choose().name == 'a'
+    assert pool._choose().name == DIRECT
@@ -0,0 +1,86 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+from pdf_samples import write_text_pdf
+from utils.parse_cache import ParseCache
+from utils.report_parser import PARSER_VERSION, ReportParser
+
+
+def test_statement_cache_separates_scan_options(tmp_path):
+    pdf_path = tmp_path / 'report.pdf'
+    pdf_path.write_bytes(b'%PDF-1.4\n')
+    cache = ParseCache(str(tmp_path / 'cache'))
+    prefiltered = ReportParser(cache=cache, prefilter=True, table_strategy='lines')
+    digest = cache.file_hash(str(pdf_path))
+    cache.put(digest, PARSER_VERSION, prefiltered._statements_kind(), {'利润表': None})
+
+    assert prefiltered._load_cached_statements(str(pdf_path))[1] == {'利润表': None}
+    for parser in (ReportParser(cache=cache, prefilter=False, table_strategy='lines'),
+                   ReportParser(cache=cache, prefilter=True, table_strategy='lines', locate_section=False),
+                   ReportParser(cache=cache, prefilter=True, table_strategy='layout')):
+        assert parser._load_cached_statements(str(pdf_path))[1] is None
+
+
+class _FakePage:
+    def __init__(self, text, tables):
+        self.text = text
+        self.tables = tables
+
+    def extract_text(self):
+        return self.text
+
+    def extract_tables(self):
+        return self.tables
+
+
+class _FakePDF:
+    def __init__(self, pages):
+        self.pages = pages
+
+
+def test_unit_above_table_is_applied():
+    table = [['项目', '期末余额', '上年年末余额'],
+             ['资产负债表', '', ''],
+             ['货币资金', '1,234.50', '1,000.00'],
+             ['资产总计', '(20.00)', '3,000.00']]
+    text = '合并资产负债表\n2023年12月31日\n编制单位：某某股份有限公司\n单位：万元 币种：人民币\n项目 期末余额'
+    pdf = _FakePDF([_FakePage('第一节 重要提示', []), _FakePage(text, [table])])
+    parser = ReportParser(use_cache=False, prefilter=False, locate_section=False, table_strategy='lines')
+
+    data = parser._extract_statements('report.pdf', pdf, {'资产负债表': '资产负债表'})
+    statement = parser.normalize_statements(data)['资产负债表']
+    assert statement.attrs['unit'] == '万元'
+    assert statement.loc['期末余额', '货币资金'] == 12345000.0
+    assert statement.loc['期末余额', '资产总计'] == -200000.0
+
+
+def _statement_pages(page_count, positions):
+    pages = [[f'Note {i}  {i * 1234.5:,.2f}  text' for i in range(40)] for _ in range(page_count)]
+    for title, position in positions.items():
+        pages[position] = [title, 'Item      2023     2022'] + [
+            f'Line{i}      {i * 100:,.2f}     {i * 90:,.2f}' for i in range(1, 10)]
+    return pages
+
+
+def test_parallel_scan_matches_sequential_and_stops_early(tmp_path):
+    pdfplumber = pytest.importorskip('pdfplumber')
+    keywords = {'balance': 'BALANCE SHEET', 'income': 'INCOME STATEMENT'}
+    pdf_path = tmp_path / 'report.pdf'
+    write_text_pdf(pdf_path, _statement_pages(200, {'BALANCE SHEET': 30, 'INCOME STATEMENT': 70}))
+
+    scans = {}
+    for workers in (1, 2):
+        parser = ReportParser(page_workers=workers, parallel_page_threshold=50, use_cache=False,
+                              prefilter=False, locate_section=False, table_strategy='layout')
+        pages = {}
+        with pdfplumber.open(str(pdf_path)) as pdf:
+            scans[workers] = parser._scan(str(pdf_path), pdf, keywords, range(200), pages, 'layout'), pages
+
+    (sequential, _), (parallel, pages) = scans[1], scans[2]
+    for name in keywords:
+        assert parallel[name] is not None
+        assert parallel[name].equals(sequential[name])
+    # 找到全部报表后不再提交新的页面，已扫描的页面写入逐页缓存
+    assert 70 in pages and 'text' in pages[70]
+    assert len(pages) < 200
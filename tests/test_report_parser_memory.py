@@ -0,0 +1,60 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip('pdfplumber')
+resource = pytest.importorskip('resource')
+
+from pdf_samples import write_text_pdf
+from utils.report_parser import current_rss_mb
+
+# 子进程中逐页扫描一个PDF，输出峰值常驻内存（KB，Linux 下 ru_maxrss 的单位）
+SCAN_SCRIPT = textwrap.dedent('''
+    import resource, sys
+    import pdfplumber
+    from utils.report_parser import ReportParser, STATEMENT_KEYWORDS
+
+    parser = ReportParser(use_cache=False, prefilter=False, max_memory_mb=0)
+    with pdfplumber.open(sys.argv[1]) as pdf:
+        parser._scan_statements(pdf, STATEMENT_KEYWORDS)
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+''')
+
+
+def _write_pdf(path, page_count, lines=50):
+    """生成每页都是多行文字和数字的PDF，页面中没有报表关键词，扫描会读完全部页面"""
+    write_text_pdf(path, [[f'Item {n}-{i}  {i * 1234.56:,.2f}  ({n + i:,}.00)' for i in range(lines)]
+                          for n in range(page_count)])
+
+
+def _peak_rss_mb(pdf_path):
+    output = subprocess.run([sys.executable, '-c', SCAN_SCRIPT, str(pdf_path)],
+                            capture_output=True, text=True, check=True).stdout
+    peak = int(output.split()[-1])
+    # macOS 以字节为单位，Linux 以KB为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def test_peak_rss_flat_across_page_counts(tmp_path):
+    small, large = tmp_path / 'small.pdf', tmp_path / 'large.pdf'
+    _write_pdf(small, 20)
+    _write_pdf(large, 160)
+
+    small_peak = _peak_rss_mb(small)
+    large_peak = _peak_rss_mb(large)
+    # 不释放页面缓存时峰值随页数线性增长，每页数MB，8 倍的页数会多出几百MB
+    assert large_peak - small_peak < 40, (small_peak, large_peak)
+
+
+def test_current_rss_drops_after_release():
+    before = current_rss_mb()
+    if not before:
+        pytest.skip('当前平台无法获取常驻内存')
+    block = bytearray(200 * 1024 * 1024)
+    grown = current_rss_mb()
+    del block
+    released = current_rss_mb()
+    assert grown - before > 150
+    assert grown - released > 150
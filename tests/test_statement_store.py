@@ -0,0 +1,103 @@
+import datetime
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from utils.statement_store import StatementStore, statements_to_records
+
+
+def _records(stock, period, art_code, revenue):
+    return pd.DataFrame({
+        'stock': [stock, stock],
+        'period': [period, period],
+        'statement': ['利润表', '利润表'],
+        'item': ['营业收入', '净利润'],
+        'value': [revenue, revenue / 10],
+        'unit': ['元', '元'],
+        'art_code': [art_code, art_code],
+        'report_period': [period, period],
+    })
+
+
+def test_append_query_round_trip(tmp_path):
+    store = StatementStore(str(tmp_path / 'store'))
+    assert store.append(_records('000001', '2023-12-31', 'AN1', 100.0)) == 2
+    assert store.append(_records('000001', '2024-12-31', 'AN2', 200.0)) == 2
+    assert store.append(_records('600000', '2024-12-31', 'AN3', 300.0)) == 2
+
+    frame = store.query(stocks=['000001'], start='2024-01-01', items=['营业收入'])
+    assert frame['value'].tolist() == [200.0]
+    assert frame['period'].iloc[0] == pd.Timestamp(datetime.date(2024, 12, 31))
+    assert set(store.query()['stock']) == {'000001', '600000'}
+    assert store.art_codes('000001') == {'AN1', 'AN2'}
+
+
+def test_compact_keeps_records(tmp_path):
+    store = StatementStore(str(tmp_path / 'store'))
+    store.append(_records('000001', '2023-12-31', 'AN1', 100.0))
+    store.append(_records('000001', '2024-12-31', 'AN2', 200.0))
+    before = store.query().sort_values(['period', 'item']).reset_index(drop=True)
+
+    store.compact()
+    files = [name for name in (tmp_path / 'store' / 'stock=000001').iterdir()]
+    assert len(files) == 1
+    after = store.query().sort_values(['period', 'item']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(before, after)
+
+
+def _statement(labels, values, unit='元'):
+    table = pd.DataFrame({'营业收入': values}, index=pd.Index(labels, name='报告期'))
+    table.attrs['unit'] = unit
+    return table
+
+
+def _periods(records):
+    return dict(zip(records['period'].map(str), records['value']))
+
+
+def test_annual_labels():
+    records = statements_to_records('000001', '2023-12-31', 'AN1', {
+        '利润表': _statement(['本期金额', '上期金额'], [100.0, 90.0]),
+    })
+    assert _periods(records) == {'2023-12-31': 100.0, '2022-12-31': 90.0}
+
+
+def test_interim_balance_sheet_opening_is_prior_year_end():
+    records = statements_to_records('000001', '2023-06-30', 'AN1', {
+        '资产负债表': _statement(['期末余额', '上年年末余额'], [500.0, 450.0]),
+        '利润表': _statement(['本期发生额', '上期发生额'], [60.0, 50.0]),
+    })
+    balance = records[records['statement'] == '资产负债表']
+    income = records[records['statement'] == '利润表']
+    assert _periods(balance) == {'2023-06-30': 500.0, '2022-12-31': 450.0}
+    assert _periods(income) == {'2023-06-30': 60.0, '2022-06-30': 50.0}
+
+    records = statements_to_records('000001', '2023-03-31', 'AN2', {
+        '资产负债表': _statement(['期末余额', '期初余额'], [520.0, 450.0]),
+    })
+    assert _periods(records) == {'2023-03-31': 520.0, '2022-12-31': 450.0}
+
+
+def test_q3_keeps_year_to_date_columns():
+    records = statements_to_records('000001', '2023-09-30', 'AN1', {
+        '利润表': _statement(['本报告期', '上年同期', '年初至报告期末', '上年年初至报告期末'],
+                             [30.0, 25.0, 90.0, 80.0]),
+        '现金流量表': _statement(['2023年7-9月', '2022年7-9月', '2023年1-9月', '2022年1-9月'],
+                                 [3.0, 2.0, 9.0, 8.0]),
+        '资产负债表': _statement(['2023年9月30日', '2022年12月31日'], [700.0, 450.0]),
+    })
+    income = records[records['statement'] == '利润表']
+    cash = records[records['statement'] == '现金流量表']
+    balance = records[records['statement'] == '资产负债表']
+    assert _periods(income) == {'2023-09-30': 90.0, '2022-09-30': 80.0}
+    assert _periods(cash) == {'2023-09-30': 9.0, '2022-09-30': 8.0}
+    assert _periods(balance) == {'2023-09-30': 700.0, '2022-12-31': 450.0}
+
+
+def test_q3_unlabelled_quarter_pair_is_dropped():
+    records = statements_to_records('000001', '2023-09-30', 'AN1', {
+        '利润表': _statement(['本期金额', '上期金额', '本期金额', '上期金额'], [30.0, 25.0, 90.0, 80.0]),
+    })
+    assert _periods(records) == {'2023-09-30': 90.0, '2022-09-30': 80.0}
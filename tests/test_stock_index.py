@@ -0,0 +1,49 @@
+import json
+import os
+import struct
+
+from utils.stock_index import HEADER, MAGIC, StockIndex
+
+STOCKS = {'平安银行': '000001', '中国平安': '601318', '贵州茅台': '600519', '*ST中天': '000540'}
+
+
+def _write_json(tmp_path):
+    json_file = tmp_path / 'stock_codes.json'
+    json_file.write_text(json.dumps(STOCKS, ensure_ascii=False), encoding='utf-8')
+    return str(json_file)
+
+
+def test_index_with_old_version_is_rebuilt(tmp_path):
+    json_file = _write_json(tmp_path)
+    index_file = str(tmp_path / 'stock_codes.idx')
+    with open(index_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0, 1) + b'\0' * 64)
+    # 旧索引比 JSON 新，只看修改时间会被当作有效
+    os.utime(index_file, (os.path.getmtime(json_file) + 10,) * 2)
+
+    index = StockIndex(json_file, index_file)
+    assert index.get_code('贵州茅台') == '600519'
+    assert struct.unpack_from('<I', open(index_file, 'rb').read(), 4)[0] != 0
+
+
+def test_truncated_index_is_rebuilt(tmp_path):
+    json_file = _write_json(tmp_path)
+    index_file = str(tmp_path / 'stock_codes.idx')
+    StockIndex(json_file, index_file)
+    with open(index_file, 'r+b') as f:
+        f.truncate(HEADER.size + 10)
+    os.utime(index_file, (os.path.getmtime(json_file) + 10,) * 2)
+
+    assert StockIndex(json_file, index_file).get_name('601318') == '中国平安'
+
+
+def test_search_prefix_and_substring(tmp_path):
+    index = StockIndex(_write_json(tmp_path), str(tmp_path / 'stock_codes.idx'))
+    assert index.search('6005') == [('贵州茅台', '600519')]
+    assert set(index.search('平安')) == {('平安银行', '000001'), ('中国平安', '601318')}
+    assert index.search('平安')[0] == ('平安银行', '000001')
+    assert index.search('1318') == [('中国平安', '601318')]
+    assert index.search('ST') == [('*ST中天', '000540')]
+    assert index.search('贵州茅台') == [('贵州茅台', '600519')]
+    assert len(index.search('0', limit=2)) == 2
+    assert index.search('不存在') == []
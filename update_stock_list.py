@@ -2,6 +2,7 @@ import requests
 import json
 import time
 import random
+from utils.stock_index import build_index
 
 def get_stock_list():
     """获取沪深两市所有上市公司信息"""
@@ -67,6 +68,7 @@ def get_stock_list():
         # 保存到文件
         with open('stock_codes.json', 'w', encoding='utf-8') as f:
             json.dump(stock_dict, f, ensure_ascii=False, indent=2)
+        build_index(stock_dict, 'stock_codes.idx')
             
         print(f"成功获取 {len(stock_dict)} 家上市公司信息")
         
@@ -0,0 +1,282 @@
+import json
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from .logger import Logger
+
+# 检查文本层时抽样的页数，抽样页面都没有文字时视为扫描件
+TEXT_LAYER_SAMPLE_PAGES = 5
+
+# 结果状态
+STATUS_OK = 'ok'
+STATUS_SCANNED = 'scanned'
+STATUS_TOO_LARGE = 'too_large'
+STATUS_TIMEOUT = 'timeout'
+STATUS_CRASHED = 'crashed'
+STATUS_MEMORY = 'memory'
+STATUS_ERROR = 'error'
+
+# 需要隔离、下次批量解析时跳过的状态
+QUARANTINE_STATUSES = (STATUS_SCANNED, STATUS_TOO_LARGE, STATUS_TIMEOUT, STATUS_CRASHED, STATUS_MEMORY)
+
+
+def _has_text_layer(pdf) -> bool:
+    """抽样检查PDF是否有文本层"""
+    from .report_parser import release_page
+
+    page_count = len(pdf.pages)
+    if page_count == 0:
+        return False
+    step = max(1, page_count // TEXT_LAYER_SAMPLE_PAGES)
+    for index in range(0, page_count, step)[:TEXT_LAYER_SAMPLE_PAGES]:
+        page = pdf.pages[index]
+        try:
+            if (page.extract_text() or '').strip():
+                return True
+        finally:
+            release_page(page)
+    return False
+
+
+def parse_single_report(pdf_path: str, max_pages: int, page_workers: int = 1) -> Dict:
+    """解析单个PDF，在工作进程中运行，已缓存的文件不再打开"""
+    import pdfplumber
+    from .report_parser import ReportParser, MemoryLimitExceeded
+
+    parser = ReportParser(page_workers=page_workers)
+    digest, cached = parser._load_cached_statements(pdf_path)
+    if cached is not None:
+        return {'status': STATUS_OK, 'pages': 0, 'data': cached, 'cached': True}
+    
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        if max_pages and page_count > max_pages:
+            return {'status': STATUS_TOO_LARGE, 'pages': page_count,
+                    'error': f"页数 {page_count} 超过上限 {max_pages}"}
+        if not _has_text_layer(pdf):
+            return {'status': STATUS_SCANNED, 'pages': page_count, 'error': "没有文本层"}
+        try:
+            data = parser._parse_pdf(pdf_path, pdf, digest)
+        except MemoryLimitExceeded as e:
+            return {'status': STATUS_MEMORY, 'pages': page_count, 'error': str(e)}
+    return {'status': STATUS_OK, 'pages': page_count, 'data': data}
+
+
+def _worker_main(conn, max_pages: int, page_workers: int):
+    """工作进程主循环：接收文件路径，返回解析结果，收到None或主进程退出时结束"""
+    # 自成一个进程组，终止时连同页面并行提取的子进程一起结束
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    while True:
+        try:
+            pdf_path = conn.recv()
+        except EOFError:
+            break
+        if pdf_path is None:
+            break
+        try:
+            result = parse_single_report(pdf_path, max_pages, page_workers)
+        except Exception as e:
+            result = {'status': STATUS_ERROR, 'pages': 0, 'error': str(e)}
+        conn.send(result)
+    conn.close()
+
+
+class _Worker:
+    """一个工作进程及其当前任务"""
+
+    def __init__(self, context, max_pages: int, page_workers: int):
+        self.conn, child_conn = context.Pipe()
+        # 大文档可能需要在工作进程内再开进程并行提取页面，守护进程不允许有子进程
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, max_pages, page_workers),
+                                       daemon=page_workers <= 1)
+        self.process.start()
+        # 子进程自己也会设置，这里再设置一次，避免在子进程设置之前就需要终止它
+        if hasattr(os, 'setpgid'):
+            try:
+                os.setpgid(self.process.pid, self.process.pid)
+            except OSError:
+                pass
+        child_conn.close()
+        self.path = None
+        self.started = 0.0
+
+    def submit(self, path: str):
+        self.path = path
+        self.started = time.monotonic()
+        self.conn.send(path)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+            return
+        self.conn.close()
+
+    def kill(self):
+        """终止工作进程及其页面提取子进程
+
+        POSIX 上向工作进程的进程组发送 SIGKILL，子进程不会残留；进程组只能由工作进程
+        自己创建，组号等于其 pid，信号不会发到主进程。其他平台只能终止工作进程本身。
+        """
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+def collect_pdf_paths(sources: Union[str, Iterable[str]]) -> List[str]:
+    """把文件列表或目录展开为PDF文件路径列表"""
+    if isinstance(sources, str):
+        sources = [sources]
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.lower().endswith('.pdf'))
+        else:
+            paths.append(source)
+    return paths
+
+
+def load_quarantine(quarantine_file: Optional[str]) -> Dict[str, Dict]:
+    """读取隔离清单"""
+    if not quarantine_file or not os.path.exists(quarantine_file):
+        return {}
+    try:
+        with open(quarantine_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_quarantine(quarantine_file: str, quarantine: Dict[str, Dict]):
+    tmp_file = f"{quarantine_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(quarantine, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, quarantine_file)
+
+
+def parse_reports_batch(sources: Union[str, Iterable[str]],
+                        workers: Optional[int] = None,
+                        timeout: float = 300,
+                        max_pages: int = 1000,
+                        quarantine_file: Optional[str] = None,
+                        page_workers: int = 1) -> Iterator[Dict]:
+    """在进程池中批量解析PDF报告，每完成一个文件就返回一个结果
+
+    每个工作进程同一时间只处理一个文件，超时的进程会被终止并替换，
+    不会拖住整个批次。扫描件、超过页数上限、超时或导致进程崩溃的文件记入
+    隔离清单，之后的批次会跳过它们。内存上限由 ReportParser 的 max_memory_mb
+    （配置 analysis.parser_max_memory_mb）控制，超限的文件同样会被隔离。
+
+    Args:
+        sources: PDF文件路径列表，或包含PDF的目录（如 downloaded_reports/）
+        workers: 工作进程数，默认等于CPU核数
+        timeout: 单个文件的解析超时（秒）
+        max_pages: 单个文件的页数上限，超过时不解析
+        quarantine_file: 隔离清单文件路径，为None时不记录
+        page_workers: 每个文件内部并行提取页面的进程数，用于避免个别超大文档拖慢整批
+
+    Yields:
+        结果字典，包含 path、status、pages、elapsed、data（成功时）、
+        error（失败时）以及批次进度 stats
+    """
+    logger = Logger.get_logger(__name__)
+    quarantine = load_quarantine(quarantine_file)
+    paths = [p for p in collect_pdf_paths(sources) if os.path.abspath(p) not in quarantine]
+    pending = list(reversed(paths))
+    total = len(paths)
+    if not total:
+        return
+
+    context = multiprocessing.get_context()
+    pool_size = max(1, min(workers or os.cpu_count() or 1, total))
+    pool = [_Worker(context, max_pages, page_workers) for _ in range(pool_size)]
+    idle = list(pool)
+    busy: Dict = {}  # conn -> _Worker
+
+    batch_start = time.monotonic()
+    completed = 0
+    parsed_pages = 0
+
+    def finish(worker: _Worker, result: Dict) -> Dict:
+        nonlocal completed, parsed_pages
+        completed += 1
+        parsed_pages += result.get('pages', 0)
+        elapsed_total = time.monotonic() - batch_start
+        result['path'] = worker.path
+        result['elapsed'] = time.monotonic() - worker.started
+        result['stats'] = {
+            'completed': completed,
+            'total': total,
+            'files_per_second': completed / elapsed_total if elapsed_total else 0.0,
+            'pages_per_second': parsed_pages / elapsed_total if elapsed_total else 0.0,
+        }
+        if quarantine_file and result['status'] in QUARANTINE_STATUSES:
+            quarantine[os.path.abspath(worker.path)] = {
+                'status': result['status'],
+                'error': result.get('error', ''),
+                'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            _save_quarantine(quarantine_file, quarantine)
+        if result['status'] != STATUS_OK:
+            logger.warning(f"解析失败 [{result['status']}] {worker.path}: {result.get('error', '')}")
+        return result
+
+    try:
+        while pending or busy:
+            while pending and idle:
+                worker = idle.pop()
+                worker.submit(pending.pop())
+                busy[worker.conn] = worker
+
+            ready = wait(list(busy), timeout=1.0)
+            for conn in ready:
+                worker = busy.pop(conn)
+                try:
+                    result = conn.recv()
+                except (EOFError, OSError):
+                    # 进程异常退出（如内存耗尽被系统终止）
+                    result = {'status': STATUS_CRASHED, 'pages': 0,
+                              'error': f"工作进程异常退出，退出码 {worker.process.exitcode}"}
+                    yield finish(worker, result)
+                    worker.kill()
+                    worker = _Worker(context, max_pages, page_workers)
+                    idle.append(worker)
+                    continue
+                yield finish(worker, result)
+                idle.append(worker)
+
+            # 终止超时的工作进程并补充新进程
+            now = time.monotonic()
+            for conn, worker in list(busy.items()):
+                if now - worker.started > timeout:
+                    del busy[conn]
+                    worker.kill()
+                    yield finish(worker, {'status': STATUS_TIMEOUT, 'pages': 0,
+                                          'error': f"解析超过 {timeout} 秒"})
+                    idle.append(_Worker(context, max_pages, page_workers))
+    finally:
+        for worker in idle:
+            worker.stop()
+        for worker in busy.values():
+            worker.kill()
+
+    elapsed_total = time.monotonic() - batch_start
+    logger.info(f"批量解析完成: {completed} 个文件, {parsed_pages} 页, 用时 {elapsed_total:.1f} 秒")
@@ -1,32 +1,218 @@
+import copy
+import dataclasses
 import os
+import threading
 import yaml
-from cryptography.fernet import Fernet
 import logging
-from typing import Any, Dict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# 监视配置文件变化的默认轮询间隔（秒）
+DEFAULT_WATCH_INTERVAL = 2.0
+
+
+def _freeze(value: Any) -> Any:
+    """把 YAML 读出的字典和列表转换为只读的映射和元组"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _flatten(data: Mapping, prefix: str = '', out: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """为每一级点分路径预先建立索引，get 时只做一次字典查找"""
+    out = {} if out is None else out
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        out[path] = value
+        if isinstance(value, Mapping):
+            _flatten(value, f"{path}.", out)
+    return out
+
+
+@dataclass(frozen=True)
+class CrawlerSettings:
+    base_url: str = "http://www.eastmoney.com"
+    request_timeout: float = 30.0
+    max_retries: int = 3
+    retry_delay: float = 5.0
+    rate_limit: float = 2.0  # 每秒请求数限制
+
+
+@dataclass(frozen=True)
+class DownloadSettings:
+    default_path: str = "downloads"
+    chunk_size: int = 8192
+    verify_hash: bool = True
+    max_concurrent_downloads: int = 3
+    progress_interval: float = 0.25
+    progress_min_bytes: int = 262144
+
+
+@dataclass(frozen=True)
+class ProxyEndpoint:
+    """代理池中的一个代理"""
+    url: str = ""
+    username: str = ""
+    password: str = ""  # 加密后的密码
+    rate_limit: float = 0.0  # 经该代理的每秒请求数限制，0 表示使用 crawler.rate_limit
+    budget: int = 0  # 每次运行经该代理的最多请求数，0 表示不限
+
+
+@dataclass(frozen=True)
+class ProxySettings:
+    enabled: bool = False
+    http: str = ""
+    https: str = ""
+    username: str = ""
+    password: str = ""  # 加密后的密码
+    pool: Tuple[ProxyEndpoint, ...] = ()
+    eviction_error_rate: float = 0.5  # 错误率达到该值的代理暂时停用
+    recovery_seconds: float = 60.0  # 停用的代理经过该时间后重新试用
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    level: str = "INFO"
+    console_level: str = "WARNING"
+    format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    file: str = "stock_crawler.log"
+    max_size: int = 10 * 1024 * 1024
+    backup_count: int = 5
+    json_file: str = ""
+    debug_sampling: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+
+
+def _check_type(value: Any, default: Any) -> Tuple[bool, Any]:
+    """按默认值的类型校验配置值，整数可以用于浮点数配置"""
+    if isinstance(default, bool):
+        return isinstance(value, bool), value
+    if isinstance(default, float):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+        return ok, float(value) if ok else value
+    if isinstance(default, int):
+        return isinstance(value, int) and not isinstance(value, bool), value
+    if isinstance(default, Mapping):
+        return isinstance(value, Mapping), value
+    if isinstance(default, tuple):
+        return isinstance(value, tuple), value
+    return isinstance(value, type(default)), value
+
+
+def _build_section(cls, data: Any, name: str, overrides: Optional[Dict[str, Any]] = None):
+    """从配置的一节创建类型化的设置，类型不符的值记录警告并使用默认值"""
+    data = data if isinstance(data, Mapping) else {}
+    values = {}
+    for item in dataclasses.fields(cls):
+        if item.name not in data:
+            continue
+        default = item.default if item.default is not dataclasses.MISSING else item.default_factory()
+        ok, value = _check_type(data[item.name], default)
+        if ok:
+            values[item.name] = value
+        else:
+            logging.warning(f"配置项 {name}.{item.name} 的值 {data[item.name]!r} 类型不正确，使用默认值 {default!r}")
+    values.update(overrides or {})
+    return cls(**values)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """某一时刻的完整配置，创建后不可修改
+
+    常用的几节预先转换为类型化的设置对象，交给各子系统直接读取属性；其余配置
+    通过 get 按点分路径读取。配置更新时整体替换为新的快照，读取方不需要加锁。
+    """
+    data: Mapping[str, Any]
+    crawler: CrawlerSettings
+    download: DownloadSettings
+    proxy: ProxySettings
+    logging: LoggingSettings
+    version: int = 0
+    _index: Mapping[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], version: int = 0) -> 'ConfigSnapshot':
+        frozen = _freeze(data or {})
+        proxy = frozen.get('proxy', {})
+        proxy = proxy if isinstance(proxy, Mapping) else {}
+        auth = proxy.get('auth', {})
+        overrides = {
+            key: auth[key] for key in ('username', 'password')
+            if isinstance(auth, Mapping) and isinstance(auth.get(key), str)
+        }
+        pool = proxy.get('pool', ())
+        if isinstance(pool, tuple):
+            overrides['pool'] = tuple(
+                _build_section(ProxyEndpoint, entry, f'proxy.pool[{i}]') for i, entry in enumerate(pool)
+                if isinstance(entry, Mapping) and entry.get('url')
+            )
+        return cls(
+            data=frozen,
+            crawler=_build_section(CrawlerSettings, frozen.get('crawler'), 'crawler'),
+            download=_build_section(DownloadSettings, frozen.get('download'), 'download'),
+            proxy=_build_section(ProxySettings, proxy, 'proxy', overrides),
+            logging=_build_section(LoggingSettings, frozen.get('logging'), 'logging'),
+            version=version,
+            _index=MappingProxyType(_flatten(frozen)),
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._index.get(key, default)
+
 
 class ConfigManager:
+    """配置管理
+
+    读取操作都在当前的 ConfigSnapshot 上进行，不加锁；set 在锁内修改配置并发布新的
+    快照。batch 中的多次 set 只在结束时写一次文件，文件先写入临时文件再替换，
+    不会留下写了一半的配置。调用 watch 后，配置文件被外部修改时会自动重新加载，
+    并通知 subscribe 注册的回调。
+    """
     _instance = None
-    
+    _instance_lock = threading.Lock()
+
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(ConfigManager, cls).__new__(cls)
-            cls._instance._initialized = False
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super(ConfigManager, cls).__new__(cls)
+                    instance._initialized = False
+                    cls._instance = instance
         return cls._instance
-    
+
     def __init__(self):
         if self._initialized:
             return
-            
-        self.config_file = "config.yaml"
-        self.key_file = ".config.key"
-        self._config = None
-        self._cipher_suite = None
-        self._load_or_create_key()
-        self._load_config()
-        self._initialized = True
-    
+        with self._instance_lock:
+            if self._initialized:
+                return
+
+            self.config_file = "config.yaml"
+            self.key_file = ".config.key"
+            self._lock = threading.RLock()
+            self._config = {}
+            self._snapshot = ConfigSnapshot.from_dict({})
+            self._file_stat = None
+            self._batch_depth = 0
+            self._dirty = False
+            self._subscribers: List[Callable[[ConfigSnapshot], None]] = []
+            self._watcher = None
+            self._stop_watching = threading.Event()
+            self._cipher_suite = None
+            self._proxy_cache = None
+            self._proxy_pool_cache = None
+            self._load_config()
+            self._initialized = True
+
     def _load_or_create_key(self):
         """加载或创建加密密钥"""
+        # cryptography 导入较慢，只在首次加解密时才加载
+        from cryptography.fernet import Fernet
+
         if os.path.exists(self.key_file):
             with open(self.key_file, 'rb') as f:
                 key = f.read()
@@ -35,90 +221,239 @@ class ConfigManager:
             with open(self.key_file, 'wb') as f:
                 f.write(key)
         self._cipher_suite = Fernet(key)
-    
-    def _load_config(self):
-        """加载配置文件"""
+
+    @property
+    def cipher_suite(self):
+        """加密器，首次使用时创建"""
+        if self._cipher_suite is None:
+            with self._lock:
+                if self._cipher_suite is None:
+                    self._load_or_create_key()
+        return self._cipher_suite
+
+    def _stat(self) -> Optional[Tuple[float, int]]:
         try:
-            if os.path.exists(self.config_file):
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_config(self) -> bool:
+        """加载配置文件，成功时发布新的快照"""
+        try:
+            stat = self._stat()
+            if stat is not None:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self._config = yaml.safe_load(f)
+                    config = yaml.safe_load(f) or {}
             else:
                 logging.warning(f"配置文件 {self.config_file} 不存在")
-                self._config = {}
+                config = {}
         except Exception as e:
             logging.error(f"加载配置文件失败: {str(e)}")
-            self._config = {}
-    
+            # 保留原来的快照，文件再次修改时才重新尝试
+            self._file_stat = self._stat()
+            return False
+
+        with self._lock:
+            self._config = config
+            self._file_stat = stat
+            self._publish()
+        return True
+
+    def _publish(self):
+        """根据当前配置创建并发布新的快照，然后通知订阅者"""
+        snapshot = ConfigSnapshot.from_dict(copy.deepcopy(self._config), self._snapshot.version + 1)
+        self._snapshot = snapshot
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logging.error(f"配置更新回调出错: {str(e)}")
+
     def save_config(self):
         """保存配置到文件"""
+        with self._lock:
+            if self._batch_depth:
+                self._dirty = True
+                return
+            tmp_path = f"{self.config_file}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    yaml.dump(self._config, f, allow_unicode=True)
+                os.replace(tmp_path, self.config_file)
+                # 自己写入的修改不需要再由监视线程重新加载
+                self._file_stat = self._stat()
+                self._dirty = False
+            except Exception as e:
+                logging.error(f"保存配置文件失败: {str(e)}")
+
+    @contextmanager
+    def batch(self):
+        """合并多次 set：期间不写文件，结束时写一次并发布一次快照"""
+        with self._lock:
+            self._batch_depth += 1
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                yaml.dump(self._config, f, allow_unicode=True)
-        except Exception as e:
-            logging.error(f"保存配置文件失败: {str(e)}")
-    
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self._publish()
+                    self.save_config()
+
+    def snapshot(self) -> ConfigSnapshot:
+        """当前的配置快照"""
+        return self._snapshot
+
+    def subscribe(self, callback: Callable[[ConfigSnapshot], None]):
+        """注册配置更新回调，参数为新的快照"""
+        with self._lock:
+            self._subscribers.append(callback)
+
     def get(self, key: str, default: Any = None) -> Any:
         """获取配置值"""
-        try:
-            keys = key.split('.')
-            value = self._config
-            for k in keys:
-                value = value[k]
-            return value
-        except (KeyError, TypeError):
-            return default
-    
+        return self._snapshot.get(key, default)
+
     def set(self, key: str, value: Any):
         """设置配置值"""
         keys = key.split('.')
-        config = self._config
-        for k in keys[:-1]:
-            config = config.setdefault(k, {})
-        config[keys[-1]] = value
-        self.save_config()
-    
+        with self._lock:
+            config = self._config
+            for k in keys[:-1]:
+                config = config.setdefault(k, {})
+            config[keys[-1]] = value
+            if self._batch_depth:
+                self._dirty = True
+                return
+            self._publish()
+            self.save_config()
+
+    def reload(self) -> bool:
+        """重新读取配置文件"""
+        return self._load_config()
+
+    def watch(self, interval: float = DEFAULT_WATCH_INTERVAL):
+        """启动后台线程轮询配置文件，文件被修改后重新加载"""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval,),
+                                             name='config-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            self._stop_watching.set()
+            watcher.join()
+
+    def _watch_loop(self, interval: float):
+        while not self._stop_watching.wait(interval):
+            stat = self._stat()
+            # 大小为 0 通常是其他程序正在改写文件，等写完后再加载
+            if stat is not None and stat[1] and stat != self._file_stat:
+                if self._load_config():
+                    logging.info(f"配置文件已重新加载: {self.config_file}")
+
     def encrypt_value(self, value: str) -> str:
         """加密敏感信息"""
-        return self._cipher_suite.encrypt(value.encode()).decode()
-    
+        return self.cipher_suite.encrypt(value.encode()).decode()
+
     def decrypt_value(self, encrypted_value: str) -> str:
         """解密敏感信息"""
         try:
-            return self._cipher_suite.decrypt(encrypted_value.encode()).decode()
+            return self.cipher_suite.decrypt(encrypted_value.encode()).decode()
         except Exception:
             return ""
-    
+
     def get_proxy_settings(self) -> Dict[str, str]:
-        """获取代理设置"""
-        if not self.get('proxy.enabled', False):
-            return {}
-            
-        proxy_settings = {
-            'http': self.get('proxy.http', ''),
-            'https': self.get('proxy.https', '')
-        }
-        
-        # 如果设置了认证信息，添加到代理URL中
-        username = self.get('proxy.auth.username', '')
-        password = self.get('proxy.auth.password', '')
-        if username and password:
-            decrypted_password = self.decrypt_value(password)
-            for protocol in ['http', 'https']:
-                if proxy_settings[protocol]:
-                    proxy_settings[protocol] = proxy_settings[protocol].replace(
-                        '://', f'://{username}:{decrypted_password}@'
-                    )
-        
-        return proxy_settings
-    
+        """获取代理设置
+
+        解密后的代理地址按快照缓存，配置不变时不会重复解密。
+        """
+        proxy = self._snapshot.proxy
+        cached = self._proxy_cache
+        if cached is not None and cached[0] is proxy:
+            return dict(cached[1])
+
+        proxy_settings = {}
+        if proxy.enabled:
+            proxy_settings = {'http': proxy.http, 'https': proxy.https}
+
+            # 如果设置了认证信息，添加到代理URL中
+            if proxy.username and proxy.password:
+                decrypted_password = self.decrypt_value(proxy.password)
+                for protocol in ['http', 'https']:
+                    if proxy_settings[protocol]:
+                        proxy_settings[protocol] = proxy_settings[protocol].replace(
+                            '://', f'://{proxy.username}:{decrypted_password}@'
+                        )
+
+        self._proxy_cache = (proxy, proxy_settings)
+        return dict(proxy_settings)
+
+    def _with_credentials(self, url: str, username: str, password: str) -> str:
+        if not (username and password):
+            return url
+        return url.replace('://', f'://{username}:{self.decrypt_value(password)}@', 1)
+
+    def get_proxy_pool(self) -> List[Dict[str, Any]]:
+        """获取代理池
+
+        代理池为空但启用了单个代理时，返回只包含该代理的池；未启用代理时返回空列表。
+        每项包含 name（不含认证信息，用于日志和指标）、url（含解密后的认证信息）、
+        rate_limit 和 budget，结果按快照缓存，配置不变时不会重复解密。
+        """
+        proxy = self._snapshot.proxy
+        cached = self._proxy_pool_cache
+        if cached is not None and cached[0] is proxy:
+            return [dict(entry) for entry in cached[1]]
+
+        pool = []
+        if proxy.enabled:
+            endpoints = proxy.pool or tuple(
+                ProxyEndpoint(url=url, username=proxy.username, password=proxy.password)
+                for url in dict.fromkeys(filter(None, (proxy.https, proxy.http)))
+            )
+            for endpoint in endpoints:
+                pool.append({
+                    'name': endpoint.url,
+                    'url': self._with_credentials(endpoint.url, endpoint.username, endpoint.password),
+                    'rate_limit': endpoint.rate_limit,
+                    'budget': endpoint.budget,
+                })
+
+        self._proxy_pool_cache = (proxy, pool)
+        return [dict(entry) for entry in pool]
+
+    def set_proxy_pool(self, entries: List[Dict[str, Any]]):
+        """设置代理池，密码加密后保存
+
+        Args:
+            entries: 每项包含 url，可选 username、password（明文）、rate_limit、budget
+        """
+        pool = []
+        for entry in entries:
+            item = {key: entry[key] for key in ('url', 'username', 'rate_limit', 'budget') if key in entry}
+            if entry.get('password'):
+                item['password'] = self.encrypt_value(entry['password'])
+            pool.append(item)
+        with self.batch():
+            self.set('proxy.pool', pool)
+            if pool:
+                self.set('proxy.enabled', True)
+
     def set_proxy_settings(self, settings: Dict[str, str]):
         """设置代理配置"""
-        self.set('proxy.enabled', bool(settings))
-        if settings:
-            self.set('proxy.http', settings.get('http', ''))
-            self.set('proxy.https', settings.get('https', ''))
-            if 'username' in settings:
-                self.set('proxy.auth.username', settings['username'])
-            if 'password' in settings:
-                encrypted_password = self.encrypt_value(settings['password'])
-                self.set('proxy.auth.password', encrypted_password)
+        with self.batch():
+            self.set('proxy.enabled', bool(settings))
+            if settings:
+                self.set('proxy.http', settings.get('http', ''))
+                self.set('proxy.https', settings.get('https', ''))
+                if 'username' in settings:
+                    self.set('proxy.auth.username', settings['username'])
+                if 'password' in settings:
+                    encrypted_password = self.encrypt_value(settings['password'])
+                    self.set('proxy.auth.password', encrypted_password)
@@ -1,29 +1,41 @@
 import asyncio
-import aiohttp
 import os
 import hashlib
-from typing import List, Dict, Callable
+import time
+from typing import List, Dict, Callable, Optional
 from .config_manager import ConfigManager
 from .logger import Logger
+from .metrics import MetricsRegistry
+from .progress import BatchProgress, BatchProgressTracker
+from .proxy_pool import shared_pool
+
+_metrics = MetricsRegistry()
+DOWNLOAD_SECONDS = _metrics.histogram('download_seconds', '异步下载单个文件的耗时（秒）')
+DOWNLOAD_BYTES_TOTAL = _metrics.counter('download_bytes_total', '异步下载的字节数')
+DOWNLOADS_TOTAL = _metrics.counter('downloads_total', '异步下载的文件数，按结果分类')
+DOWNLOADS_ACTIVE = _metrics.gauge('downloads_active', '正在下载的文件数')
+DOWNLOADS_QUEUED = _metrics.gauge('downloads_queued', '等待下载名额的文件数')
 
 class DownloadManager:
     def __init__(self):
         self.config = ConfigManager()
         self.logger = Logger.get_logger(__name__)
         self.semaphore = asyncio.Semaphore(
-            self.config.get('download.max_concurrent_downloads', 3)
+            self.config.snapshot().download.max_concurrent_downloads
         )
         self.session = None
         self.download_progress_callback = None
+        self.batch_progress_callback = None
     
     async def _init_session(self):
         """初始化aiohttp会话"""
         if self.session is None:
-            proxy_settings = self.config.get_proxy_settings()
+            import aiohttp
+            
+            # 代理按请求传给 session.get，由代理池选择
             self.session = aiohttp.ClientSession(
                 timeout=aiohttp.ClientTimeout(total=30),
-                trust_env=True,
-                proxy=proxy_settings.get('http', None)
+                trust_env=True
             )
     
     async def _close_session(self):
@@ -33,12 +45,32 @@ class DownloadManager:
             self.session = None
     
     def set_progress_callback(self, callback: Callable[[str, int, int], None]):
-        """设置进度回调函数"""
+        """设置单个文件的进度回调函数，按刷新间隔合并调用，不会每个数据块调用一次"""
         self.download_progress_callback = callback
     
-    async def _download_file(self, url: str, save_path: str) -> bool:
+    def set_batch_progress_callback(self, callback: Callable[[BatchProgress], None]):
+        """设置整批下载的汇总进度回调函数（完成文件数、字节数、预计剩余时间）"""
+        self.batch_progress_callback = callback
+    
+    def _deliver_progress(self, batch: BatchProgress):
+        """把汇总进度分发给回调函数"""
+        if self.download_progress_callback:
+            for name, downloaded, total in batch.changed:
+                self.download_progress_callback(name, downloaded, total)
+        if self.batch_progress_callback:
+            self.batch_progress_callback(batch)
+    
+    async def _download_file(self, url: str, save_path: str,
+                             tracker: Optional[BatchProgressTracker] = None) -> bool:
         """下载单个文件"""
+        DOWNLOADS_QUEUED.inc()
         async with self.semaphore:
+            DOWNLOADS_QUEUED.dec()
+            DOWNLOADS_ACTIVE.inc()
+            start = time.perf_counter()
+            result = 'error'
+            # 每个文件开始时取一次当前配置，热加载后的修改对之后的下载生效
+            settings = self.config.snapshot().download
             try:
                 await self._init_session()
                 
@@ -46,38 +78,55 @@ class DownloadManager:
                 os.makedirs(os.path.dirname(save_path), exist_ok=True)
                 
                 # 下载文件
-                async with self.session.get(url) as response:
+                pool = shared_pool()
+                proxy = await pool.acquire_async()
+                request_start = time.perf_counter()
+                try:
+                    response = await self.session.get(url, proxy=proxy.url)
+                except Exception:
+                    pool.record(proxy, time.perf_counter() - request_start, success=False)
+                    raise
+                # 429 和 5xx 说明该出口被限流或代理异常，计入代理的错误率
+                pool.record(proxy, time.perf_counter() - request_start,
+                            success=response.status < 500 and response.status != 429)
+                async with response:
                     if response.status != 200:
                         self.logger.error(f"下载失败: {url}, 状态码: {response.status}")
+                        result = f'http_{response.status}'
                         return False
                     
                     file_size = int(response.headers.get('content-length', 0))
                     downloaded_size = 0
+                    name = os.path.basename(save_path)
                     
                     with open(save_path, 'wb') as f:
-                        chunk_size = self.config.get('download.chunk_size', 8192)
-                        async for chunk in response.content.iter_chunked(chunk_size):
+                        async for chunk in response.content.iter_chunked(settings.chunk_size):
                             f.write(chunk)
                             downloaded_size += len(chunk)
+                            DOWNLOAD_BYTES_TOTAL.inc(len(chunk))
                             
-                            if self.download_progress_callback:
-                                self.download_progress_callback(
-                                    os.path.basename(save_path),
-                                    downloaded_size,
-                                    file_size
-                                )
+                            if tracker is not None:
+                                tracker.update(name, downloaded_size, file_size)
                 
                 # 验证文件完整性
-                if self.config.get('download.verify_hash', True):
+                if settings.verify_hash:
                     if not self._verify_file_hash(save_path, response.headers.get('etag')):
                         self.logger.warning(f"文件完整性验证失败: {save_path}")
+                        result = 'hash_mismatch'
                         return False
                 
+                result = 'success'
                 return True
                 
             except Exception as e:
                 self.logger.error(f"下载文件时出错: {str(e)}")
                 return False
+            finally:
+                if tracker is not None:
+                    tracker.finish(os.path.basename(save_path), result == 'success')
+                DOWNLOADS_ACTIVE.dec()
+                DOWNLOADS_TOTAL.inc(result=result)
+                DOWNLOAD_SECONDS.observe(time.perf_counter() - start)
     
     def _verify_file_hash(self, file_path: str, expected_hash: str) -> bool:
         """验证文件完整性"""
@@ -101,9 +150,18 @@ class DownloadManager:
         Returns:
             下载结果列表，True表示成功，False表示失败
         """
+        tracker = None
+        if self.download_progress_callback or self.batch_progress_callback:
+            settings = self.config.snapshot().download
+            tracker = BatchProgressTracker(
+                self._deliver_progress,
+                interval=settings.progress_interval,
+                min_bytes=settings.progress_min_bytes,
+            )
+            tracker.start([os.path.basename(item['save_path']) for item in downloads])
         try:
             tasks = [
-                self._download_file(item['url'], item['save_path'])
+                self._download_file(item['url'], item['save_path'], tracker)
                 for item in downloads
             ]
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,240 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Type
+
+from .progress import BatchProgress
+
+# 事件级别，数值与 logging 模块保持一致，SUCCESS 介于 INFO 与 WARNING 之间
+DEBUG = 10
+INFO = 20
+SUCCESS = 25
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", SUCCESS: "SUCCESS", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+def level_from_name(name: str) -> int:
+    """把级别名称转换为数值"""
+    for level, level_name in LEVEL_NAMES.items():
+        if level_name == name.upper():
+            return level
+    raise ValueError(f"未知的事件级别: {name}")
+
+
+@dataclass
+class Event:
+    """进度事件基类
+
+    事件只保存结构化字段，文本在订阅者调用 format 时才生成。
+    """
+    level = INFO
+
+    @property
+    def level_name(self) -> str:
+        return LEVEL_NAMES.get(self.level, "INFO")
+
+    def format(self) -> str:
+        return self.__class__.__name__
+
+
+@dataclass
+class Message(Event):
+    """普通文本消息"""
+    text: str
+    level: int = INFO
+
+    def format(self) -> str:
+        return self.text
+
+
+@dataclass
+class PageRequested(Event):
+    """开始请求公告列表的一页"""
+    level = DEBUG
+    report_type: str
+    page: int
+    attempt: int
+    max_attempts: int
+    url: str = ''
+
+    def format(self) -> str:
+        return f"正在请求第 {self.page} 页数据 (尝试 {self.attempt}/{self.max_attempts})... {self.url}"
+
+
+@dataclass
+class PageFetched(Event):
+    """公告列表的一页请求完成"""
+    report_type: str
+    page: int
+    status_code: int
+    count: int
+    preview: str = ''
+
+    def format(self) -> str:
+        text = f"第 {self.page} 页找到 {self.count} 份{self.report_type} (状态码 {self.status_code})"
+        if self.preview:
+            text += f"\n服务器响应数据: {self.preview}"
+        return text
+
+
+@dataclass
+class ItemClassified(Event):
+    """一条公告完成类型判断"""
+    level = DEBUG
+    report_type: str
+    title: str
+    art_code: str
+    matched: bool
+    reason: str = ''
+
+    def format(self) -> str:
+        result = "保留" if self.matched else f"过滤 ({self.reason})"
+        return f"[{self.report_type}] {self.title} ({self.art_code}): {result}"
+
+
+@dataclass
+class DownloadStarted(Event):
+    """开始下载文件"""
+    title: str
+    url: str
+
+    def format(self) -> str:
+        return f"尝试下载文件: {self.title}\n下载链接: {self.url}"
+
+
+@dataclass
+class DownloadProgress(Event):
+    """文件下载进度"""
+    level = DEBUG
+    title: str
+    downloaded: int
+    total: int
+
+    def format(self) -> str:
+        if self.total:
+            return f"{self.title}: {self.downloaded / 1024 / 1024:.2f}/{self.total / 1024 / 1024:.2f} MB"
+        return f"{self.title}: {self.downloaded / 1024 / 1024:.2f} MB"
+
+
+@dataclass
+class DownloadFinished(Event):
+    """文件下载结束"""
+    title: str
+    path: str
+    success: bool
+    error: str = ''
+    level: int = SUCCESS
+
+    def format(self) -> str:
+        if self.success:
+            return f"文件已保存到: {self.path}"
+        return f"下载文件失败: {self.title}: {self.error}"
+
+
+@dataclass
+class BatchDownloadProgress(Event):
+    """一批下载的汇总进度，有文件完成时为 INFO，其余按刷新间隔发布的为 DEBUG"""
+    progress: BatchProgress
+    level: int = DEBUG
+
+    def format(self) -> str:
+        return f"下载进度: {self.progress.format()}"
+
+
+class _Subscription:
+    def __init__(self, callback: Callable[[List[Event]], None], min_level: int, batch_size: int):
+        self.callback = callback
+        self.min_level = min_level
+        self.batch_size = batch_size
+        self.pending: List[Event] = []
+
+
+class EventBus:
+    """按级别过滤、批量投递的进度事件总线
+
+    发布前先按所有订阅者中的最低级别过滤，没有订阅者关心的事件不会被创建，
+    也不会格式化文本。订阅者以列表形式批量收到事件，batch_size 为 1 时立即投递，
+    否则攒够一批或调用 flush 时投递。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: List[_Subscription] = []
+        self._min_level = ERROR + 1
+
+    def subscribe(self, callback: Callable[[List[Event]], None],
+                  min_level: int = INFO, batch_size: int = 1) -> Callable[[List[Event]], None]:
+        """订阅事件，callback 接收事件列表"""
+        with self._lock:
+            self._subscriptions.append(_Subscription(callback, min_level, max(1, batch_size)))
+            self._min_level = min(s.min_level for s in self._subscriptions)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[List[Event]], None]):
+        """取消订阅，未投递的事件会先投递"""
+        self.flush()
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s.callback is not callback]
+            self._min_level = min((s.min_level for s in self._subscriptions), default=ERROR + 1)
+
+    def enabled(self, level: int) -> bool:
+        """是否有订阅者关心该级别的事件"""
+        return level >= self._min_level
+
+    def emit(self, event_class: Type[Event], level: Optional[int] = None, **fields):
+        """按级别过滤后创建并发布事件"""
+        if level is None:
+            level = event_class.level
+        if level < self._min_level:
+            return
+        if 'level' in event_class.__dataclass_fields__:
+            fields['level'] = level
+        self.publish(event_class(**fields))
+
+    def publish(self, event: Event):
+        """发布已创建的事件"""
+        deliveries = []
+        with self._lock:
+            for subscription in self._subscriptions:
+                if event.level < subscription.min_level:
+                    continue
+                subscription.pending.append(event)
+                if len(subscription.pending) >= subscription.batch_size:
+                    deliveries.append((subscription.callback, subscription.pending))
+                    subscription.pending = []
+        for callback, events in deliveries:
+            callback(events)
+
+    def flush(self):
+        """投递所有未满一批的事件"""
+        deliveries = []
+        with self._lock:
+            for subscription in self._subscriptions:
+                if subscription.pending:
+                    deliveries.append((subscription.callback, subscription.pending))
+                    subscription.pending = []
+        for callback, events in deliveries:
+            callback(events)
+
+
+def text_subscriber(func: Callable[..., None], with_level: bool = False) -> Callable[[List[Event]], None]:
+    """把接收文本的回调（如 print 或 GUI 的 update_progress）包装成订阅者"""
+    def deliver(events: List[Event]):
+        for event in events:
+            if with_level:
+                func(event.format(), event.level_name)
+            else:
+                func(event.format())
+    return deliver
+
+
+def logging_subscriber(logger: logging.Logger) -> Callable[[List[Event]], None]:
+    """把事件转发到 logging，只有日志级别允许时才格式化"""
+    def deliver(events: List[Event]):
+        for event in events:
+            level = logging.INFO if event.level == SUCCESS else event.level
+            if logger.isEnabledFor(level):
+                logger.log(level, event.format())
+    return deliver
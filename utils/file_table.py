@@ -0,0 +1,152 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 可排序的列
+SORTABLE_COLUMNS = ('title', 'date', 'type', 'size')
+
+
+def _size_key(file_info: Dict) -> float:
+    """文件大小排序键，未知大小排在最前"""
+    file_size = file_info.get('file_size')
+    if file_size:
+        return float(file_size)
+    size_str = file_info.get('size', '')
+    try:
+        return float(size_str.replace('MB', '')) * 1024 * 1024
+    except (AttributeError, ValueError):
+        return -1.0
+
+
+class FileTableModel:
+    """可下载文件列表的内存表模型
+
+    以 art_code 为主键保存文件信息，加载时预先计算各列的排序键和搜索文本，
+    排序、过滤和按主键查找都不需要读取界面控件。视图只需根据 visible_rows
+    渲染当前可见的一小段行。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """清空所有数据"""
+        self._files: Dict[str, Dict] = {}
+        self._order: List[str] = []  # 加载顺序
+        self._sort_keys: Dict[str, Dict[str, object]] = {}
+        self._search_text: Dict[str, str] = {}
+        self._status: Dict[str, str] = {}
+        self._view: List[str] = []  # 过滤和排序后的行
+        self._query = ''
+        self.sort_column: Optional[str] = None
+        self.sort_reverse = False
+        self.selection = set()
+
+    def load(self, files: Iterable[Dict], status: str = '未下载'):
+        """加载文件列表，重复的 art_code 只保留第一条"""
+        self.clear()
+        for file_info in files:
+            art_code = file_info.get('art_code')
+            if not art_code or art_code in self._files:
+                continue
+            date = file_info['date']
+            date_str = date.strftime('%Y-%m-%d') if isinstance(date, datetime) else str(date)
+            self._files[art_code] = file_info
+            self._order.append(art_code)
+            self._status[art_code] = status
+            self._sort_keys[art_code] = {
+                'title': file_info['title'].lower(),
+                'date': date_str,
+                'type': file_info['type'].lower(),
+                'size': _size_key(file_info),
+            }
+            self._search_text[art_code] = '\x00'.join(
+                (file_info['title'], file_info['type'], date_str)
+            ).lower()
+        self._view = list(self._order)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @property
+    def row_count(self) -> int:
+        """过滤后的行数"""
+        return len(self._view)
+
+    def get(self, art_code: str) -> Optional[Dict]:
+        """按 art_code 获取完整文件信息"""
+        return self._files.get(art_code)
+
+    def get_status(self, art_code: str) -> str:
+        return self._status.get(art_code, '')
+
+    def set_status(self, art_code: str, status: str):
+        if art_code in self._files:
+            self._status[art_code] = status
+
+    def row_values(self, art_code: str) -> Tuple[str, str, str, str, str]:
+        """返回视图中一行的显示值"""
+        file_info = self._files[art_code]
+        return (
+            file_info['title'],
+            self._sort_keys[art_code]['date'],
+            file_info['type'],
+            file_info['size'],
+            self._status[art_code],
+        )
+
+    def visible_rows(self, start: int, count: int) -> List[str]:
+        """返回过滤排序后从 start 开始的 count 行的 art_code"""
+        return self._view[start:start + count]
+
+    def sort(self, column: str):
+        """按列排序，再次对同一列排序时切换升降序"""
+        if column not in SORTABLE_COLUMNS:
+            return
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self._apply_sort()
+
+    def _apply_sort(self):
+        if self.sort_column is None:
+            return
+        keys = self._sort_keys
+        column = self.sort_column
+        self._view.sort(key=lambda code: keys[code][column], reverse=self.sort_reverse)
+
+    def filter(self, query: str):
+        """按标题、类型和日期过滤
+
+        新查询包含上一次的查询时（连续输入），只在上一次的结果中继续筛选。
+        """
+        query = query.lower()
+        if not query:
+            self._view = list(self._order)
+            self._apply_sort()
+        else:
+            candidates = self._view if self._query and self._query in query else self._order
+            search_text = self._search_text
+            self._view = [code for code in candidates if query in search_text[code]]
+            if candidates is self._order:
+                self._apply_sort()
+        self._query = query
+
+    def selected_files(self) -> List[Dict]:
+        """按当前视图顺序返回选中且未被过滤掉的文件信息"""
+        return [self._files[code] for code in self._view if code in self.selection]
+
+    def select_where(self, column: str, value: str):
+        """选中指定列等于（日期列为以之开头）给定值的所有行"""
+        if column == 'date':
+            matched = (code for code in self._view if self._sort_keys[code]['date'].startswith(value))
+        else:
+            matched = (code for code in self._view if self._files[code][column] == value)
+        self.selection = set(matched)
+
+    def select_all(self):
+        self.selection = set(self._view)
+
+    def deselect_all(self):
+        self.selection = set()
@@ -0,0 +1,142 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 中心线相差不超过该值（pt）的单词视为同一行
+ROW_TOLERANCE = 3.0
+
+# 数值单词的横向区间相距不超过该值（pt）时合并为同一列
+COLUMN_GAP = 1.0
+
+# 表头最多向上合并的行数，如 "期末余额" 下面再有一行日期
+MAX_HEADER_ROWS = 2
+
+# 数值单元格，如 1,234.56、(1,234.56)、-12、15.3%
+NUMERIC_CELL_PATTERN = re.compile(r'[-(（]?\d[\d,]*(?:\.\d+)?[)）]?%?')
+
+Word = Dict
+Row = List[Word]
+
+
+def _is_numeric(text: str) -> bool:
+    return bool(NUMERIC_CELL_PATTERN.fullmatch(text))
+
+
+def group_rows(words: List[Word], tolerance: float = ROW_TOLERANCE) -> List[Row]:
+    """按纵向位置把单词聚成行，行内按横坐标排序"""
+    rows: List[Row] = []
+    row_middle = None
+    for word in sorted(words, key=lambda w: ((w['top'] + w['bottom']) / 2, w['x0'])):
+        middle = (word['top'] + word['bottom']) / 2
+        if rows and abs(middle - row_middle) <= tolerance:
+            rows[-1].append(word)
+            row_middle += (middle - row_middle) / len(rows[-1])
+        else:
+            rows.append([word])
+            row_middle = middle
+    for row in rows:
+        row.sort(key=lambda w: w['x0'])
+    return rows
+
+
+def _row_text(row: Row) -> str:
+    return ''.join(word['text'] for word in row)
+
+
+def _is_data_row(row: Row) -> bool:
+    """行首是项目名称、后面至少有一个数值的行"""
+    return len(row) >= 2 and any(_is_numeric(word['text']) for word in row[1:])
+
+
+def column_bands(rows: List[Row], gap: float = COLUMN_GAP) -> List[Tuple[float, float]]:
+    """根据数据行中除行首项目名称外的单词位置，求出各数值列的横向区间
+
+    同一列的数值通常右对齐或左对齐，横向区间相互重叠，合并后即为一列；
+    行首的项目名称长短不一，可能横跨多列，不参与计算。
+    """
+    intervals = sorted((word['x0'], word['x1']) for row in rows if _is_data_row(row)
+                       for word in row[1:])
+    bands: List[List[float]] = []
+    for x0, x1 in intervals:
+        if bands and x0 <= bands[-1][1] + gap:
+            bands[-1][1] = max(bands[-1][1], x1)
+        else:
+            bands.append([x0, x1])
+    return [(x0, x1) for x0, x1 in bands]
+
+
+def _assign_cells(row: Row, bands: List[Tuple[float, float]]) -> List[str]:
+    """把一行的单词分配到项目列和各数值列"""
+    cells = [''] * (len(bands) + 1)
+    first_band_start = bands[0][0]
+    for index, word in enumerate(row):
+        # 行首的项目名称可能很长，只要起点在第一列数值左侧就归入项目列
+        if word['x1'] <= first_band_start + COLUMN_GAP or (index == 0 and word['x0'] < first_band_start):
+            column = 0
+        else:
+            overlaps = [min(word['x1'], x1) - max(word['x0'], x0) for x0, x1 in bands]
+            best = max(range(len(bands)), key=lambda i: overlaps[i])
+            if overlaps[best] <= 0:
+                center = (word['x0'] + word['x1']) / 2
+                best = min(range(len(bands)),
+                           key=lambda i: abs(center - (bands[i][0] + bands[i][1]) / 2))
+            column = best + 1
+        cells[column] += word['text']
+    return cells
+
+
+def words_to_table(words: List[Word], keyword: Optional[str] = None,
+                   row_tolerance: float = ROW_TOLERANCE) -> Optional[List[List[str]]]:
+    """根据单词坐标重建无框线表格
+
+    纵向坐标聚类得到行，数据行中数值单词的横向区间聚类得到列。表格从第一条
+    数据行开始、到最后一条数据行结束，紧邻其上的多列文字行合并为表头。
+
+    Args:
+        words: pdfplumber 的 extract_words 结果
+        keyword: 报表标题关键词，给出时只处理标题下方的行，遇到下一张报表的标题时结束
+        row_tolerance: 行聚类的纵向容差
+
+    Returns:
+        与 extract_tables 中单个表格格式相同的二维列表，第一行为表头；没有数据行时为None
+    """
+    rows = group_rows(words, row_tolerance)
+    if keyword:
+        title_index = next((i for i, row in enumerate(rows) if keyword in _row_text(row)), None)
+        if title_index is not None:
+            rows = rows[title_index + 1:]
+            # 下一张报表的标题（单独一行、以"表"结尾）
+            end = next((i for i, row in enumerate(rows)
+                        if len(row) == 1 and _row_text(row).endswith('表')), len(rows))
+            rows = rows[:end]
+
+    bands = column_bands(rows)
+    if not bands:
+        return None
+    data_indexes = [i for i, row in enumerate(rows) if _is_data_row(row)]
+    first, last = data_indexes[0], data_indexes[-1]
+
+    # 向上查找表头，跳过 "流动资产：" 这类单独一行的分组标题，它们属于表体
+    header_rows = []
+    body_start = first
+    index = first - 1
+    while index >= 0 and len(header_rows) < MAX_HEADER_ROWS:
+        row = rows[index]
+        if '单位' in _row_text(row):
+            break
+        if len(row) >= 2:
+            if not header_rows:
+                body_start = index + 1
+            header_rows.insert(0, row)
+        elif header_rows:
+            break
+        index -= 1
+
+    header = [''] * (len(bands) + 1)
+    for row in header_rows:
+        header = [top + bottom for top, bottom in zip(header, _assign_cells(row, bands))]
+    return [header] + [_assign_cells(row, bands) for row in rows[body_start:last + 1]]
+
+
+def extract_layout_table(page, keyword: Optional[str] = None) -> Optional[List[List[str]]]:
+    """从 pdfplumber 页面的单词坐标重建报表表格，不做框线检测"""
+    return words_to_table(page.extract_words(), keyword)
@@ -0,0 +1,80 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Tuple
+
+# (序号, 时间, 级别, 消息)
+LogEntry = Tuple[int, str, str, str]
+
+
+class LogBuffer:
+    """有界的环形日志缓冲区
+
+    最多保留 capacity 条日志，超出后丢弃最早的记录。每个级别单独维护一份
+    序号索引，按级别取最近 n 条时只需访问这 n 条记录。新写入的记录同时进入
+    待显示队列，由界面线程定时批量取出。可以在任意线程中写入。
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries: Deque[LogEntry] = deque(maxlen=capacity)
+        self._by_level: Dict[str, Deque[int]] = {}
+        self._pending: List[LogEntry] = []
+        self._next_seq = 0
+
+    def append(self, message: str, level: str = "INFO") -> LogEntry:
+        """写入一条日志"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            entry = (self._next_seq, timestamp, level, message)
+            self._next_seq += 1
+            self._entries.append(entry)
+            self._by_level.setdefault(level, deque(maxlen=self.capacity)).append(entry[0])
+            self._pending.append(entry)
+            if len(self._pending) > self.capacity:
+                del self._pending[:-self.capacity]
+        return entry
+
+    def drain_pending(self) -> List[LogEntry]:
+        """取出自上次调用以来新写入的日志"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def tail(self, level: str = "ALL", count: int = 1000) -> List[LogEntry]:
+        """返回指定级别最近的 count 条日志，按时间顺序排列"""
+        with self._lock:
+            if not self._entries:
+                return []
+            if level == "ALL":
+                start = max(0, len(self._entries) - count)
+                return [self._entries[i] for i in range(start, len(self._entries))]
+
+            first_seq = self._entries[0][0]
+            result = []
+            for seq in reversed(self._by_level.get(level, ())):
+                # 已被环形缓冲区淘汰的记录
+                if seq < first_seq or len(result) >= count:
+                    break
+                result.append(self._entries[seq - first_seq])
+            result.reverse()
+            return result
+
+    def entries(self) -> List[LogEntry]:
+        """返回缓冲区中的全部日志"""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        """清空缓冲区"""
+        with self._lock:
+            self._entries.clear()
+            self._by_level.clear()
+            self._pending = []
+
+    @staticmethod
+    def format_entry(entry: LogEntry) -> str:
+        """把日志格式化为一行文本"""
+        _, timestamp, level, message = entry
+        return f"[{timestamp}] [{level}] {message}\n"
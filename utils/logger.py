@@ -1,46 +1,113 @@
+import atexit
+import itertools
+import json
 import logging
 import logging.handlers
 import os
+import queue
+import threading
+from typing import Dict, List
 from .config_manager import ConfigManager
 
+# LogRecord 的标准属性，其余属性视为通过 extra 传入的结构化字段
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """把日志格式化为一行 JSON，通过 extra 传入的字段原样输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+            'process': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """按模块对 DEBUG 日志抽样
+
+    rates 为模块名前缀到保留比例的映射，如 {'crawler': 0.1} 表示 crawler 及其子模块的
+    DEBUG 日志每 10 条保留 1 条。按计数抽样而不是随机抽样，结果可以复现。
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # 较长的前缀优先匹配
+        self.intervals = sorted(((name, max(1, round(1 / rate)) if rate > 0 else 0)
+                                 for name, rate in rates.items()),
+                                key=lambda item: -len(item[0]))
+        self.counters = {name: itertools.count() for name, _ in self.intervals}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        for name, interval in self.intervals:
+            if record.name == name or record.name.startswith(name + '.'):
+                if not interval:
+                    return False
+                return next(self.counters[name]) % interval == 0
+        return True
+
+
 class Logger:
+    """日志系统
+
+    根日志记录器上只有一个 QueueHandler，调用方只把记录放进队列，不做任何 I/O；
+    文件、控制台和 JSON Lines 输出由 QueueListener 的后台线程完成。下载、解析的
+    工作线程和 asyncio 事件循环都不会因为写日志或日志轮转而阻塞。
+
+    入口脚本启动时创建实例；没有创建时，第一次调用 get_logger 会自动创建。
+    """
     _instance = None
-    
+    _instance_lock = threading.Lock()
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(Logger, cls).__new__(cls)
             cls._instance._initialized = False
         return cls._instance
-    
+
     def __init__(self):
         if self._initialized:
             return
-            
-        self.config = ConfigManager()
-        self._setup_logger()
-        self._initialized = True
-    
-    def _setup_logger(self):
-        """配置日志系统"""
-        log_file = self.config.get('logging.file', 'stock_crawler.log')
-        log_level = self.config.get('logging.level', 'INFO')
-        log_format = self.config.get('logging.format',
-                                   '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        max_size = self.config.get('logging.max_size', 10 * 1024 * 1024)  # 10MB
-        backup_count = self.config.get('logging.backup_count', 5)
-        
+        with self._instance_lock:
+            if self._initialized:
+                return
+
+            self.config = ConfigManager()
+            self._listener = None
+            self._queue_handler = None
+            self._setup_logger()
+            self._initialized = True
+
+    def _create_handlers(self) -> List[logging.Handler]:
+        """创建实际输出日志的处理器"""
+        settings = self.config.snapshot().logging
+        log_file = settings.file
+        log_format = settings.format
+        max_size = settings.max_size
+        backup_count = settings.backup_count
+        json_file = settings.json_file
+
         # 创建日志目录
-        log_dir = os.path.dirname(log_file)
-        if log_dir and not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        
-        # 配置根日志记录器
-        logger = logging.getLogger()
-        logger.setLevel(getattr(logging, log_level))
-        
+        for path in (log_file, json_file):
+            log_dir = os.path.dirname(path) if path else ''
+            if log_dir and not os.path.exists(log_dir):
+                os.makedirs(log_dir)
+
         # 创建格式化器
         formatter = logging.Formatter(log_format)
-        
+
         # 添加文件处理器
         file_handler = logging.handlers.RotatingFileHandler(
             log_file,
@@ -49,14 +116,82 @@ class Logger:
             encoding='utf-8'
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-        
-        # 添加控制台处理器
+
+        # 添加控制台处理器，CLI 和 GUI 自己显示进度，控制台默认只输出警告和错误
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
-    
+        console_handler.setLevel(getattr(logging, settings.console_level, logging.WARNING))
+        handlers = [file_handler, console_handler]
+
+        # 结构化 JSON Lines 输出，便于用脚本分析
+        if json_file:
+            json_handler = logging.handlers.RotatingFileHandler(
+                json_file,
+                maxBytes=max_size,
+                backupCount=backup_count,
+                encoding='utf-8'
+            )
+            json_handler.setFormatter(JsonLinesFormatter())
+            handlers.append(json_handler)
+        return handlers
+
+    def _setup_logger(self):
+        """配置日志系统"""
+        settings = self.config.snapshot().logging
+        sampling = settings.debug_sampling
+
+        # 配置根日志记录器
+        logger = logging.getLogger()
+        logger.setLevel(getattr(logging, settings.level))
+
+        # SimpleQueue 无界，放入记录时不会阻塞
+        log_queue = queue.SimpleQueue()
+        self._queue_handler = logging.handlers.QueueHandler(log_queue)
+        if sampling:
+            # 在放入队列之前抽样，被丢弃的记录不会进入队列
+            self._queue_handler.addFilter(SamplingFilter(sampling))
+        logger.addHandler(self._queue_handler)
+
+        self._handlers = self._create_handlers()
+        self._listener = logging.handlers.QueueListener(log_queue, *self._handlers,
+                                                        respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.shutdown)
+        # 配置文件热加载后日志级别立即生效，其余设置需要重启
+        self.config.subscribe(self._apply_level)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    @staticmethod
+    def _apply_level(snapshot):
+        level = getattr(logging, snapshot.logging.level, None)
+        if isinstance(level, int):
+            logging.getLogger().setLevel(level)
+
+    def _restart_in_child(self):
+        """fork 出的子进程中没有监听线程，换用新的队列并启动自己的监听线程"""
+        if self._listener is None:
+            return
+        log_queue = queue.SimpleQueue()
+        self._queue_handler.queue = log_queue
+        self._listener = logging.handlers.QueueListener(log_queue, *self._handlers,
+                                                        respect_handler_level=True)
+        self._listener.start()
+
+    def shutdown(self):
+        """处理完队列中剩余的日志并停止监听线程
+
+        处理器的 flush 和 close 留给 logging.shutdown，它在本函数之后执行，
+        并会跳过已经关闭的流（如测试框架替换掉的 stderr）。
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
     @staticmethod
     def get_logger(name: str = None) -> logging.Logger:
-        """获取日志记录器"""
+        """获取日志记录器，日志系统尚未配置时先完成配置"""
+        instance = Logger._instance
+        if instance is None or not instance._initialized:
+            Logger()
         return logging.getLogger(name)
@@ -0,0 +1,262 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 直方图每个 2 的幂区间内的子桶数，相对误差约为 1 / (2 * SUB_BUCKETS)
+SUB_BUCKETS = 16
+
+# 导出为 Prometheus 直方图时默认使用的桶上界（秒）
+DEFAULT_EXPORT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, object] = {}
+
+    def series(self) -> List[Tuple[LabelKey, object]]:
+        with self._lock:
+            return sorted(self._series.items())
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(_label_key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值，如队列长度、进行中的下载数"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._series[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._series.get(_label_key(labels), 0)
+
+
+class _HistogramSeries:
+    """对数-线性分桶的直方图数据（HDR 风格）
+
+    每个 2 的幂区间再等分为 SUB_BUCKETS 个子桶，任何量级的数值都有相同的相对精度，
+    内存只与出现过的量级有关。
+    """
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @staticmethod
+    def bucket_index(value: float) -> int:
+        if value <= 0:
+            return -(1 << 30)
+        mantissa, exponent = math.frexp(value)
+        return exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS)
+
+    @staticmethod
+    def bucket_upper(index: int) -> float:
+        if index == -(1 << 30):
+            return 0.0
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2 * SUB_BUCKETS), exponent)
+
+    def record(self, value: float):
+        index = self.bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return math.nan
+        target = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds) -> List[int]:
+        ordered = sorted(self.buckets.items())
+        counts = []
+        seen = 0
+        position = 0
+        for bound in bounds:
+            while position < len(ordered) and self.bucket_upper(ordered[position][0]) <= bound:
+                seen += ordered[position][1]
+                position += 1
+            counts.append(seen)
+        return counts
+
+
+class Histogram(_Metric):
+    """耗时、大小等数值的分布，可以给出任意分位数"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, export_buckets=DEFAULT_EXPORT_BUCKETS):
+        super().__init__(name, help_text)
+        self.export_buckets = tuple(export_buckets)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries()
+            series.record(value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """记录代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """进程内的指标注册表
+
+    各模块在导入时用 counter、gauge、histogram 取得（或创建）指标，记录时只做一次
+    加锁的字典更新。运行结束时导出为 Prometheus 文本格式或打印摘要表。
+    多进程批量解析时各工作进程的指标互相独立，不会汇总到主进程。
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance._metrics = {}
+            cls._instance._started = time.time()
+        return cls._instance
+
+    def _get_or_create(self, metric_class, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, help_text, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str = '') -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = '') -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = '',
+                  export_buckets=DEFAULT_EXPORT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, export_buckets=export_buckets)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def reset(self):
+        """清空所有指标的数据，指标本身保留"""
+        for metric in self.metrics():
+            metric.reset()
+        self._started = time.time()
+
+    def format_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        for metric in self.metrics():
+            series = metric.series()
+            if not series:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in series:
+                if metric.kind != 'histogram':
+                    lines.append(f"{metric.name}{_format_labels(key)} {value}")
+                    continue
+                for bound, count in zip(metric.export_buckets, value.cumulative(metric.export_buckets)):
+                    lines.append(f"{metric.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {count}")
+                lines.append(f"{metric.name}_bucket{_format_labels(key, ('le', '+Inf'))} {value.count}")
+                lines.append(f"{metric.name}_sum{_format_labels(key)} {value.sum}")
+                lines.append(f"{metric.name}_count{_format_labels(key)} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """写入 Prometheus 文本文件（可由 node_exporter 的 textfile 收集器读取）"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.format_prometheus())
+        os.replace(tmp_path, path)
+
+    def summary_table(self) -> str:
+        """生成便于阅读的摘要表，计数器附带按运行时长计算的速率"""
+        elapsed = max(time.time() - self._started, 1e-9)
+        rows = []
+        for metric in self.metrics():
+            for key, value in metric.series():
+                name = metric.name + _format_labels(key)
+                if metric.kind == 'counter':
+                    rows.append((name, f"{value:g}", f"{value / elapsed:.2f}/s"))
+                elif metric.kind == 'gauge':
+                    rows.append((name, f"{value:g}", ''))
+                else:
+                    rows.append((name, f"n={value.count}",
+                                 f"p50={value.quantile(0.5):.3f} p95={value.quantile(0.95):.3f} "
+                                 f"p99={value.quantile(0.99):.3f} max={value.max:.3f}"))
+        if not rows:
+            return ''
+        width = max(len(row[0]) for row in rows)
+        lines = [f"{'指标':<{width}}  {'数值':>12}  详情", '-' * (width + 40)]
+        lines.extend(f"{name:<{width}}  {count:>12}  {detail}" for name, count, detail in rows)
+        return '\n'.join(lines)
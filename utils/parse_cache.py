@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config_manager import ConfigManager
+from .logger import Logger
+
+# 计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ParseCache:
+    """PDF解析结果的两级缓存
+
+    第一级是进程内的 LRU，第二级是磁盘上的 pickle 文件。键由文件内容的
+    SHA-256、解析器版本和缓存类型组成，文件内容或解析器版本变化后旧条目
+    自然失效，不需要手动清理。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, memory_items: int = 256):
+        config = ConfigManager()
+        self.cache_dir = cache_dir or config.get('analysis.cache_dir', '.parse_cache')
+        self.memory_items = memory_items
+        self.logger = Logger.get_logger(__name__)
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[Tuple[str, str, str], Any]' = OrderedDict()
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+
+    def file_hash(self, file_path: str) -> str:
+        """计算文件内容哈希，按路径、大小和修改时间记住结果"""
+        stat = os.stat(file_path)
+        stat_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._hashes.get(stat_key)
+        if digest is None:
+            sha256 = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+            self._hashes[stat_key] = digest
+        return digest
+
+    def _disk_path(self, key: Tuple[str, str, str]) -> str:
+        digest, version, kind = key
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}-{version}-{kind}.pkl")
+
+    def get(self, digest: str, version: str, kind: str) -> Optional[Any]:
+        """读取缓存，未命中时返回None"""
+        key = (digest, version, kind)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取解析缓存失败: {path}: {str(e)}")
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, digest: str, version: str, kind: str, value: Any):
+        """写入两级缓存，磁盘文件先写临时文件再替换"""
+        key = (digest, version, kind)
+        self._remember(key, value)
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"写入解析缓存失败: {path}: {str(e)}")
+
+    def _remember(self, key: Tuple[str, str, str], value: Any):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def clear_memory(self):
+        """清空进程内缓存"""
+        with self._lock:
+            self._memory.clear()
+
+
+_default_cache = None
+
+
+def get_default_cache() -> ParseCache:
+    """返回进程内共享的默认缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
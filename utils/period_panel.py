@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, Optional, TYPE_CHECKING
+
+from .logger import Logger
+from .statement_store import StatementStore
+
+# pandas 和 numpy 导入较慢，只在计算时才加载
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 披露年初至报告期末累计数的报表，需要差分得到单季度数值；资产负债表是时点数，不需要
+FLOW_STATEMENTS = ('利润表', '现金流量表')
+
+# 物化后的对齐面板，文件名以下划线开头，不会被 StatementStore 当作数据文件读取
+PANEL_FILE = '_aligned_panel.parquet'
+
+KEY_COLUMNS = ['stock', 'period', 'statement', 'item']
+
+
+def latest_records(records: pd.DataFrame) -> pd.DataFrame:
+    """同一股票、报告期、报表和项目有多条记录时，按报告类型和列的含义选出一个数值
+
+    报告自身的报告期数值，以及同类报告中同一财务期间的上年比较数（如年报的
+    上年数、第三季度报告的上年同期数）优先，其中取最新发布的报告，即以追溯调整
+    后的数据为准；公告编号中含发布日期，编号越大发布越晚。其他比较数（如中期
+    报告中的上年年末余额）只在没有上述数值时使用，不会覆盖年报本身的数值。
+    没有 report_period 的旧数据视为报告自身的数值。
+    """
+    import pandas as pd
+
+    period = pd.to_datetime(records['period'])
+    if 'report_period' in records.columns:
+        report_period = pd.to_datetime(records['report_period'])
+    else:
+        report_period = pd.Series(pd.NaT, index=records.index)
+    same_fiscal_period = (report_period.isna()
+                          | ((period.dt.month == report_period.dt.month)
+                             & (period.dt.day == report_period.dt.day)))
+    records = records.assign(_priority=same_fiscal_period.astype(int))
+    records = records.sort_values(['_priority', 'art_code'], kind='stable')
+    records = records.drop_duplicates(KEY_COLUMNS, keep='last').drop(columns='_priority')
+    return records.reset_index(drop=True)
+
+
+def derive_quarters(records: pd.DataFrame) -> pd.DataFrame:
+    """对齐报告期并计算单季度数值
+
+    利润表和现金流量表的第一季度数值即为单季度，其余季度用本期累计数减去同一
+    财年上一季度末的累计数；上一季度缺失时单季度数值为 NaN。资产负债表的单季度
+    数值就是期末数。全部通过索引查找和数组运算完成，不逐行循环。
+
+    Args:
+        records: StatementStore.query 返回的长表
+
+    Returns:
+        去重后的长表，增加 quarter 列（季度，1-4）和 quarter_value 列（单季度数值）
+    """
+    import numpy as np
+    import pandas as pd
+
+    frame = latest_records(records)
+    frame['period'] = pd.to_datetime(frame['period'])
+    quarter = frame['period'].dt.quarter.to_numpy()
+    values = frame['value'].to_numpy(dtype='float64')
+
+    key = pd.MultiIndex.from_frame(frame[KEY_COLUMNS])
+    previous_key = pd.MultiIndex.from_arrays([
+        frame['stock'], frame['period'] - pd.offsets.QuarterEnd(1), frame['statement'], frame['item'],
+    ])
+    positions = key.get_indexer(previous_key)
+    previous = np.full(len(frame), np.nan)
+    found = positions >= 0
+    previous[found] = values[positions[found]]
+
+    single = np.where(quarter == 1, values, values - previous)
+    is_flow = frame['statement'].isin(FLOW_STATEMENTS).to_numpy()
+    frame['quarter'] = quarter
+    frame['quarter_value'] = np.where(is_flow, single, values)
+    return frame
+
+
+class AlignedPanel:
+    """按 (股票, 报告期) 对齐的报表数据，同时保留累计数和单季度数
+
+    由 derive_quarters 的结果构造，供比率计算和图表复用，不需要各自重新整理。
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def wide(self, quarterly: bool = False) -> pd.DataFrame:
+        """以 (stock, period) 为索引、报表项目为列的宽表，可直接传给 ratio_engine.compute_ratios
+
+        Args:
+            quarterly: 利润表、现金流量表项目是否使用单季度数值，否则为累计数
+        """
+        column = 'quarter_value' if quarterly else 'value'
+        panel = self.frame.pivot_table(index=['stock', 'period'], columns='item',
+                                       values=column, aggfunc='first')
+        panel.columns.name = None
+        return panel.sort_index().astype('float64')
+
+    def statement_frames(self, stock: str, quarterly: bool = False) -> Dict[str, pd.DataFrame]:
+        """某只股票各报表以报告期为行、项目为列的表格，格式与 DataVisualizer 的输入一致"""
+        column = 'quarter_value' if quarterly else 'value'
+        subset = self.frame[self.frame['stock'] == stock]
+        frames = {}
+        for name, group in subset.groupby('statement', sort=False):
+            table = group.pivot_table(index='period', columns='item', values=column, aggfunc='first')
+            table.columns.name = None
+            frames[name] = table.sort_index()
+        return frames
+
+
+def _latest_mtime(root: str, exclude: str) -> float:
+    latest = 0.0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if path != exclude and name.endswith('.parquet'):
+                latest = max(latest, os.path.getmtime(path))
+    return latest
+
+
+def load_aligned_panel(store: Optional[StatementStore] = None, refresh: bool = False) -> AlignedPanel:
+    """读取物化的对齐面板，存储中有更新的数据或 refresh 为True时重新计算并保存
+
+    面板保存在存储目录下的 PANEL_FILE 中，只要没有新报告入库，之后的调用直接读取。
+    """
+    import pandas as pd
+
+    logger = Logger.get_logger(__name__)
+    store = store or StatementStore()
+    panel_path = os.path.join(store.root, PANEL_FILE)
+    if (not refresh and os.path.exists(panel_path)
+            and os.path.getmtime(panel_path) >= _latest_mtime(store.root, panel_path)):
+        return AlignedPanel(pd.read_parquet(panel_path))
+
+    frame = derive_quarters(store.query())
+    if os.path.isdir(store.root):
+        tmp_path = f"{panel_path}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, panel_path)
+        logger.debug(f"已物化对齐面板: {len(frame)} 条记录")
+    return AlignedPanel(frame)
@@ -0,0 +1,119 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 当前进程中正在记录的 Profiler，没有时各处的 span 都是空操作
+_active = None
+
+
+class Profiler:
+    """按阶段记录耗时，输出 Chrome trace-event 格式的时间线
+
+    start 之后，各模块通过 span 把列表获取、分类、下载、写清单等阶段记录为
+    trace 中的区间事件，写出的 JSON 可以在 chrome://tracing、Perfetto 或 speedscope
+    中打开。cprofile 为True时同时用 cProfile 采集函数级耗时（只覆盖调用 start 的线程），
+    与 trace 文件放在一起，可以用 snakeviz 或 pstats 查看。
+    """
+
+    def __init__(self, cprofile: bool = False):
+        self._lock = threading.Lock()
+        self._events: List[dict] = []
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter_ns()
+        self._profile = cProfile.Profile() if cprofile else None
+        self.started_at = time.strftime('%Y%m%d_%H%M%S')
+
+    def start(self):
+        """开始记录，并作为当前进程的 Profiler"""
+        global _active
+        self._origin = time.perf_counter_ns()
+        _active = self
+        if self._profile is not None:
+            self._profile.enable()
+
+    def stop(self):
+        global _active
+        if self._profile is not None:
+            self._profile.disable()
+        if _active is self:
+            _active = None
+
+    @contextmanager
+    def span(self, name: str, category: str = 'stage', **args) -> Iterator[None]:
+        """把代码块记录为一个区间事件，args 会显示在 trace 查看器的详情中"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            thread = threading.current_thread()
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - self._origin) / 1000,
+                'dur': (end - start) / 1000,
+                'pid': os.getpid(),
+                'tid': thread.ident,
+            }
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            with self._lock:
+                self._events.append(event)
+                self._threads.setdefault(thread.ident, thread.name)
+
+    def events(self) -> List[dict]:
+        with self._lock:
+            return list(self._events)
+
+    def summary(self) -> List[Tuple[str, int, float]]:
+        """各阶段的次数和总耗时（秒），按总耗时从大到小排列"""
+        totals: Dict[str, List[float]] = {}
+        for event in self.events():
+            total = totals.setdefault(event['name'], [0, 0.0])
+            total[0] += 1
+            total[1] += event['dur'] / 1e6
+        return sorted(((name, int(count), seconds) for name, (count, seconds) in totals.items()),
+                      key=lambda row: -row[2])
+
+    def write_trace(self, path: str) -> List[str]:
+        """写入 trace 文件，启用 cProfile 时在同一位置写入同名的 .prof 文件
+
+        Returns:
+            写入的文件路径列表
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident,
+                         'args': {'name': name}} for ident, name in self._threads.items()]
+            events = metadata + self._events
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        written = [path]
+
+        if self._profile is not None:
+            profile_path = os.path.splitext(path)[0] + '.prof'
+            self._profile.dump_stats(profile_path)
+            written.append(profile_path)
+        return written
+
+
+def active_profiler() -> Optional[Profiler]:
+    return _active
+
+
+def span(name: str, category: str = 'stage', **args):
+    """在当前 Profiler 中记录一个阶段，未启用性能分析时不做任何事"""
+    profiler = _active
+    if profiler is None:
+        return nullcontext()
+    return profiler.span(name, category, **args)
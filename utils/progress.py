@@ -0,0 +1,172 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 进度刷新的默认最小间隔（秒）和单个文件两次上报之间的最小字节增量
+DEFAULT_INTERVAL = 0.25
+DEFAULT_MIN_BYTES = 256 * 1024
+
+
+class ProgressThrottle:
+    """单个文件的进度上报节流
+
+    距上次上报超过 interval 秒且新增字节数达到 min_bytes 时才上报；下载完成时
+    （downloaded 达到 total）总是上报，保证界面最终显示 100%。
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, min_bytes: int = DEFAULT_MIN_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.min_bytes = min_bytes
+        self.clock = clock
+        self._last_time = -float('inf')
+        self._last_bytes = 0
+
+    def should_report(self, downloaded: int, total: int = 0) -> bool:
+        now = self.clock()
+        finished = bool(total) and downloaded >= total
+        if not finished and (now - self._last_time < self.interval
+                             or downloaded - self._last_bytes < self.min_bytes):
+            return False
+        self._last_time = now
+        self._last_bytes = downloaded
+        return True
+
+
+@dataclass
+class FileProgress:
+    name: str
+    downloaded: int = 0
+    total: int = 0
+    done: bool = False
+    success: bool = False
+    reported: int = -1
+
+
+@dataclass
+class BatchProgress:
+    """一批下载的汇总进度"""
+    files_total: int
+    files_done: int
+    files_failed: int
+    bytes_done: int
+    bytes_total: int
+    elapsed: float
+    eta: Optional[float]
+    # 本次刷新中进度有变化的文件：(文件名, 已下载字节数, 总字节数)
+    changed: List[Tuple[str, int, int]] = field(default_factory=list)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def format(self) -> str:
+        text = (f"{self.files_done}/{self.files_total} 个文件, "
+                f"{self.bytes_done / 1024 / 1024:.2f} MB, {self.bytes_per_second / 1024 / 1024:.2f} MB/s")
+        if self.eta is not None:
+            text += f", 预计剩余 {self.eta:.0f} 秒"
+        return text
+
+
+class BatchProgressTracker:
+    """集中汇总一批并发下载的进度，并以固定频率向界面发布
+
+    下载协程或线程每写一个数据块只调用 update 更新计数，开销是一次加锁的字典更新；
+    距上次发布超过 interval 秒时才生成一次 BatchProgress 交给回调，其中只包含新增
+    字节达到 min_bytes 或已结束的文件。并发数和块大小再大，界面刷新频率也不会超过
+    1 / interval。publish_on_finish 为True时每个文件结束都立即发布，适合逐个下载、
+    文件完成次数不多的场景。
+    """
+
+    def __init__(self, callback: Callable[[BatchProgress], None],
+                 interval: float = DEFAULT_INTERVAL, min_bytes: int = DEFAULT_MIN_BYTES,
+                 clock: Callable[[], float] = time.monotonic, publish_on_finish: bool = False):
+        self.callback = callback
+        self.publish_on_finish = publish_on_finish
+        self.interval = interval
+        self.min_bytes = min_bytes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._files: Dict[str, FileProgress] = {}
+        self._started = clock()
+        self._last_publish = -float('inf')
+
+    def start(self, names: List[str]):
+        """开始一批下载，names 为各文件的名称"""
+        with self._lock:
+            self._files = {name: FileProgress(name) for name in names}
+            self._started = self.clock()
+            self._last_publish = -float('inf')
+
+    def update(self, name: str, downloaded: int, total: int = 0):
+        with self._lock:
+            progress = self._files.get(name)
+            if progress is None:
+                progress = self._files[name] = FileProgress(name)
+            progress.downloaded = downloaded
+            progress.total = total or progress.total
+            due = self.clock() - self._last_publish >= self.interval
+        if due:
+            self.publish()
+
+    def finish(self, name: str, success: bool):
+        with self._lock:
+            progress = self._files.get(name)
+            if progress is None:
+                progress = self._files[name] = FileProgress(name)
+            progress.done = True
+            progress.success = success
+            all_done = all(item.done for item in self._files.values())
+        # 整批结束时立即发布最终状态，不等下一个刷新周期
+        self.publish(force=all_done or self.publish_on_finish)
+
+    def snapshot(self) -> BatchProgress:
+        """计算当前的汇总进度，不改变发布状态"""
+        with self._lock:
+            return self._snapshot(self.clock(), [])
+
+    def publish(self, force: bool = False):
+        """按刷新间隔发布汇总进度，force 为True时忽略间隔"""
+        with self._lock:
+            now = self.clock()
+            if not force and now - self._last_publish < self.interval:
+                return
+            self._last_publish = now
+            changed = []
+            for item in self._files.values():
+                if item.downloaded == item.reported:
+                    continue
+                if item.done or item.downloaded - max(item.reported, 0) >= self.min_bytes:
+                    changed.append((item.name, item.downloaded, item.total))
+                    item.reported = item.downloaded
+            batch = self._snapshot(now, changed)
+        self.callback(batch)
+
+    def _snapshot(self, now: float, changed: List[Tuple[str, int, int]]) -> BatchProgress:
+        files = list(self._files.values())
+        files_done = sum(1 for item in files if item.done)
+        bytes_done = sum(item.downloaded for item in files)
+        elapsed = now - self._started
+
+        # 所有文件大小都已知时按字节速率估算，否则按已完成文件的平均耗时估算
+        eta = None
+        if files_done < len(files) and elapsed > 0:
+            if all(item.total for item in files) and bytes_done:
+                remaining = sum(item.total for item in files) - bytes_done
+                eta = max(remaining, 0) / (bytes_done / elapsed)
+            elif files_done:
+                eta = (len(files) - files_done) * elapsed / files_done
+        elif files and files_done == len(files):
+            eta = 0.0
+
+        return BatchProgress(
+            files_total=len(files),
+            files_done=files_done,
+            files_failed=sum(1 for item in files if item.done and not item.success),
+            bytes_done=bytes_done,
+            bytes_total=sum(item.total for item in files),
+            elapsed=elapsed,
+            eta=eta,
+            changed=changed,
+        )
@@ -0,0 +1,220 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config_manager import ConfigManager
+from .logger import Logger
+from .metrics import MetricsRegistry
+
+_metrics = MetricsRegistry()
+PROXY_REQUESTS_TOTAL = _metrics.counter('proxy_requests_total', '经各代理发出的请求数，按结果分类')
+PROXY_LATENCY_SECONDS = _metrics.histogram('proxy_latency_seconds', '经各代理请求的响应耗时（秒）')
+PROXY_EVICTIONS_TOTAL = _metrics.counter('proxy_evictions_total', '代理因错误率过高被停用的次数')
+PROXY_AVAILABLE = _metrics.gauge('proxy_available', '当前可用的代理数')
+
+# 不使用代理时的名称
+DIRECT = 'direct'
+
+# 延迟和错误率的指数移动平均系数
+EWMA_ALPHA = 0.2
+# 新代理的初始延迟估计（秒）
+INITIAL_LATENCY = 1.0
+# 至少有这么多次请求后才按错误率停用，避免一两次失败就停用
+MIN_SAMPLES = 5
+# 多次停用时恢复等待时间加倍的上限倍数
+MAX_BACKOFF = 8
+
+
+class TokenBucket:
+    """令牌桶限速，reserve 返回需要等待的秒数，等待在锁外进行"""
+
+    def __init__(self, rate: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ProxyState:
+    """一个出口（代理或直连）的健康状况和限速状态"""
+
+    def __init__(self, name: str, url: Optional[str], rate_limit: float, budget: int,
+                 clock: Callable[[], float]):
+        self.name = name
+        self.url = url
+        self.bucket = TokenBucket(rate_limit, clock)
+        self.budget = budget
+        self.used = 0
+        self.latency = INITIAL_LATENCY
+        self.error_rate = 0.0
+        self.samples = 0
+        self.evictions = 0
+        self.evicted_until = 0.0
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.budget) and self.used >= self.budget
+
+    @property
+    def weight(self) -> float:
+        """路由权重：成功率越高、延迟越低的代理被选中的概率越大"""
+        return max(1.0 - self.error_rate, 0.01) / max(self.latency, 0.05)
+
+
+class ProxyPool:
+    """按健康状况加权路由的代理池
+
+    每次请求前调用 acquire（或 acquire_async）取得一个出口，按权重随机选择可用的代理，
+    并按该代理的令牌桶等待，限速针对每个代理而不是整个进程。请求结束后调用 record
+    报告耗时和结果：延迟和错误率以指数移动平均更新，错误率达到 eviction_error_rate 的
+    代理停用 recovery_seconds 秒（多次停用时加倍），之后以一半的错误率重新参与路由。
+    达到请求预算的代理不再使用。没有配置代理、所有代理都已停用（直到有代理恢复）
+    或都用完预算时改为直连，直连同样按 crawler.rate_limit 限速。
+    """
+
+    def __init__(self, endpoints: List[Dict], default_rate: float = 0.0,
+                 eviction_error_rate: float = 0.5, recovery_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        self.logger = Logger.get_logger(__name__)
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.eviction_error_rate = eviction_error_rate
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        # 所有代理停用或预算用完后的直连出口，同样按 crawler.rate_limit 限速
+        self._direct = ProxyState(DIRECT, None, default_rate, 0, clock)
+        self._all_evicted = False
+        if not endpoints:
+            endpoints = [{'name': DIRECT, 'url': None}]
+        self.states = [
+            ProxyState(entry['name'], entry['url'], entry.get('rate_limit') or default_rate,
+                       entry.get('budget', 0), clock)
+            for entry in endpoints
+        ]
+        PROXY_AVAILABLE.set(len(self.states))
+
+    @classmethod
+    def from_config(cls, config: Optional[ConfigManager] = None) -> 'ProxyPool':
+        config = config or ConfigManager()
+        snapshot = config.snapshot()
+        return cls(config.get_proxy_pool(),
+                   default_rate=snapshot.crawler.rate_limit,
+                   eviction_error_rate=snapshot.proxy.eviction_error_rate,
+                   recovery_seconds=snapshot.proxy.recovery_seconds)
+
+    def _choose(self) -> ProxyState:
+        with self._lock:
+            now = self.clock()
+            candidates = []
+            for state in self.states:
+                if state.exhausted:
+                    continue
+                if state.evicted_until and now >= state.evicted_until:
+                    # 恢复试用，错误率减半后重新参与路由
+                    state.evicted_until = 0.0
+                    state.error_rate = self.eviction_error_rate / 2
+                    self.logger.info(f"代理恢复试用: {state.name}")
+                if not state.evicted_until:
+                    candidates.append(state)
+            PROXY_AVAILABLE.set(len(candidates))
+
+            if not candidates:
+                # 全部停用时直连到有代理恢复为止，不再使用已知有问题的代理；全部用完预算时一直直连
+                if any(not s.exhausted for s in self.states):
+                    if not self._all_evicted:
+                        self.logger.warning("所有代理都已停用，恢复前改为直连")
+                    self._all_evicted = True
+                elif not self._direct.used:
+                    self.logger.warning("所有代理的请求预算已用完，改为直连")
+                self._direct.used += 1
+                return self._direct
+
+            if self._all_evicted:
+                self.logger.info("有代理恢复试用，停止直连")
+                self._all_evicted = False
+            state = self.rng.choices(candidates, weights=[s.weight for s in candidates])[0]
+            state.used += 1
+            return state
+
+    def acquire(self) -> ProxyState:
+        """选择一个出口，必要时等待该出口的限速"""
+        state = self._choose()
+        delay = state.bucket.reserve()
+        if delay:
+            time.sleep(delay)
+        return state
+
+    async def acquire_async(self) -> ProxyState:
+        """acquire 的异步版本，等待时不阻塞事件循环"""
+        state = self._choose()
+        delay = state.bucket.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return state
+
+    def record(self, state: ProxyState, latency: float, success: bool):
+        """报告一次请求的耗时和结果"""
+        PROXY_REQUESTS_TOTAL.inc(proxy=state.name, result='success' if success else 'error')
+        PROXY_LATENCY_SECONDS.observe(latency, proxy=state.name)
+        with self._lock:
+            state.samples += 1
+            state.latency += EWMA_ALPHA * (latency - state.latency)
+            state.error_rate += EWMA_ALPHA * ((0.0 if success else 1.0) - state.error_rate)
+            if (state.url is not None and not state.evicted_until and state.samples >= MIN_SAMPLES
+                    and state.error_rate >= self.eviction_error_rate):
+                state.evictions += 1
+                backoff = min(2 ** (state.evictions - 1), MAX_BACKOFF)
+                state.evicted_until = self.clock() + self.recovery_seconds * backoff
+                PROXY_EVICTIONS_TOTAL.inc(proxy=state.name)
+                self.logger.warning(f"代理错误率 {state.error_rate:.0%}，停用 "
+                                    f"{self.recovery_seconds * backoff:.0f} 秒: {state.name}")
+
+    def proxies(self, state: ProxyState) -> Optional[Dict[str, str]]:
+        """requests 使用的 proxies 参数"""
+        if state.url is None:
+            return None
+        return {'http': state.url, 'https': state.url}
+
+    def stats(self) -> List[Dict]:
+        """各出口的当前状况"""
+        with self._lock:
+            return [{
+                'name': state.name,
+                'latency': state.latency,
+                'error_rate': state.error_rate,
+                'used': state.used,
+                'budget': state.budget,
+                'evicted': bool(state.evicted_until),
+            } for state in self.states]
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool() -> ProxyPool:
+    """进程内共享的代理池，同一进程中的爬虫和下载共用各代理的限速和健康状况
+
+    代理或限速配置热加载后重新创建，其余配置变化不影响已有的统计。
+    """
+    global _shared
+    snapshot = ConfigManager().snapshot()
+    key = (snapshot.proxy, snapshot.crawler.rate_limit)
+    with _shared_lock:
+        if _shared is None or _shared[0] != key:
+            _shared = (key, ProxyPool.from_config())
+        return _shared[1]
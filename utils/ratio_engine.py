@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+# pandas 和 numpy 导入较慢，只在计算时才加载
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# 计算所需的报表项目及其在不同公司报表中的常见名称，按优先级排列
+ITEM_ALIASES = {
+    '营业收入': ['营业收入', '营业总收入'],
+    # 营业总成本含销售、管理、研发和财务费用，不能代替营业成本计算毛利率
+    '营业成本': ['营业成本'],
+    '净利润': ['净利润', '归属于母公司所有者的净利润', '归属于母公司股东的净利润'],
+    '流动资产合计': ['流动资产合计'],
+    '流动负债合计': ['流动负债合计'],
+    '资产总计': ['资产总计', '资产合计'],
+    '负债合计': ['负债合计'],
+    '所有者权益合计': ['所有者权益合计', '股东权益合计', '所有者权益（或股东权益）合计',
+                '归属于母公司所有者权益合计', '归属于母公司股东权益合计'],
+    '经营活动现金流量净额': ['经营活动产生的现金流量净额'],
+}
+
+# 计算同比、环比增长率的项目
+GROWTH_ITEMS = ('营业收入', '净利润')
+
+# 比率名称，百分比类的比率以 % 为单位
+RATIO_COLUMNS = (
+    '流动比率', '资产负债率', '净利润率', '毛利率', 'ROE', 'ROA',
+    '经营现金流量比率', '净利润现金含量',
+    '营业收入同比', '营业收入环比', '净利润同比', '净利润环比',
+)
+
+
+def build_panel(records: pd.DataFrame) -> pd.DataFrame:
+    """把 StatementStore 的长表记录转换为宽表
+
+    Returns:
+        以 (stock, period) 为索引、报表项目为列的 float64 宽表。同一股票、报告期和
+        项目有多条记录时取最后一条
+    """
+    import pandas as pd
+
+    panel = records.pivot_table(index=['stock', 'period'], columns='item', values='value',
+                                aggfunc='last')
+    panel.columns.name = None
+    panel.index = panel.index.set_levels(pd.to_datetime(panel.index.levels[1]), level=1)
+    return panel.sort_index().astype('float64')
+
+
+def resolve_items(panel: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """按 ITEM_ALIASES 取出各项目的数值数组，优先使用靠前的名称，缺失时用后面的名称补齐"""
+    import numpy as np
+
+    arrays = {}
+    for item, aliases in ITEM_ALIASES.items():
+        values = np.full(len(panel), np.nan)
+        for alias in aliases:
+            if alias in panel.columns:
+                column = panel[alias].to_numpy(dtype='float64')
+                values = np.where(np.isnan(values), column, values)
+        arrays[item] = values
+    return arrays
+
+
+def safe_divide(numerator: np.ndarray, denominator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """逐元素相除，分母为0或缺失时结果为 NaN"""
+    import numpy as np
+
+    valid = np.isfinite(denominator) & (denominator != 0)
+    result = np.full(np.broadcast(numerator, denominator).shape, np.nan)
+    np.divide(numerator, denominator, out=result, where=valid)
+    return result * scale
+
+
+def _lagged(panel: pd.DataFrame, values: np.ndarray, periods: pd.DatetimeIndex) -> np.ndarray:
+    """按 (股票, 指定报告期) 查找 values 中对应行的数值，找不到时为 NaN"""
+    import numpy as np
+    import pandas as pd
+
+    stocks = panel.index.get_level_values(0)
+    target = pd.MultiIndex.from_arrays([stocks, periods])
+    positions = panel.index.get_indexer(target)
+    lagged = np.full(len(panel), np.nan)
+    found = positions >= 0
+    lagged[found] = values[positions[found]]
+    return lagged
+
+
+def compute_ratios(panel: pd.DataFrame, items: Optional[List[str]] = None) -> pd.DataFrame:
+    """对宽表中所有股票和报告期一次性计算财务比率
+
+    所有比率都是整列的 NumPy 运算，不逐行循环；同比、环比通过索引查找上年同期、
+    上一季度的行得到。分母为0或缺失时比率为 NaN。利润表、现金流量表项目为累计值时，
+    环比没有意义，应先用单季度数据构造宽表。
+
+    Args:
+        panel: build_panel 返回的宽表，索引为 (stock, period)
+        items: 只计算这些比率，默认 RATIO_COLUMNS 全部
+
+    Returns:
+        与 panel 索引相同、列为比率的DataFrame
+    """
+    import pandas as pd
+
+    values = resolve_items(panel)
+    revenue = values['营业收入']
+    net_profit = values['净利润']
+    operating_cash = values['经营活动现金流量净额']
+
+    ratios = {
+        '流动比率': safe_divide(values['流动资产合计'], values['流动负债合计']),
+        '资产负债率': safe_divide(values['负债合计'], values['资产总计'], 100),
+        '净利润率': safe_divide(net_profit, revenue, 100),
+        '毛利率': safe_divide(revenue - values['营业成本'], revenue, 100),
+        'ROE': safe_divide(net_profit, values['所有者权益合计'], 100),
+        'ROA': safe_divide(net_profit, values['资产总计'], 100),
+        '经营现金流量比率': safe_divide(operating_cash, values['流动负债合计']),
+        '净利润现金含量': safe_divide(operating_cash, net_profit),
+    }
+
+    periods = panel.index.get_level_values(1)
+    last_year = periods - pd.DateOffset(years=1)
+    last_quarter = periods - pd.offsets.QuarterEnd(1)
+    for item in GROWTH_ITEMS:
+        current = values[item]
+        for suffix, lag_periods in (('同比', last_year), ('环比', last_quarter)):
+            previous = _lagged(panel, current, lag_periods)
+            ratios[f'{item}{suffix}'] = safe_divide(current - previous, abs(previous), 100)
+
+    columns = list(items or RATIO_COLUMNS)
+    return pd.DataFrame({column: ratios[column] for column in columns}, index=panel.index)
+
+
+def statements_to_panel(statements: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """把一份报告经过 normalize_statement 转换的报表合成只有本期一行的宽表"""
+    import pandas as pd
+
+    row = {}
+    for table in statements.values():
+        if table is None or table.empty:
+            continue
+        for item, value in table.iloc[0].items():
+            row.setdefault(item, value)
+    index = pd.MultiIndex.from_tuples([('', pd.NaT)], names=['stock', 'period'])
+    return pd.DataFrame([row], index=index, dtype='float64')
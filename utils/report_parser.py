@@ -1,66 +1,734 @@
-import pdfplumber
-import pandas as pd
+from __future__ import annotations
+
+import os
 import re
-from typing import Dict, List, Optional
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
 import logging
+from .config_manager import ConfigManager
+from .layout_table import extract_layout_table
 from .logger import Logger
+from .metrics import MetricsRegistry
+from .parse_cache import ParseCache, get_default_cache
+from .statement_table import normalize_statement
+
+# pdfplumber 和 pandas 导入较慢，只在真正解析时才加载
+if TYPE_CHECKING:
+    import pdfplumber
+    import pandas as pd
+
+# 解析器版本，解析逻辑变化时递增，旧的解析缓存随之失效
+# 3: 预筛选候选页、按文字位置重建表格、缓存区分预筛选和章节定位
+# 4: 报表附带标题下方的单位说明
+PARSER_VERSION = '4'
+
+# 需要提取的财务报表及其在页面中的关键词
+STATEMENT_KEYWORDS = {
+    '资产负债表': '资产负债表',
+    '利润表': '利润表',
+    '现金流量表': '现金流量表',
+}
+
+# 目录或书签中财务报表所在章节的标题关键词
+FINANCIAL_SECTION_KEYWORDS = ('财务报告', '财务报表', '财务会计信息')
+
+# 查找印刷目录时最多检查的前几页
+TOC_SCAN_PAGES = 15
+
+# 印刷页码与PDF页序之间允许的偏差（封面、目录等不计页码的页数）
+TOC_PAGE_SLACK = 10
+
+# 无法确定章节结束位置时，从章节开始向后扫描的页数
+SECTION_DEFAULT_SPAN = 40
+
+# 目录行，如 "第十节 财务报告 ........ 120"
+TOC_LINE_PATTERN = re.compile(r'^(?P<title>.+?)[\s.·…_-]*(?P<page>\d{1,4})\s*$')
+
+# 待扫描页数达到该值时才拆分给多个进程并行提取
+PARALLEL_PAGE_THRESHOLD = 300
+
+# 并行提取时每个任务的页数，任务按页序提交，所有报表找到后不再提交
+PARALLEL_CHUNK_PAGES = 20
+
+# 预筛选时每张报表最多对排名靠前的几页做完整的表格提取
+PREFILTER_TOP_PAGES = 3
+
+# 预筛选中视为数值单元格的文本，如 1,234.56、(1,234.56)、-0.12
+NUMBER_PATTERN = re.compile(r'[-(]?\d[\d,]*\.\d+\)?')
+
+# 裁剪表格区域时在报表标题上方保留的边距（pt）
+TITLE_CROP_MARGIN = 5
+
+# 表格提取方式：lines 为 pdfplumber 的框线检测，layout 为按单词坐标重建，
+# auto 先做框线检测，找不到相关表格时再按单词坐标重建
+TABLE_STRATEGIES = ('lines', 'layout', 'auto')
+
+# 报表标题之后保留的文本行数，"单位：万元" 这类说明不在表格单元格中，通常在标题下方几行
+UNIT_CONTEXT_LINES = 4
+
+
+_metrics = MetricsRegistry()
+PAGE_SECONDS = _metrics.histogram('parser_page_seconds', '读取单页文本和表格的耗时（秒）')
+PAGES_TOTAL = _metrics.counter('parser_pages_total', '读取的页数')
+DOCUMENT_SECONDS = _metrics.histogram('parser_document_seconds', '解析单个文档的耗时（秒）')
+CACHE_TOTAL = _metrics.counter('parser_cache_total', '解析缓存查询次数，按是否命中分类')
+
+
+class MemoryLimitExceeded(Exception):
+    """解析单个文档时内存占用超过上限"""
+
+
+def release_page(page):
+    """释放页面解析后缓存的字符、布局等对象
+    
+    pdfplumber 会把每页解析出的对象缓存在页面上，逐页处理时用完立即释放，
+    内存占用就不会随页数增长。
+    """
+    close = getattr(page, 'close', None) or getattr(page, 'flush_cache', None)
+    if close is not None:
+        close()
+
+
+def _darwin_rss_bytes() -> int:
+    """通过 task_info 查询 macOS 进程当前的常驻内存（字节）"""
+    import ctypes
+    import ctypes.util
+    
+    class TimeValue(ctypes.Structure):
+        _fields_ = [('seconds', ctypes.c_int), ('microseconds', ctypes.c_int)]
+    
+    class MachTaskBasicInfo(ctypes.Structure):
+        _pack_ = 4
+        _fields_ = [('virtual_size', ctypes.c_uint64), ('resident_size', ctypes.c_uint64),
+                    ('resident_size_max', ctypes.c_uint64), ('user_time', TimeValue),
+                    ('system_time', TimeValue), ('policy', ctypes.c_int),
+                    ('suspend_count', ctypes.c_int)]
+    
+    mach_task_basic_info = 20
+    libc = ctypes.CDLL(ctypes.util.find_library('c'))
+    libc.task_info.argtypes = [ctypes.c_uint, ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint)]
+    info = MachTaskBasicInfo()
+    count = ctypes.c_uint(ctypes.sizeof(info) // ctypes.sizeof(ctypes.c_uint))
+    task = ctypes.c_uint.in_dll(libc, 'mach_task_self_')
+    if libc.task_info(task, mach_task_basic_info, ctypes.byref(info), ctypes.byref(count)) != 0:
+        return 0
+    return info.resident_size
+
+
+def current_rss_mb() -> float:
+    """当前进程的常驻内存（MB），无法获取时返回0
+    
+    Linux 下读取 /proc，其他平台使用 psutil，macOS 上没有安装 psutil 时通过 task_info 查询。
+    不能用 getrusage：它返回的是峰值，解析过一个大文档后就不会再下降。
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        pass
+    if sys.platform == 'darwin':
+        try:
+            return _darwin_rss_bytes() / 1024 / 1024
+        except (OSError, AttributeError, ValueError):
+            pass
+    return 0.0
+
+
+def _unit_context(text: str, keyword: str) -> str:
+    """页面文本中报表标题及其后几行，用于识别表格之外的金额单位说明"""
+    lines = text.splitlines()
+    titles = [i for i, line in enumerate(lines) if keyword in line]
+    if not titles:
+        return ''
+    # 优先取独占一行的标题，正文中提到报表名称的行不算
+    start = next((i for i in titles if len(lines[i].strip()) <= len(keyword) + 4), titles[0])
+    return '\n'.join(lines[start:start + UNIT_CONTEXT_LINES + 1])
+
+
+def _extract_page_slice(pdf_path: str, page_numbers: List[int], keywords: Dict[str, str],
+                        strategy: str, pages: Dict[int, Dict],
+                        max_memory_mb: float = 0) -> Tuple[Dict[int, Dict], List[Tuple[int, Dict[str, List[List[str]]]]]]:
+    """在工作进程中独立打开PDF，按顺序扫描的做法读取一段页面
+    
+    pages 为这段页面已有的逐页缓存，已缓存的文本和表格不再提取。内存上限针对
+    工作进程自身，超过时抛出 MemoryLimitExceeded。
+    
+    Returns:
+        (更新后的逐页缓存, 找到报表的页码及其表格)，由主进程合并
+    """
+    import pdfplumber
+    
+    parser = ReportParser(use_cache=False, max_memory_mb=max_memory_mb, table_strategy=strategy)
+    found_pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_number in page_numbers:
+            cached = pages.setdefault(page_number, {})
+            found = parser._read_page(pdf, page_number, cached, keywords, strategy)
+            if found:
+                found_pages.append((page_number, found))
+    return pages, found_pages
+
 
 class ReportParser:
-    def __init__(self):
+    def __init__(self, page_workers: int = 1,
+                 parallel_page_threshold: int = PARALLEL_PAGE_THRESHOLD,
+                 cache: Optional[ParseCache] = None,
+                 use_cache: bool = True,
+                 max_memory_mb: Optional[float] = None,
+                 prefilter: bool = True,
+                 table_strategy: Optional[str] = None,
+                 locate_section: bool = True):
+        """
+        Args:
+            page_workers: 单个文档内并行提取页面的进程数，1 表示不并行
+            parallel_page_threshold: 待扫描页数达到该值时才并行提取
+            cache: 解析缓存，为None时使用默认缓存
+            use_cache: 是否使用解析缓存
+            max_memory_mb: 解析单个文档时进程内存上限（MB），超过时中止该文档，
+                为None时读取配置 analysis.parser_max_memory_mb，0 表示不限制
+            prefilter: 是否先用 PyPDF2 的文本流给页面打分，只对得分最高的几页提取表格
+            table_strategy: 表格提取方式，见 TABLE_STRATEGIES，为None时读取配置
+                analysis.table_strategy，默认 auto
+            locate_section: 是否先根据书签或印刷目录定位财务报告章节，只在章节内查找报表；
+                为False时直接扫描全部页面
+        """
         self.logger = Logger.get_logger(__name__)
+        self.page_workers = page_workers
+        self.parallel_page_threshold = parallel_page_threshold
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        if max_memory_mb is None:
+            max_memory_mb = ConfigManager().get('analysis.parser_max_memory_mb', 0)
+        self.max_memory_mb = max_memory_mb
+        self.prefilter = prefilter
+        if table_strategy is None:
+            table_strategy = ConfigManager().get('analysis.table_strategy', 'auto')
+        self.table_strategy = self._resolve_strategy(table_strategy)
+        self.locate_section = locate_section
     
-    def extract_financial_data(self, pdf_path: str) -> Dict[str, pd.DataFrame]:
+    def extract_financial_data(self, pdf_path: str,
+                               table_strategy: Optional[str] = None) -> Dict[str, pd.DataFrame]:
         """从PDF报告中提取财务数据
         
         Args:
             pdf_path: PDF文件路径
+            table_strategy: 本文档使用的表格提取方式，为None时使用解析器的默认设置。
+                没有框线、按文字对齐排版的报表可以指定 layout
         
         Returns:
             包含不同财务报表的字典，键为报表名称，值为DataFrame
         """
+        import pdfplumber
+        
+        strategy = self._resolve_strategy(table_strategy)
         try:
+            digest, cached = self._load_cached_statements(pdf_path, strategy)
+            if cached is not None:
+                return cached
             with pdfplumber.open(pdf_path) as pdf:
-                # 提取资产负债表
-                balance_sheet = self._extract_balance_sheet(pdf)
-                
-                # 提取利润表
-                income_statement = self._extract_income_statement(pdf)
-                
-                # 提取现金流量表
-                cash_flow = self._extract_cash_flow(pdf)
-                
-                return {
-                    '资产负债表': balance_sheet,
-                    '利润表': income_statement,
-                    '现金流量表': cash_flow
-                }
+                return self._parse_pdf(pdf_path, pdf, digest, strategy)
         except Exception as e:
             self.logger.error(f"解析PDF文件时出错: {str(e)}")
             return {}
     
-    def _extract_table_from_pages(self, pdf: pdfplumber.PDF, 
-                                keyword: str) -> Optional[pd.DataFrame]:
-        """从PDF页面中提取包含特定关键词的表格"""
+    def _resolve_strategy(self, strategy: Optional[str]) -> str:
+        """返回实际使用的表格提取方式，为None时取解析器的默认设置"""
+        strategy = strategy or self.table_strategy
+        if strategy not in TABLE_STRATEGIES:
+            raise ValueError(f"未知的表格提取方式: {strategy}，可选值: {', '.join(TABLE_STRATEGIES)}")
+        return strategy
+    
+    def _load_cached_statements(self, pdf_path: str,
+                                strategy: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, pd.DataFrame]]]:
+        """返回文件内容哈希和已缓存的报表，未启用缓存时都为None"""
+        if self.cache is None:
+            return None, None
+        digest = self.cache.file_hash(pdf_path)
+        cached = self.cache.get(digest, PARSER_VERSION, self._statements_kind(strategy))
+        CACHE_TOTAL.inc(result='miss' if cached is None else 'hit')
+        return digest, cached
+    
+    def _parse_pdf(self, pdf_path: str, pdf: pdfplumber.PDF, digest: Optional[str],
+                   strategy: Optional[str] = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """解析已打开的PDF，并复用和更新逐页文本、表格缓存
+        
+        逐页缓存中不同提取方式的表格分开保存，可以在提取方式之间共享。
+        """
+        strategy = self._resolve_strategy(strategy)
+        pages = None
+        if digest is not None:
+            pages = self.cache.get(digest, PARSER_VERSION, 'pages') or {}
+        
+        with DOCUMENT_SECONDS.time():
+            data = self._extract_statements(pdf_path, pdf, STATEMENT_KEYWORDS, pages, strategy)
+        
+        if digest is not None:
+            self.cache.put(digest, PARSER_VERSION, 'pages', pages)
+            self.cache.put(digest, PARSER_VERSION, self._statements_kind(strategy), data)
+        return data
+    
+    def _statements_kind(self, strategy: Optional[str] = None) -> str:
+        """报表缓存的类别，预筛选和章节定位会改变扫描的页面和结果，分开缓存"""
+        return (f'statements-{self._resolve_strategy(strategy)}'
+                f'-prefilter{int(self.prefilter)}-section{int(self.locate_section)}')
+    
+    def parse_batch(self, sources: Union[str, Iterable[str]],
+                    workers: Optional[int] = None,
+                    timeout: float = 300,
+                    max_pages: int = 1000,
+                    quarantine_file: Optional[str] = None,
+                    page_workers: int = 1) -> Iterator[Dict]:
+        """在进程池中批量解析PDF，每完成一个文件返回一个结果
+        
+        Args:
+            sources: PDF文件路径列表或目录（如 downloaded_reports/）
+            workers: 工作进程数，默认等于CPU核数
+            timeout: 单个文件的解析超时（秒）
+            max_pages: 单个文件的页数上限
+            quarantine_file: 隔离清单路径，扫描件、超大、超时和崩溃的文件会记入其中并在之后跳过
+            page_workers: 每个文件内部并行提取页面的进程数
+        
+        Yields:
+            结果字典，data 为 extract_financial_data 的返回值，stats 为批次进度和吞吐量
+        """
+        from .batch_parser import parse_reports_batch
+        return parse_reports_batch(sources, workers=workers, timeout=timeout,
+                                   max_pages=max_pages, quarantine_file=quarantine_file,
+                                   page_workers=page_workers)
+    
+    def _extract_statements(self, pdf_path: str, pdf: pdfplumber.PDF,
+                            keywords: Dict[str, str],
+                            pages: Optional[Dict[int, Dict]] = None,
+                            strategy: Optional[str] = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """在财务报告章节内查找报表，找不到的再全文扫描
+        
+        启用预筛选时先只对候选页提取表格，预筛选没找到的报表再逐页扫描。
+        """
+        section = self._locate_financial_section(pdf_path, pdf) if self.locate_section else None
+        if section is not None:
+            self.logger.debug(f"财务报告章节位于第 {section.start + 1}-{section.stop} 页")
+        window = section if section is not None else range(len(pdf.pages))
+        strategy = self._resolve_strategy(strategy)
+        
+        results = {name: None for name in keywords}
+        if self.prefilter:
+            results.update(self._prefilter_scan(pdf_path, pdf, keywords, window, pages, strategy))
+        
+        missing = {name: keywords[name] for name, table in results.items() if table is None}
+        if missing:
+            results.update(self._scan(pdf_path, pdf, missing, window, pages, strategy))
+        
+        missing = {name: keywords[name] for name, table in results.items() if table is None}
+        if missing and section is not None:
+            self.logger.debug(f"章节内未找到 {', '.join(missing)}，回退到全文扫描")
+            outside = [i for i in range(len(pdf.pages)) if i not in section]
+            results.update(self._scan(pdf_path, pdf, missing, outside, pages, strategy))
+        return results
+    
+    def _prefilter_scan(self, pdf_path: str, pdf: pdfplumber.PDF, keywords: Dict[str, str],
+                        page_numbers: Iterable[int],
+                        pages: Optional[Dict[int, Dict]] = None,
+                        strategy: str = 'auto') -> Dict[str, Optional[pd.DataFrame]]:
+        """两阶段提取：先给页面打分，再只对候选页裁剪后提取表格"""
+        if pages is None:
+            pages = {}
+        ranked = self._rank_candidate_pages(pdf_path, keywords, page_numbers, pages)
+        results = {}
+        for name, candidates in ranked.items():
+            for page_number in candidates:
+                table = self._extract_table_below_title(pdf, page_number, keywords[name], strategy)
+                if table:
+                    self.logger.debug(f"{name} 位于第 {page_number + 1} 页（预筛选）")
+                    context = _unit_context(pages[page_number].get('raw_text', ''), keywords[name])
+                    results[name] = self._table_to_dataframe(table, context)
+                    break
+        return results
+    
+    def _rank_candidate_pages(self, pdf_path: str, keywords: Dict[str, str],
+                              page_numbers: Iterable[int],
+                              pages: Optional[Dict[int, Dict]] = None) -> Dict[str, List[int]]:
+        """用 PyPDF2 的原始文本流给页面打分，返回每张报表得分最高的几页
+        
+        PyPDF2 只解码文本流，不做版面分析，比 pdfplumber 便宜得多。
+        得分综合报表关键词出现次数、是否作为标题出现以及数值单元格的密度。
+        """
+        try:
+            from PyPDF2 import PdfReader
+            reader = PdfReader(pdf_path)
+        except Exception as e:
+            self.logger.debug(f"预筛选打开PDF失败: {str(e)}")
+            return {}
+        
+        if pages is None:
+            pages = {}
+        scores = {name: [] for name in keywords}
+        for page_number in page_numbers:
+            cached = pages.setdefault(page_number, {})
+            if 'raw_text' not in cached:
+                try:
+                    cached['raw_text'] = reader.pages[page_number].extract_text() or ''
+                except Exception:
+                    cached['raw_text'] = ''
+            text = cached['raw_text']
+            for name, keyword in keywords.items():
+                score = self._score_page(text, keyword)
+                if score > 0:
+                    scores[name].append((score, page_number))
+        
+        ranked = {}
+        for name, page_scores in scores.items():
+            page_scores.sort(key=lambda item: (-item[0], item[1]))
+            ranked[name] = [page_number for _, page_number in page_scores[:PREFILTER_TOP_PAGES]]
+        return ranked
+    
+    def _score_page(self, text: str, keyword: str) -> float:
+        """页面作为某张报表所在页的得分，不含关键词时为0"""
+        hits = text.count(keyword)
+        if not hits:
+            return 0.0
+        tokens = text.split()
+        numbers = sum(1 for token in tokens if NUMBER_PATTERN.fullmatch(token))
+        density = numbers / len(tokens) if tokens else 0.0
+        # 报表标题通常独占一行，如 "合并资产负债表"
+        is_title = any(line.strip().endswith(keyword) and len(line.strip()) <= len(keyword) + 4
+                       for line in text.splitlines())
+        return min(hits, 3) + 2 * is_title + 10 * density
+    
+    def _extract_table_below_title(self, pdf: pdfplumber.PDF, page_number: int,
+                                   keyword: str, strategy: str = 'auto') -> Optional[List[List[str]]]:
+        """从报表标题处向下提取表格
+        
+        框线检测只处理标题下方裁剪出的区域，表格中没有关键词时取最靠近标题的表格；
+        按单词坐标重建时同样从标题下一行开始。
+        """
+        page = pdf.pages[page_number]
         try:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if keyword in text:
-                    tables = page.extract_tables()
-                    if tables:
-                        # 找到最相关的表格
-                        relevant_table = None
-                        max_relevance = 0
-                        for table in tables:
-                            relevance = self._calculate_table_relevance(table, keyword)
-                            if relevance > max_relevance:
-                                max_relevance = relevance
-                                relevant_table = table
-                        
-                        if relevant_table:
-                            return pd.DataFrame(relevant_table[1:], columns=relevant_table[0])
+            if strategy != 'layout':
+                table = self._lines_table_below_title(page, keyword)
+                if table or strategy == 'lines':
+                    return table
+            return extract_layout_table(page, keyword)
+        except Exception as e:
+            self.logger.error(f"提取第 {page_number + 1} 页表格时出错: {str(e)}")
+            return None
+        finally:
+            release_page(page)
+            self._check_memory(page_number)
+    
+    def _lines_table_below_title(self, page, keyword: str) -> Optional[List[List[str]]]:
+        """裁剪出标题下方的区域后做框线检测"""
+        title_top = None
+        for word in page.extract_words():
+            if keyword in word['text']:
+                title_top = word['top']
+                break
+        if title_top is None:
+            return None
+        
+        region = page.crop((0, max(0, title_top - TITLE_CROP_MARGIN), page.width, page.height))
+        tables = region.extract_tables()
+        if not tables:
+            return None
+        return self._select_relevant_table(tables, keyword) or tables[0]
+    
+    def _scan(self, pdf_path: str, pdf: pdfplumber.PDF, keywords: Dict[str, str],
+              page_numbers: Iterable[int],
+              pages: Optional[Dict[int, Dict]] = None,
+              strategy: str = 'auto') -> Dict[str, Optional[pd.DataFrame]]:
+        """页数较多且允许并行时分段并行扫描，否则顺序扫描"""
+        page_numbers = list(page_numbers)
+        if self.page_workers > 1 and len(page_numbers) >= self.parallel_page_threshold:
+            return self._scan_statements_parallel(pdf_path, keywords, page_numbers, pages, strategy)
+        return self._scan_statements(pdf, keywords, page_numbers, pages, strategy)
+    
+    def _scan_statements_parallel(self, pdf_path: str, keywords: Dict[str, str],
+                                  page_numbers: List[int],
+                                  pages: Optional[Dict[int, Dict]] = None,
+                                  strategy: str = 'auto') -> Dict[str, Optional[pd.DataFrame]]:
+        """把页面按顺序切成小段，由多个进程分别打开文件提取，再按页序合并
+        
+        同时进行的任务不超过进程数，已完成的各段按页序合并，每张报表取页序最靠前
+        的表格，结果与顺序扫描一致；所有报表都找到后不再提交新的任务。各段使用并
+        更新逐页缓存，每段合并后检查主进程的内存，工作进程也各自检查内存上限。
+        """
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        
+        if pages is None:
+            pages = {}
+        workers = min(self.page_workers, len(page_numbers))
+        chunks = [page_numbers[i:i + PARALLEL_CHUNK_PAGES]
+                  for i in range(0, len(page_numbers), PARALLEL_CHUNK_PAGES)]
+        
+        results = {name: None for name in keywords}
+        remaining = dict(keywords)
+        running = {}
+        completed = {}
+        submitted = merged = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                while remaining and submitted < len(chunks) and len(running) < workers:
+                    chunk = chunks[submitted]
+                    cached = {n: pages[n] for n in chunk if n in pages}
+                    future = executor.submit(_extract_page_slice, pdf_path, chunk, dict(remaining),
+                                             strategy, cached, self.max_memory_mb)
+                    running[future] = submitted
+                    submitted += 1
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        cached, found_pages = future.result()
+                    except MemoryLimitExceeded:
+                        raise
+                    except Exception as e:
+                        self.logger.error(f"并行提取页面时出错: {str(e)}")
+                        cached, found_pages = {}, []
+                    pages.update(cached)
+                    completed[index] = found_pages
+                
+                # 前面的段都完成后才合并，保证每张报表取最靠前的页
+                while merged in completed:
+                    for page_number, found in completed.pop(merged):
+                        for name, table in found.items():
+                            if name in remaining:
+                                context = _unit_context(pages[page_number].get('text', ''), keywords[name])
+                                results[name] = self._table_to_dataframe(table, context)
+                                del remaining[name]
+                    self._check_memory(chunks[merged][-1])
+                    merged += 1
+        return results
+    
+    def _locate_financial_section(self, pdf_path: str, pdf: pdfplumber.PDF) -> Optional[range]:
+        """根据书签或印刷目录确定财务报告章节的页码范围（从0开始）"""
+        page_count = len(pdf.pages)
+        section = self._section_from_outline(pdf_path)
+        if section is None:
+            section = self._section_from_toc(pdf)
+        if section is None:
+            return None
+        
+        start, end = section
+        start = max(0, min(start, page_count - 1))
+        end = min(page_count, max(end, start + 1))
+        return range(start, end)
+    
+    def _section_from_outline(self, pdf_path: str) -> Optional[Tuple[int, int]]:
+        """从PDF书签中查找财务报告章节"""
+        try:
+            from PyPDF2 import PdfReader
+            
+            reader = PdfReader(pdf_path)
+            entries = []  # (层级, 标题, 页码)
             
+            def walk(items, depth):
+                for item in items:
+                    if isinstance(item, list):
+                        walk(item, depth + 1)
+                    else:
+                        page = reader.get_destination_page_number(item)
+                        if page is not None and page >= 0:
+                            entries.append((depth, item.title or '', page))
+            
+            walk(reader.outline, 0)
+        except Exception as e:
+            self.logger.debug(f"读取PDF书签失败: {str(e)}")
             return None
+        
+        for i, (depth, title, page) in enumerate(entries):
+            if not any(keyword in title for keyword in FINANCIAL_SECTION_KEYWORDS):
+                continue
+            # 章节在下一个同级或更高级书签处结束
+            end = next((p for d, _, p in entries[i + 1:] if d <= depth and p > page),
+                       page + SECTION_DEFAULT_SPAN)
+            return page, end
+        return None
+    
+    def _section_from_toc(self, pdf: pdfplumber.PDF) -> Optional[Tuple[int, int]]:
+        """从印刷目录中查找财务报告章节
+        
+        目录中的页码是印刷页码，通常小于PDF页序，所以向后多留 TOC_PAGE_SLACK 页。
+        """
+        for page in pdf.pages[:TOC_SCAN_PAGES]:
+            try:
+                text = page.extract_text() or ''
+            except Exception:
+                continue
+            finally:
+                release_page(page)
+            if '目录' not in text.replace(' ', ''):
+                continue
+            
+            entries = []
+            for line in text.splitlines():
+                match = TOC_LINE_PATTERN.match(line.strip())
+                if match:
+                    entries.append((match.group('title'), int(match.group('page'))))
+            
+            for i, (title, printed_page) in enumerate(entries):
+                if not any(keyword in title for keyword in FINANCIAL_SECTION_KEYWORDS):
+                    continue
+                next_page = next((p for _, p in entries[i + 1:] if p > printed_page),
+                                 printed_page + SECTION_DEFAULT_SPAN)
+                return printed_page - 1, next_page - 1 + TOC_PAGE_SLACK
+        return None
+    
+    def _scan_statements(self, pdf: pdfplumber.PDF,
+                         keywords: Dict[str, str],
+                         page_numbers: Optional[Iterable[int]] = None,
+                         pages: Optional[Dict[int, Dict]] = None,
+                         strategy: Optional[str] = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """单次遍历页面，同时查找所有报表
+        
+        每页只提取一次文本，只有包含尚未找到的报表关键词的页面才提取表格，
+        所有报表都找到后提前结束。
+        
+        Args:
+            pdf: 已打开的PDF
+            keywords: 报表名称到页面关键词的映射
+            page_numbers: 要扫描的页码（从0开始），为None时扫描全部页面
+            pages: 逐页缓存，页码到 {'text': ..., 'tables': ...} 的映射，会被读取和更新
+            strategy: 表格提取方式，为None时使用解析器的默认设置
+        
+        Returns:
+            报表名称到DataFrame的映射，未找到的报表值为None
+        """
+        strategy = self._resolve_strategy(strategy)
+        results = {name: None for name in keywords}
+        remaining = dict(keywords)
+        if page_numbers is None:
+            page_numbers = range(len(pdf.pages))
+        
+        if pages is None:
+            pages = {}
+        
+        for page_number in page_numbers:
+            cached = pages.setdefault(page_number, {})
+            found = self._read_page(pdf, page_number, cached, remaining, strategy)
+            for name, table in found.items():
+                context = _unit_context(cached['text'], keywords[name])
+                results[name] = self._table_to_dataframe(table, context)
+                del remaining[name]
             
+            if not remaining:
+                break
+        
+        return results
+    
+    def _read_page(self, pdf: pdfplumber.PDF, page_number: int, cached: Dict,
+                   remaining: Dict[str, str], strategy: str = 'auto') -> Dict[str, List[List[str]]]:
+        """读取一页的文本，包含待查报表关键词时再提取表格
+        
+        页面处理完立即释放其缓存，并检查内存是否超过上限。
+        
+        Returns:
+            该页找到的报表名称到表格的映射
+        """
+        page = None
+        start = time.perf_counter()
+        
+        def load_page():
+            nonlocal page
+            if page is None:
+                page = pdf.pages[page_number]
+            return page
+        
+        try:
+            if 'text' not in cached:
+                cached['text'] = load_page().extract_text() or ''
+            candidates = {name: keyword for name, keyword in remaining.items()
+                          if keyword in cached['text']}
+            if not candidates:
+                return {}
+            return self._find_statement_tables(load_page, candidates, strategy, cached)
+        except Exception as e:
+            self.logger.error(f"提取第 {page_number + 1} 页表格时出错: {str(e)}")
+            return {}
+        finally:
+            if page is not None:
+                release_page(page)
+                PAGE_SECONDS.observe(time.perf_counter() - start)
+                PAGES_TOTAL.inc()
+                self._check_memory(page_number)
+    
+    def _find_statement_tables(self, load_page: Callable[[], object], candidates: Dict[str, str],
+                               strategy: str, cached: Dict) -> Dict[str, List[List[str]]]:
+        """按提取方式为一页中的候选报表查找表格
+        
+        框线检测的结果保存在 cached['tables']，按单词坐标重建的结果按关键词保存在
+        cached['layout:<关键词>']，已缓存的结果不再读取页面。
+        
+        Args:
+            load_page: 返回 pdfplumber 页面的函数，只在需要提取时调用
+            candidates: 页面文本中出现的报表名称到关键词的映射
+            strategy: 表格提取方式
+            cached: 该页的缓存，会被读取和更新
+        """
+        found = {}
+        if strategy != 'layout':
+            if 'tables' not in cached:
+                cached['tables'] = load_page().extract_tables()
+            for name, keyword in candidates.items():
+                table = self._select_relevant_table(cached['tables'], keyword)
+                if table:
+                    found[name] = table
+        
+        if strategy != 'lines':
+            for name, keyword in candidates.items():
+                if name in found:
+                    continue
+                key = f'layout:{keyword}'
+                if key not in cached:
+                    cached[key] = extract_layout_table(load_page(), keyword)
+                if cached[key]:
+                    found[name] = cached[key]
+        return found
+    
+    def _check_memory(self, page_number: int):
+        """内存超过上限时中止当前文档"""
+        if not self.max_memory_mb:
+            return
+        rss = current_rss_mb()
+        if rss > self.max_memory_mb:
+            raise MemoryLimitExceeded(
+                f"解析到第 {page_number + 1} 页时内存占用 {rss:.0f}MB 超过上限 {self.max_memory_mb}MB"
+            )
+    
+    def _select_relevant_table(self, tables: List[List[List[str]]],
+                               keyword: str) -> Optional[List[List[str]]]:
+        """从页面的表格中选出与关键词最相关的一个"""
+        relevant_table = None
+        max_relevance = 0
+        for table in tables:
+            relevance = self._calculate_table_relevance(table, keyword)
+            if relevance > max_relevance:
+                max_relevance = relevance
+                relevant_table = table
+        return relevant_table
+    
+    def _table_to_dataframe(self, table: List[List[str]], context: str = '') -> pd.DataFrame:
+        """把提取的表格转换为DataFrame，第一行作为表头
+        
+        context 为页面中报表标题附近的文本，保存在 attrs['unit_context']，
+        供 normalize_statements 识别表格之外的金额单位。
+        """
+        import pandas as pd
+        frame = pd.DataFrame(table[1:], columns=table[0])
+        frame.attrs['unit_context'] = context
+        return frame
+    
+    def _extract_table_from_pages(self, pdf: pdfplumber.PDF, 
+                                keyword: str, strategy: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """从PDF页面中提取包含特定关键词的表格"""
+        try:
+            return self._scan_statements(pdf, {keyword: keyword}, strategy=strategy)[keyword]
         except Exception as e:
             self.logger.error(f"提取表格时出错: {str(e)}")
             return None
@@ -90,47 +758,42 @@ class ReportParser:
         """提取现金流量表"""
         return self._extract_table_from_pages(pdf, '现金流量表')
     
-    def _clean_number(self, value: str) -> float:
-        """清理并转换数字字符串"""
-        try:
-            # 移除空格和货币符号
-            value = re.sub(r'[^\d.-]', '', value)
-            return float(value)
-        except:
-            return 0.0
+    def normalize_statements(self, data: Dict[str, Optional[pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+        """把 extract_financial_data 返回的原始报表转换为数值表格
+        
+        Returns:
+            报表名称到DataFrame的映射，行为报告期、列为报表项目，金额为 float64（元），
+            缺失值为 NaN；未找到的报表不包含在结果中
+        """
+        normalized = {}
+        for name, table in data.items():
+            if table is None:
+                continue
+            try:
+                normalized[name] = normalize_statement(table, table.attrs.get('unit_context', ''))
+            except Exception as e:
+                self.logger.error(f"转换{name}数值时出错: {str(e)}")
+        return normalized
     
     def analyze_financial_ratios(self, data: Dict[str, pd.DataFrame]) -> Dict[str, float]:
-        """计算财务比率
+        """计算单份报告本期的财务比率
+        
+        与 ratio_engine.compute_ratios 使用同一套计算，批量计算多家公司、多个报告期时
+        应直接对 StatementStore 中的数据调用 compute_ratios。
         
         Args:
-            data: 包含财务报表数据的字典
+            data: 包含财务报表数据的字典，原始报表会先经过 normalize_statements 转换
         
         Returns:
-            包含各种财务比率的字典
+            比率名称到数值的字典，缺少数据或分母为0时比率为 NaN；单份报告没有上期数据，
+            不包含同比和环比
         """
-        ratios = {}
+        from .ratio_engine import RATIO_COLUMNS, compute_ratios, statements_to_panel
         
         try:
-            balance_sheet = data.get('资产负债表')
-            income_statement = data.get('利润表')
-            
-            if balance_sheet is not None and income_statement is not None:
-                # 流动比率
-                current_assets = self._clean_number(balance_sheet.get('流动资产合计', ['0'])[0])
-                current_liabilities = self._clean_number(balance_sheet.get('流动负债合计', ['0'])[0])
-                ratios['流动比率'] = current_assets / current_liabilities if current_liabilities else 0
-                
-                # 资产负债率
-                total_assets = self._clean_number(balance_sheet.get('资产总计', ['0'])[0])
-                total_liabilities = self._clean_number(balance_sheet.get('负债合计', ['0'])[0])
-                ratios['资产负债率'] = (total_liabilities / total_assets * 100) if total_assets else 0
-                
-                # 净利润率
-                net_profit = self._clean_number(income_statement.get('净利润', ['0'])[0])
-                revenue = self._clean_number(income_statement.get('营业收入', ['0'])[0])
-                ratios['净利润率'] = (net_profit / revenue * 100) if revenue else 0
-        
+            panel = statements_to_panel(self.normalize_statements(data))
+            items = [name for name in RATIO_COLUMNS if not name.endswith(('同比', '环比'))]
+            return compute_ratios(panel, items).iloc[0].to_dict()
         except Exception as e:
             self.logger.error(f"计算财务比率时出错: {str(e)}")
-        
-        return ratios
+            return {}
@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import os
+import re
+import uuid
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Union, TYPE_CHECKING
+
+from .config_manager import ConfigManager
+from .logger import Logger
+
+# pandas 和 pyarrow 导入较慢，只在读写时才加载
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 长表的列，value 统一为元，unit 记录原报表的金额单位，report_period 为数值所在报告的
+# 报告期，与 period 不同的是报告中的比较数（上期数、上年年末余额等）
+STORE_COLUMNS = ('stock', 'period', 'statement', 'item', 'value', 'unit', 'art_code', 'report_period')
+# 日期类型的列
+DATE_COLUMNS = ('period', 'report_period')
+
+# 报告期列名中的日期，如 "2023年12月31日"、"2023-12-31"
+# 后面紧跟 "月" 的是月份区间（如 "2023年7-9月"），不是日期
+PERIOD_PATTERN = re.compile(r'(\d{4})\s*[年\-/.]\s*(\d{1,2})\s*[月\-/.]\s*(\d{1,2})(?!\d|\s*月)')
+
+# 列名中的月份区间，如 "2023年1-9月"、"7－9月"，从1月开始的是年初至报告期末的累计数
+MONTH_RANGE_PATTERN = re.compile(r'(?<!\d)(\d{1,2})\s*[-－—~至]\s*(\d{1,2})\s*月')
+# 列名中的年份，如 "2023年前三季度"
+YEAR_PATTERN = re.compile(r'(\d{4})\s*年')
+
+# 增减比例等非金额列
+CHANGE_MARKERS = ('增减', '变动', '比上年', '同比')
+# 表示上一财年末余额的列名，如资产负债表的 "上年年末余额"、"期初余额"
+PRIOR_YEAR_END_MARKERS = ('上年年末', '上年末', '上年度末', '期初', '年初余额', '年初数')
+# 表示年初至报告期末累计数的列名，如第三季度报告的 "年初至报告期末"
+YEAR_TO_DATE_MARKERS = ('年初至', '前三季度', '累计')
+# 表示上年同期的列名
+PRIOR_PERIOD_MARKERS = ('上年', '上期')
+# 表示本期的列名
+CURRENT_PERIOD_MARKERS = ('本期', '本报告期', '本年', '期末')
+# 表示单季度的列名，如 "第三季度"、"7-9月"
+QUARTER_MARKERS = ('季度',)
+
+PeriodLike = Union[str, date, datetime]
+
+
+def _store_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('stock', pa.string()),
+        ('period', pa.date32()),
+        ('statement', pa.string()),
+        ('item', pa.string()),
+        ('value', pa.float64()),
+        ('unit', pa.string()),
+        ('art_code', pa.string()),
+        ('report_period', pa.date32()),
+    ])
+
+
+def to_period(value: PeriodLike) -> date:
+    """把 "2023-12-31"、"2023年12月31日"、datetime 等转换为日期"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    match = PERIOD_PATTERN.search(str(value))
+    if not match:
+        raise ValueError(f"无法识别的报告期: {value}")
+    return date(*(int(part) for part in match.groups()))
+
+
+def _shift_years(period: date, years: int) -> date:
+    try:
+        return period.replace(year=period.year + years)
+    except ValueError:
+        # 2月29日
+        return period.replace(year=period.year + years, day=28)
+
+
+def _is_year_to_date(label: str) -> bool:
+    match = MONTH_RANGE_PATTERN.search(label)
+    if match:
+        return int(match.group(1)) == 1
+    return any(marker in label for marker in YEAR_TO_DATE_MARKERS)
+
+
+def _is_single_quarter(label: str) -> bool:
+    match = MONTH_RANGE_PATTERN.search(label)
+    if match:
+        return int(match.group(1)) != 1
+    return any(marker in label for marker in QUARTER_MARKERS) and not _is_year_to_date(label)
+
+
+def column_periods(labels: Iterable[str], report_period: date) -> List[Optional[date]]:
+    """按列名的含义确定报表各列对应的报告期，无法确定或不入库的列为None
+
+    - 能识别出完整日期的列名（如 "2023年12月31日"）直接使用
+    - "上年年末余额"、"期初余额" 为上一财年末（12月31日），中期报告中也是如此
+    - "本期"、"期末余额" 为报告期，"上期"、"上年同期" 为上年的同一报告期
+    - 第三季度报告的利润表和现金流量表同时披露单季度（"本报告期"、"7-9月"）和
+      年初至报告期末两组数，只保留累计数，单季度数值由 period_panel 差分得到
+    - "本期比上年同期增减" 等比例列丢弃
+    - 其他列名只有第一列视为报告期，其余丢弃而不是按位置猜测
+    """
+    labels = [re.sub(r'\s+', '', str(label)) for label in labels]
+    has_year_to_date = any(_is_year_to_date(label) for label in labels)
+    periods = []
+    in_year_to_date = False
+    for position, label in enumerate(labels):
+        try:
+            periods.append(to_period(label))
+            continue
+        except ValueError:
+            pass
+
+        if any(marker in label for marker in CHANGE_MARKERS):
+            periods.append(None)
+            continue
+        if any(marker in label for marker in PRIOR_YEAR_END_MARKERS):
+            periods.append(date(report_period.year - 1, 12, 31))
+            continue
+
+        in_year_to_date = in_year_to_date or _is_year_to_date(label)
+        if _is_single_quarter(label) or (has_year_to_date and not in_year_to_date):
+            periods.append(None)
+            continue
+
+        year = YEAR_PATTERN.search(label)
+        if year:
+            periods.append(_shift_years(report_period, int(year.group(1)) - report_period.year))
+        elif any(marker in label for marker in PRIOR_PERIOD_MARKERS):
+            periods.append(_shift_years(report_period, -1))
+        elif (any(marker in label for marker in CURRENT_PERIOD_MARKERS)
+              or _is_year_to_date(label) or position == 0):
+            periods.append(report_period)
+        else:
+            periods.append(None)
+
+    # 列名没有区分单季度和累计数时（如四列都是 "本期金额"/"上期金额"），
+    # 按报告的惯例单季度在前、累计数在后，同一报告期只保留最后一列
+    for position, period in enumerate(periods):
+        if period is not None and period in periods[position + 1:]:
+            periods[position] = None
+    return periods
+
+
+def statements_to_records(stock: str, period: PeriodLike, art_code: str,
+                          statements: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """把一份报告中经过 normalize_statement 转换的报表展开为长表
+
+    报表的行是报告期列名，按 column_periods 确定各行对应的报告期，无法确定的行不入库。
+
+    Args:
+        stock: 股票代码
+        period: 报告期末日期
+        art_code: 报告的公告编号
+        statements: 报表名称到数值表格的映射
+
+    Returns:
+        列为 STORE_COLUMNS 的DataFrame
+    """
+    import pandas as pd
+
+    report_period = to_period(period)
+    frames = []
+    for name, table in statements.items():
+        if table is None or table.empty:
+            continue
+        periods = column_periods(table.index, report_period)
+        keep = [period is not None for period in periods]
+        if not any(keep):
+            continue
+        unit = table.attrs.get('unit', '元')
+        table = table[keep].set_axis([period for period in periods if period is not None], axis=0)
+        long = table.rename_axis('period').reset_index()
+        long = long.melt(id_vars='period', var_name='item', value_name='value').dropna(subset=['value'])
+        long['statement'] = name
+        long['unit'] = unit
+        frames.append(long)
+
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype='float64' if column == 'value' else 'object')
+                             for column in STORE_COLUMNS})
+    records = pd.concat(frames, ignore_index=True)
+    records['stock'] = stock
+    records['art_code'] = art_code
+    records['report_period'] = report_period
+    return records[list(STORE_COLUMNS)]
+
+
+class StatementStore:
+    """按股票分区的 Parquet 长表，保存解析后的财务报表
+
+    目录结构为 <root>/stock=<代码>/part-*.parquet。每次追加写入新的分区文件，
+    不改写已有数据；compact 把分区内的小文件合并成一个按报告期排序的文件。
+    查询时股票代码条件用于裁剪分区目录，报告期等条件下推到 Parquet 的行组统计，
+    只读取满足条件的数据。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or ConfigManager().get('analysis.store_dir', 'statement_store')
+        self.logger = Logger.get_logger(__name__)
+
+    def _dataset(self):
+        import pyarrow.dataset as ds
+
+        if not os.path.isdir(self.root):
+            return None
+        return ds.dataset(self.root, schema=_store_schema(), format='parquet', partitioning='hive')
+
+    def append(self, records: pd.DataFrame) -> int:
+        """追加长表记录，返回写入的行数"""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if records.empty:
+            return 0
+        missing = set(STORE_COLUMNS) - set(records.columns)
+        if missing:
+            raise ValueError(f"缺少列: {', '.join(sorted(missing))}")
+
+        records = records[list(STORE_COLUMNS)].copy()
+        for column in DATE_COLUMNS:
+            records[column] = records[column].map(to_period)
+        records = records.sort_values(['stock', 'period', 'statement', 'item'])
+        table = pa.Table.from_pandas(records, schema=_store_schema(), preserve_index=False)
+        ds.write_dataset(
+            table, self.root, format='parquet',
+            partitioning=ds.partitioning(pa.schema([('stock', pa.string())]), flavor='hive'),
+            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        return len(records)
+
+    def append_statements(self, stock: str, period: PeriodLike, art_code: str,
+                          statements: Dict[str, pd.DataFrame]) -> int:
+        """追加一份报告的报表，statements 为 ReportParser.normalize_statements 的结果"""
+        return self.append(statements_to_records(stock, period, art_code, statements))
+
+    def query(self, stocks: Optional[Iterable[str]] = None,
+              start: Optional[PeriodLike] = None,
+              end: Optional[PeriodLike] = None,
+              statements: Optional[Iterable[str]] = None,
+              items: Optional[Iterable[str]] = None,
+              columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """按条件读取长表
+
+        Args:
+            stocks: 股票代码，为None时不限
+            start: 最早的报告期（含）
+            end: 最晚的报告期（含）
+            statements: 报表名称，如 ['利润表']
+            items: 报表项目，如 ['营业收入', '净利润']
+            columns: 需要的列，默认全部
+
+        Returns:
+            满足条件的记录，period 和 report_period 为 datetime64；早于 report_period
+            列加入时写入的数据，该列为空
+        """
+        import pandas as pd
+        import pyarrow.dataset as ds
+
+        columns = list(columns or STORE_COLUMNS)
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns)
+
+        conditions = []
+        if stocks is not None:
+            conditions.append(ds.field('stock').isin(list(stocks)))
+        if start is not None:
+            conditions.append(ds.field('period') >= to_period(start))
+        if end is not None:
+            conditions.append(ds.field('period') <= to_period(end))
+        if statements is not None:
+            conditions.append(ds.field('statement').isin(list(statements)))
+        if items is not None:
+            conditions.append(ds.field('item').isin(list(items)))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        frame = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        for column in DATE_COLUMNS:
+            if column in frame.columns:
+                frame[column] = pd.to_datetime(frame[column])
+        return frame
+
+    def art_codes(self, stock: Optional[str] = None) -> Set[str]:
+        """已入库的报告编号，用于增量解析时跳过已处理的报告"""
+        frame = self.query(stocks=[stock] if stock else None, columns=['art_code'])
+        return set(frame['art_code'].unique())
+
+    def compact(self, stock: Optional[str] = None):
+        """把分区内多次追加产生的小文件合并为一个按报告期排序的文件"""
+        import pyarrow.parquet as pq
+
+        if not os.path.isdir(self.root):
+            return
+        partitions = [f'stock={stock}'] if stock else sorted(os.listdir(self.root))
+        for partition in partitions:
+            directory = os.path.join(self.root, partition)
+            files = sorted(name for name in os.listdir(directory) if name.endswith('.parquet')) \
+                if os.path.isdir(directory) else []
+            if len(files) < 2:
+                continue
+
+            code = partition.split('=', 1)[1]
+            frame = self.query(stocks=[code])
+            table = _table_without_partition(frame.sort_values(['period', 'statement', 'item']))
+            # 以 . 开头的文件不会被数据集读取，写完并删除旧文件后再改名生效
+            name = f'part-{uuid.uuid4().hex}-0.parquet'
+            hidden_path = os.path.join(directory, f'.{name}')
+            pq.write_table(table, hidden_path)
+            for old_name in files:
+                os.remove(os.path.join(directory, old_name))
+            os.replace(hidden_path, os.path.join(directory, name))
+            self.logger.debug(f"已合并 {partition} 的 {len(files)} 个文件")
+
+
+def _table_without_partition(frame: pd.DataFrame):
+    """去掉分区列后转换为 Arrow 表，股票代码由目录名表示"""
+    import pyarrow as pa
+
+    schema = _store_schema()
+    schema = schema.remove(schema.get_field_index('stock'))
+    frame = frame.drop(columns=['stock']).copy()
+    for column in DATE_COLUMNS:
+        frame[column] = frame[column].dt.date
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import re
+from typing import Tuple, TYPE_CHECKING
+
+# pandas 导入较慢，只在真正转换时才加载
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 金额单位及其换算为元的倍数，长的单位在前，避免 "万元" 被识别为 "元"
+UNIT_SCALES = {
+    '亿元': 1e8,
+    '百万元': 1e6,
+    '万元': 1e4,
+    '千元': 1e3,
+    '元': 1.0,
+}
+
+# 表头中的单位说明，如 "单位：万元"、"单位: 人民币元"、"金额（千元）"
+UNIT_PATTERNS = (
+    re.compile(r'单位\s*[:：]\s*(?:人民币)?\s*(亿元|百万元|万元|千元|元)'),
+    re.compile(r'[(（]\s*(?:人民币)?\s*(亿元|百万元|万元|千元|元)\s*[)）]'),
+)
+
+# 识别单位时除列名外还检查的前几行
+UNIT_SCAN_ROWS = 3
+
+# 数值中需要去掉的字符：空白、千分位逗号、括号和货币符号
+STRIP_PATTERN = r'[\s,，()（）¥￥]'
+
+# 括号表示的负数，如 (1,234.56)
+NEGATIVE_PATTERN = r'[(（].*[)）]'
+
+# 表示空值的占位符，如 "-"、"—"、"--"
+PLACEHOLDER_PATTERN = r'[-—–－]*'
+
+# 报表项目名称前的序号和连接词，如 "一、"、"（一）"、"其中："、"加："
+ITEM_PREFIX_PATTERN = (r'^(?:[一二三四五六七八九十]+[、.．]|[(（][一二三四五六七八九十\d]+[)）]'
+                       r'|\d+[、.．]|其中[:：]|加[:：]|减[:：])+')
+
+# 一列中可转换为数值的单元格比例达到该值时视为数值列，否则（如附注列）丢弃
+NUMERIC_COLUMN_RATIO = 0.5
+
+
+def detect_unit(table: pd.DataFrame, context: str = '') -> Tuple[str, float]:
+    """从列名、表格前几行以及附加文本中识别金额单位
+
+    Args:
+        table: 提取出的原始报表
+        context: 表格之外的相关文本，如报表标题下方的 "单位：元" 一行
+
+    Returns:
+        (单位, 换算为元的倍数)，识别不到时视为元
+    """
+    texts = [str(column) for column in table.columns]
+    texts.extend(str(cell) for row in table.head(UNIT_SCAN_ROWS).itertuples(index=False)
+                 for cell in row if cell is not None)
+    texts.append(context)
+    text = ' '.join(texts)
+    for pattern in UNIT_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1), UNIT_SCALES[match.group(1)]
+    return '元', 1.0
+
+
+def clean_numeric_series(values: pd.Series) -> pd.Series:
+    """把一列文本整体转换为 float64
+
+    千分位逗号、空白和货币符号被去掉，括号表示负数，空白和 "-"、"—" 等占位符
+    以及无法解析的单元格为 NaN。全部使用 pandas 的向量化字符串操作。
+    """
+    import pandas as pd
+
+    text = values.astype('string').str.strip()
+    negative = text.str.fullmatch(NEGATIVE_PATTERN).fillna(False).astype(bool)
+    text = text.str.replace(STRIP_PATTERN, '', regex=True).str.replace('－', '-', regex=False)
+    text = text.mask(text.str.fullmatch(PLACEHOLDER_PATTERN).fillna(True).astype(bool))
+    numbers = pd.to_numeric(text, errors='coerce').astype('float64')
+    return numbers.mask(negative, -numbers)
+
+
+def clean_numeric_frame(table: pd.DataFrame) -> pd.DataFrame:
+    """逐列把表格转换为 float64"""
+    return table.apply(clean_numeric_series)
+
+
+def clean_item_names(values: pd.Series) -> pd.Series:
+    """去掉报表项目名称中的空白、序号和连接词，如 "一、营业总收入" -> "营业总收入" """
+    return (values.astype('string').fillna('')
+            .str.replace(r'\s+', '', regex=True)
+            .str.replace(ITEM_PREFIX_PATTERN, '', regex=True))
+
+
+def normalize_statement(table: pd.DataFrame, context: str = '') -> pd.DataFrame:
+    """把提取出的报表转换为以报告期为行、报表项目为列的 float64 表格
+
+    第一列为报表项目，其余列中数值单元格比例足够的列视为报告期（附注等文字列
+    被丢弃）。金额按表头中的单位统一换算为元，单位记录在结果的 attrs['unit'] 中。
+
+    Args:
+        table: extract_financial_data 返回的原始报表
+        context: 表格之外的相关文本，用于识别单位
+
+    Returns:
+        行索引为报告期（原表的列名），列为报表项目的DataFrame
+    """
+    import pandas as pd
+
+    unit, scale = detect_unit(table, context)
+    if table.shape[1] < 2:
+        return pd.DataFrame(dtype='float64')
+
+    items = clean_item_names(table.iloc[:, 0])
+    raw = table.iloc[:, 1:]
+    numbers = clean_numeric_frame(raw)
+
+    filled = raw.astype('string').apply(lambda column: column.str.strip().fillna('').ne('').sum())
+    parsed = numbers.notna().sum()
+    keep = (parsed > 0) & (parsed >= filled * NUMERIC_COLUMN_RATIO)
+    numbers = numbers.loc[:, keep.to_numpy()] * scale
+
+    numbers.index = pd.Index(items, name='项目')
+    numbers = numbers[(numbers.index != '') & numbers.notna().any(axis=1).to_numpy()]
+    numbers = numbers[~numbers.index.duplicated()]
+
+    result = numbers.T
+    result.index = pd.Index([str(column).strip() for column in result.index], name='报告期')
+    result.columns.name = None
+    result.attrs['unit'] = unit
+    return result
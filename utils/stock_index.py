@@ -0,0 +1,258 @@
+import os
+import json
+import mmap
+import struct
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 索引文件格式（小端）：
+#   头部:        magic(4s) version(I) count(I)
+#   代码区:      count * CODE_WIDTH 字节，按代码升序排列的 ASCII 股票代码
+#   代码->名称:  count * I，代码区第 i 项对应的名称序号
+#   名称偏移:    (count + 1) * I，名称区中每个名称的起止偏移
+#   名称->代码:  count * I，名称区第 i 项对应的代码序号
+#   名称区:      按 UTF-8 字节序升序排列、首尾相接的股票名称
+MAGIC = b'SCIX'
+VERSION = 1
+CODE_WIDTH = 6
+HEADER = struct.Struct('<4sII')
+U32 = struct.Struct('<I')
+
+
+def build_index(stock_codes: Dict[str, str], index_file: str) -> None:
+    """根据名称->代码字典生成紧凑索引文件
+
+    先写入临时文件再替换，避免其他进程读到写了一半的索引。
+    """
+    data = _encode(stock_codes)
+    tmp_file = f"{index_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, index_file)
+
+
+def _encode(stock_codes: Dict[str, str]) -> bytes:
+    """把名称->代码字典编码为索引文件内容"""
+    entries = [
+        (name.encode('utf-8'), code.encode('ascii'))
+        for name, code in stock_codes.items()
+        if len(code) == CODE_WIDTH
+    ]
+    count = len(entries)
+    by_name = sorted(range(count), key=lambda i: entries[i][0])
+    by_code = sorted(range(count), key=lambda i: (entries[i][1], entries[i][0]))
+    name_pos = {entry: pos for pos, entry in enumerate(by_name)}
+    code_pos = {entry: pos for pos, entry in enumerate(by_code)}
+
+    parts = [HEADER.pack(MAGIC, VERSION, count)]
+    parts.extend(entries[i][1] for i in by_code)
+    parts.append(struct.pack(f'<{count}I', *(name_pos[i] for i in by_code)))
+
+    offsets = [0]
+    for i in by_name:
+        offsets.append(offsets[-1] + len(entries[i][0]))
+    parts.append(struct.pack(f'<{count + 1}I', *offsets))
+    parts.append(struct.pack(f'<{count}I', *(code_pos[i] for i in by_name)))
+    parts.extend(entries[i][0] for i in by_name)
+    return b''.join(parts)
+
+
+class StockIndex:
+    """股票代码与名称的双向只读索引
+
+    索引文件通过 mmap 映射，打开时只解析头部，查找时在有序数组上二分，
+    不会把全部股票加载成字典。索引缺失、比 JSON 旧或头部无效（如格式版本
+    升级后留下的旧文件）时，会从 stock_codes.json 重新生成一次。
+    """
+
+    def __init__(self, json_file: str = 'stock_codes.json',
+                 index_file: Optional[str] = None):
+        self.json_file = json_file
+        self.index_file = index_file or os.path.splitext(json_file)[0] + '.idx'
+        self._buf = None
+        self._count = 0
+        self._load()
+
+    def _load(self):
+        """加载索引文件，必要时从 JSON 迁移"""
+        if self._index_is_stale():
+            if not os.path.exists(self.json_file):
+                raise FileNotFoundError(self.json_file)
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                stock_codes = json.load(f)
+            try:
+                build_index(stock_codes, self.index_file)
+            except OSError as e:
+                # 目录不可写（如打包后的应用）时直接使用内存中的索引
+                logging.warning(f"写入股票索引文件失败: {str(e)}")
+                self._attach(_encode(stock_codes))
+                return
+
+        with open(self.index_file, 'rb') as f:
+            self._attach(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _index_is_stale(self) -> bool:
+        """索引文件不存在、头部无效或比 JSON 文件旧时需要重新生成"""
+        if not self._header_is_valid():
+            return True
+        if not os.path.exists(self.json_file):
+            return False
+        return os.path.getmtime(self.index_file) < os.path.getmtime(self.json_file)
+
+    def _header_is_valid(self) -> bool:
+        """检查索引文件的 magic、版本，以及文件是否容纳得下头部声明的各区段"""
+        try:
+            size = os.path.getsize(self.index_file)
+            with open(self.index_file, 'rb') as f:
+                header = f.read(HEADER.size)
+        except OSError:
+            return False
+        if len(header) < HEADER.size:
+            return False
+        magic, version, count = HEADER.unpack(header)
+        fixed_size = HEADER.size + count * CODE_WIDTH + (3 * count + 1) * U32.size
+        return magic == MAGIC and version == VERSION and size >= fixed_size
+
+    def _attach(self, buf):
+        """解析头部并计算各区段的起始位置"""
+        magic, version, count = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"无效的股票索引文件: {self.index_file}")
+        self._buf = buf
+        self._count = count
+        self._codes = HEADER.size
+        self._code_to_name = self._codes + count * CODE_WIDTH
+        self._name_offsets = self._code_to_name + count * U32.size
+        self._name_to_code = self._name_offsets + (count + 1) * U32.size
+        self._names = self._name_to_code + count * U32.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, text: str) -> bool:
+        return self.resolve(text) is not None
+
+    def _u32(self, base: int, i: int) -> int:
+        return U32.unpack_from(self._buf, base + i * U32.size)[0]
+
+    def _code_at(self, i: int) -> bytes:
+        start = self._codes + i * CODE_WIDTH
+        return self._buf[start:start + CODE_WIDTH]
+
+    def _name_at(self, i: int) -> bytes:
+        start = self._names + self._u32(self._name_offsets, i)
+        end = self._names + self._u32(self._name_offsets, i + 1)
+        return self._buf[start:end]
+
+    def _bisect(self, key: bytes, item_at) -> int:
+        """第一个不小于 key 的位置（bisect 的 key 参数要到 Python 3.10 才有）"""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if item_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get_code(self, name: str) -> Optional[str]:
+        """根据股票名称获取代码"""
+        key = name.encode('utf-8')
+        i = self._bisect(key, self._name_at)
+        if i < self._count and self._name_at(i) == key:
+            return self._code_at(self._u32(self._name_to_code, i)).decode('ascii')
+        return None
+
+    def get_name(self, code: str) -> Optional[str]:
+        """根据股票代码获取名称，同一代码对应多个名称时返回第一个"""
+        try:
+            key = code.encode('ascii')
+        except UnicodeEncodeError:
+            return None
+        if len(key) != CODE_WIDTH:
+            return None
+        i = self._bisect(key, self._code_at)
+        if i < self._count and self._code_at(i) == key:
+            return self._name_at(self._u32(self._code_to_name, i)).decode('utf-8')
+        return None
+
+    def resolve(self, text: str) -> Optional[str]:
+        """把股票名称或代码解析为股票代码"""
+        code = self.get_code(text)
+        if code is None and self.get_name(text) is not None:
+            code = text
+        return code
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """按名称顺序遍历 (名称, 代码)"""
+        for i in range(self._count):
+            name = self._name_at(i).decode('utf-8')
+            code = self._code_at(self._u32(self._name_to_code, i)).decode('ascii')
+            yield name, code
+
+    def _entry_by_name(self, i: int) -> Tuple[str, str]:
+        return (self._name_at(i).decode('utf-8'),
+                self._code_at(self._u32(self._name_to_code, i)).decode('ascii'))
+
+    def _entry_by_code(self, i: int) -> Tuple[str, str]:
+        return (self._name_at(self._u32(self._code_to_name, i)).decode('utf-8'),
+                self._code_at(i).decode('ascii'))
+
+    def _prefix_range(self, key: bytes, item_at) -> Iterator[int]:
+        """有序数组中以 key 开头的各项位置，二分找到起点后顺序向后"""
+        i = self._bisect(key, item_at)
+        while i < self._count and item_at(i).startswith(key):
+            yield i
+            i += 1
+
+    def _names_containing(self, key: bytes) -> Iterator[int]:
+        """名称中包含 key 的各项位置，直接在映射的名称区上查找，不逐个解码"""
+        end = self._names + self._u32(self._name_offsets, self._count)
+        start = self._buf.find(key, self._names, end)
+        while start != -1:
+            # 最后一个起始偏移不大于匹配位置的名称
+            i = self._bisect(start - self._names + 1, lambda j: self._u32(self._name_offsets, j)) - 1
+            if start + len(key) <= self._names + self._u32(self._name_offsets, i + 1):
+                yield i
+            start = self._buf.find(key, start + 1, end)
+
+    def _codes_containing(self, key: bytes) -> Iterator[int]:
+        """代码中包含 key 的各项位置，在定长的代码区上查找"""
+        end = self._codes + self._count * CODE_WIDTH
+        start = self._buf.find(key, self._codes, end)
+        while start != -1:
+            i, column = divmod(start - self._codes, CODE_WIDTH)
+            if column + len(key) <= CODE_WIDTH:
+                yield i
+            start = self._buf.find(key, start + 1, end)
+
+    def search(self, text: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """查找名称或代码中包含指定文本的股票，最多返回 limit 条
+
+        依次返回精确匹配、代码前缀、名称前缀和子串匹配。前缀在有序数组上二分，
+        子串直接在映射的字节区上查找，只解码命中的条目，每次按键都能很快返回。
+        """
+        matches = []
+        if not text:
+            return matches
+
+        code = self.resolve(text)
+        if code is not None:
+            name = text if self.get_code(text) is not None else self.get_name(code)
+            matches.append((name, code))
+
+        key = text.encode('utf-8')
+        candidates = [
+            (self._entry_by_code, self._prefix_range(key, self._code_at)),
+            (self._entry_by_name, self._prefix_range(key, self._name_at)),
+            (self._entry_by_name, self._names_containing(key)),
+            (self._entry_by_code, self._codes_containing(key)),
+        ]
+        for entry_at, positions in candidates:
+            for i in positions:
+                if len(matches) >= limit:
+                    return matches
+                entry = entry_at(i)
+                if entry not in matches:
+                    matches.append(entry)
+        return matches
@@ -1,164 +1,352 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
-from typing import Dict, List, Tuple, Optional
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Tuple, Optional, TYPE_CHECKING
+import hashlib
+import json
 import os
 from .config_manager import ConfigManager
 from .logger import Logger
+from .metrics import MetricsRegistry
+
+# matplotlib 和 pandas 导入较慢，只在真正绘图时才加载
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# 图表模板：报表名称 -> 指标、标题和文件名
+CHART_TEMPLATES = {
+    '资产负债表': {
+        'metrics': ['资产总计', '负债合计', '所有者权益合计'],
+        'title': '资产负债趋势分析',
+        'filename': 'balance_sheet_trend.png',
+    },
+    '利润表': {
+        'metrics': ['营业收入', '营业利润', '净利润'],
+        'title': '利润趋势分析',
+        'filename': 'profit_trend.png',
+    },
+    '现金流量表': {
+        'metrics': ['经营活动产生的现金流量净额',
+                    '投资活动产生的现金流量净额',
+                    '筹资活动产生的现金流量净额'],
+        'title': '现金流量趋势分析',
+        'filename': 'cash_flow_trend.png',
+    },
+}
+
+# 保存各图表输入数据哈希的文件，数据未变化的图表不再重绘
+HASH_FILE = '.chart_hashes.json'
+
+# 对比图中每家公司的序列最多保留的点数，超过时用 LTTB 降采样
+COMPARISON_MAX_POINTS = 200
+
+# 对比图中超过该数量的公司合并为一个栅格化的背景图层，只有突出显示的公司单独绘制矢量线条
+DENSE_SERIES_THRESHOLD = 12
+
+# 对比图的分辨率，与图幅一起决定栅格化图层和输出文件的大小上限
+COMPARISON_DPI = 100
+
+_metrics = MetricsRegistry()
+RENDER_SECONDS = _metrics.histogram('chart_render_seconds', '绘制单张图表的耗时（秒）')
+CHARTS_TOTAL = _metrics.counter('charts_total', '图表数，按是否因数据未变化而跳过分类')
+
+# 当前进程已应用的样式，每个进程只设置一次
+_applied_style = None
+
+
+def _apply_style(style: str):
+    """在当前进程中使用 Agg 后端并应用样式，重复调用时不再设置"""
+    global _applied_style
+    if _applied_style == style:
+        return
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.style
+    matplotlib.style.use(style)
+    _applied_style = style
+
+
+def data_hash(data: pd.DataFrame, template_name: str, fig_size: Tuple[int, int], style: str) -> str:
+    """图表输入数据及绘图参数的哈希"""
+    import pandas as pd
+
+    template = CHART_TEMPLATES[template_name]
+    columns = [metric for metric in template['metrics'] if metric in data.columns]
+    sha256 = hashlib.sha256()
+    sha256.update(json.dumps([template_name, template, list(fig_size), style, columns],
+                             ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    sha256.update(pd.util.hash_pandas_object(data[columns], index=True).to_numpy().tobytes())
+    return sha256.hexdigest()
+
+
+def render_chart(template_name: str, data: pd.DataFrame, save_path: str,
+                 fig_size: Tuple[int, int], style: str):
+    """按模板绘制一张趋势图并保存
+
+    使用独立的 Figure 对象和 Agg 画布，不经过 pyplot 的全局状态，可以在多个线程或
+    进程中同时调用。
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    _apply_style(style)
+    template = CHART_TEMPLATES[template_name]
+    fig = Figure(figsize=fig_size)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for metric in template['metrics']:
+        if metric in data.columns:
+            ax.plot(data.index, data[metric], label=metric, marker='o')
+
+    ax.set_title(template['title'])
+    ax.set_xlabel('报告期')
+    ax.set_ylabel('金额（元）')
+    ax.legend()
+    ax.grid(True)
+    fig.savefig(save_path)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 降采样，返回保留的点的下标
+
+    首尾两点总是保留，中间的点分为 threshold - 2 个桶，每个桶保留与前一个保留点、
+    下一个桶平均点构成的三角形面积最大的点，能保留序列的峰谷形状。
+    """
+    import numpy as np
+
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+
+def render_comparison_chart(matrix: pd.DataFrame, title: str, save_path: str,
+                            fig_size: Tuple[int, int], style: str,
+                            highlight: Iterable[str] = (),
+                            max_points: int = COMPARISON_MAX_POINTS):
+    """绘制多家公司同一指标的对比图
+
+    每家公司的序列先去掉缺失值并用 LTTB 降采样到 max_points 个点。公司数超过
+    DENSE_SERIES_THRESHOLD 时，未突出显示的公司合并为一个 LineCollection 并栅格化，
+    同时画出同业中位数；绘图耗时与点数上限成正比，输出文件大小受图幅和分辨率限制。
+
+    Args:
+        matrix: 以报告期为行、股票代码为列的数值表
+        title: 图表标题
+        save_path: 保存路径
+        highlight: 需要突出显示并出现在图例中的股票代码
+        max_points: 每条序列最多保留的点数
+    """
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.dates import date2num
+    from matplotlib.figure import Figure
+
+    _apply_style(style)
+    fig = Figure(figsize=fig_size, dpi=COMPARISON_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    x_all = date2num(matrix.index.to_pydatetime())
+    highlight = [stock for stock in highlight if stock in matrix.columns]
+    dense = len(matrix.columns) > DENSE_SERIES_THRESHOLD
+
+    background = []
+    for stock in matrix.columns:
+        y = matrix[stock].to_numpy(dtype='float64')
+        valid = np.isfinite(y)
+        if valid.sum() < 2:
+            continue
+        x, y = x_all[valid], y[valid]
+        keep = lttb(x, y, max_points)
+        x, y = x[keep], y[keep]
+        if dense and stock not in highlight:
+            background.append(np.column_stack([x, y]))
+        else:
+            ax.plot(x, y, label=stock, linewidth=1.5)
+
+    if background:
+        collection = LineCollection(background, colors='0.6', linewidths=0.6, alpha=0.5,
+                                    rasterized=True, label=f'同业 ({len(background)} 家)')
+        ax.add_collection(collection)
+        median = np.nanmedian(matrix.to_numpy(dtype='float64'), axis=1)
+        ax.plot(x_all, median, color='black', linestyle='--', linewidth=1.2, label='同业中位数')
+        ax.autoscale_view()
+
+    ax.xaxis_date()
+    ax.set_title(title)
+    ax.set_xlabel('报告期')
+    ax.legend(loc='best', fontsize='small')
+    ax.grid(True)
+    fig.savefig(save_path, dpi=COMPARISON_DPI)
+
+
+def _load_hashes(save_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(save_dir, HASH_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_hashes(save_dir: str, hashes: Dict[str, str]):
+    path = os.path.join(save_dir, HASH_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def render_company_charts(data: Dict[str, pd.DataFrame], save_dir: str,
+                          fig_size: Tuple[int, int], style: str) -> List[str]:
+    """绘制一家公司的全部趋势图，输入数据未变化且图表文件存在时跳过
+
+    Returns:
+        图表文件路径列表（包括跳过的）
+    """
+    logger = Logger.get_logger(__name__)
+    os.makedirs(save_dir, exist_ok=True)
+    hashes = _load_hashes(save_dir)
+    saved_files = []
+    changed = False
+    for template_name, template in CHART_TEMPLATES.items():
+        table = data.get(template_name)
+        if table is None:
+            continue
+        save_path = os.path.join(save_dir, template['filename'])
+        try:
+            digest = data_hash(table, template_name, fig_size, style)
+            if hashes.get(template['filename']) == digest and os.path.exists(save_path):
+                CHARTS_TOTAL.inc(result='skipped')
+                saved_files.append(save_path)
+                continue
+            with RENDER_SECONDS.time(chart='trend'):
+                render_chart(template_name, table, save_path, fig_size, style)
+            CHARTS_TOTAL.inc(result='rendered')
+            hashes[template['filename']] = digest
+            changed = True
+            saved_files.append(save_path)
+        except Exception as e:
+            logger.error(f"创建{template['title']}图时出错: {str(e)}")
+    if changed:
+        _save_hashes(save_dir, hashes)
+    return saved_files
+
 
 class DataVisualizer:
     def __init__(self):
         self.config = ConfigManager()
         self.logger = Logger.get_logger(__name__)
-        self._setup_style()
-    
-    def _setup_style(self):
-        """设置图表样式"""
-        style = self.config.get('analysis.chart_style', 'seaborn')
-        plt.style.use(style)
-    
-    def create_financial_charts(self, data: Dict[str, pd.DataFrame], 
+        self.style = self.config.get('analysis.chart_style', 'seaborn')
+        self.fig_size = tuple(self.config.get('analysis.default_chart_size', [10, 6]))
+
+    def create_financial_charts(self, data: Dict[str, pd.DataFrame],
                               save_dir: str) -> List[str]:
         """创建财务数据图表
-        
+
         Args:
             data: 财务数据字典
             save_dir: 保存目录
-        
+
         Returns:
             保存的图表文件路径列表
         """
-        saved_files = []
         try:
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # 设置图表大小
-            fig_size = self.config.get('analysis.default_chart_size', [10, 6])
-            
-            # 创建资产负债趋势图
-            if '资产负债表' in data:
-                balance_file = self._create_balance_sheet_chart(
-                    data['资产负债表'],
-                    save_dir,
-                    fig_size
-                )
-                if balance_file:
-                    saved_files.append(balance_file)
-            
-            # 创建利润趋势图
-            if '利润表' in data:
-                profit_file = self._create_profit_chart(
-                    data['利润表'],
-                    save_dir,
-                    fig_size
-                )
-                if profit_file:
-                    saved_files.append(profit_file)
-            
-            # 创建现金流量趋势图
-            if '现金流量表' in data:
-                cash_flow_file = self._create_cash_flow_chart(
-                    data['现金流量表'],
-                    save_dir,
-                    fig_size
-                )
-                if cash_flow_file:
-                    saved_files.append(cash_flow_file)
-            
-            return saved_files
-            
+            return render_company_charts(data, save_dir, self.fig_size, self.style)
         except Exception as e:
             self.logger.error(f"创建财务图表时出错: {str(e)}")
-            return saved_files
-    
-    def _create_balance_sheet_chart(self, data: pd.DataFrame, 
-                                  save_dir: str, 
-                                  fig_size: Tuple[int, int]) -> Optional[str]:
-        """创建资产负债趋势图"""
-        try:
-            plt.figure(figsize=fig_size)
-            
-            # 提取关键指标
-            metrics = ['资产总计', '负债合计', '所有者权益合计']
-            for metric in metrics:
-                if metric in data.columns:
-                    plt.plot(data.index, data[metric], label=metric, marker='o')
-            
-            plt.title('资产负债趋势分析')
-            plt.xlabel('报告期')
-            plt.ylabel('金额（元）')
-            plt.legend()
-            plt.grid(True)
-            
-            # 保存图表
-            save_path = os.path.join(save_dir, 'balance_sheet_trend.png')
-            plt.savefig(save_path)
-            plt.close()
-            
-            return save_path
-            
-        except Exception as e:
-            self.logger.error(f"创建资产负债趋势图时出错: {str(e)}")
-            return None
-    
-    def _create_profit_chart(self, data: pd.DataFrame,
-                           save_dir: str,
-                           fig_size: Tuple[int, int]) -> Optional[str]:
-        """创建利润趋势图"""
-        try:
-            plt.figure(figsize=fig_size)
-            
-            # 提取关键指标
-            metrics = ['营业收入', '营业利润', '净利润']
-            for metric in metrics:
-                if metric in data.columns:
-                    plt.plot(data.index, data[metric], label=metric, marker='o')
-            
-            plt.title('利润趋势分析')
-            plt.xlabel('报告期')
-            plt.ylabel('金额（元）')
-            plt.legend()
-            plt.grid(True)
-            
-            # 保存图表
-            save_path = os.path.join(save_dir, 'profit_trend.png')
-            plt.savefig(save_path)
-            plt.close()
-            
-            return save_path
-            
-        except Exception as e:
-            self.logger.error(f"创建利润趋势图时出错: {str(e)}")
-            return None
-    
-    def _create_cash_flow_chart(self, data: pd.DataFrame,
-                              save_dir: str,
-                              fig_size: Tuple[int, int]) -> Optional[str]:
-        """创建现金流量趋势图"""
+            return []
+
+    def create_charts_batch(self, jobs: Iterable[Tuple[Dict[str, pd.DataFrame], str]],
+                            workers: Optional[int] = None) -> Dict[str, List[str]]:
+        """在进程池中为多家公司绘制图表
+
+        Args:
+            jobs: (财务数据字典, 保存目录) 的序列，每项对应一家公司
+            workers: 进程数，默认等于CPU核数
+
+        Returns:
+            保存目录到图表文件路径列表的映射
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(render_company_charts, data, save_dir, self.fig_size, self.style): save_dir
+                for data, save_dir in jobs
+            }
+            for future in as_completed(futures):
+                save_dir = futures[future]
+                try:
+                    results[save_dir] = future.result()
+                except Exception as e:
+                    self.logger.error(f"创建图表时出错: {save_dir}: {str(e)}")
+                    results[save_dir] = []
+        return results
+
+    def create_panel_charts(self, panel, stocks: Iterable[str], save_root: str,
+                            workers: Optional[int] = None) -> Dict[str, List[str]]:
+        """为覆盖列表中的每只股票绘制图表，数据来自 period_panel.load_aligned_panel
+
+        每只股票的图表保存在 save_root/<股票代码> 下。
+        """
+        jobs = [(panel.statement_frames(stock), os.path.join(save_root, stock)) for stock in stocks]
+        return self.create_charts_batch(jobs, workers)
+
+    def create_comparison_chart(self, data, item: str, stocks: Optional[Iterable[str]],
+                                save_path: str, quarterly: bool = False,
+                                highlight: Iterable[str] = (),
+                                max_points: int = COMPARISON_MAX_POINTS) -> Optional[str]:
+        """绘制多家公司同一报表项目或比率的对比图
+        
+        Args:
+            data: period_panel.AlignedPanel，或以 (stock, period) 为索引的宽表
+                （如 AlignedPanel.wide 或 ratio_engine.compute_ratios 的结果）
+            item: 报表项目或比率名称，如 '营业收入'、'ROE'
+            stocks: 参与对比的股票代码，为None时使用全部
+            save_path: 保存路径
+            quarterly: data 为 AlignedPanel 时是否使用单季度数值
+            highlight: 突出显示的股票代码
+            max_points: 每条序列最多保留的点数
+        
+        Returns:
+            保存的图表路径，失败时为None
+        """
         try:
-            plt.figure(figsize=fig_size)
-            
-            # 提取关键指标
-            metrics = ['经营活动产生的现金流量净额',
-                      '投资活动产生的现金流量净额',
-                      '筹资活动产生的现金流量净额']
-            for metric in metrics:
-                if metric in data.columns:
-                    plt.plot(data.index, data[metric], label=metric, marker='o')
-            
-            plt.title('现金流量趋势分析')
-            plt.xlabel('报告期')
-            plt.ylabel('金额（元）')
-            plt.legend()
-            plt.grid(True)
-            
-            # 保存图表
-            save_path = os.path.join(save_dir, 'cash_flow_trend.png')
-            plt.savefig(save_path)
-            plt.close()
-            
+            wide = data.wide(quarterly) if hasattr(data, 'wide') else data
+            if item not in wide.columns:
+                self.logger.error(f"数据中没有项目: {item}")
+                return None
+            matrix = wide[item].unstack(level=0).sort_index()
+            if stocks is not None:
+                matrix = matrix.reindex(columns=[stock for stock in stocks if stock in matrix.columns])
+            directory = os.path.dirname(save_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with RENDER_SECONDS.time(chart='comparison'):
+                render_comparison_chart(matrix, f'{item}同业对比', save_path, self.fig_size, self.style,
+                                        highlight, max_points)
+            CHARTS_TOTAL.inc(result='rendered')
             return save_path
-            
         except Exception as e:
-            self.logger.error(f"创建现金流量趋势图时出错: {str(e)}")
+            self.logger.error(f"创建对比图时出错: {str(e)}")
             return None